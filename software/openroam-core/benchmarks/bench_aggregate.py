@@ -0,0 +1,93 @@
+"""
+Aggregated publish benchmark
+
+Compares per-value MQTT publishing with one JSON state document per
+subsystem. Rounds of mock data are generated in both modes and fed
+through MqttClient.handle (no broker) with a few RoamK subscribers,
+reporting packets, bytes on the wire and ingest time per round, and
+checking both modes leave the same state.
+
+Usage:
+    python benchmarks/bench_aggregate.py [--rounds N] [--vehicles N] [--subscribers N]
+"""
+
+import argparse
+import json
+import time
+
+from openroam_core.fleet import Fleet
+from openroam_core.mock_data import SimClock, simulate
+from openroam_core.mqtt_client import MqttClient
+from openroam_core.roamk import RoamK
+
+# Per-packet overhead of an MQTT 3.1.1 QoS 0 PUBLISH: fixed header and topic length
+_HEADER = 4
+
+
+def _capture(rounds: int, vehicles: int, aggregate: bool) -> list[tuple[str, bytes]]:
+    messages: list[tuple[str, bytes]] = []
+    simulate(
+        SimClock(start=1_700_000_000, speed=None),
+        lambda topic, payload: messages.append((topic, payload.encode())),
+        vehicles=vehicles,
+        seed=1,
+        duration=rounds,
+        aggregate=aggregate,
+    )
+    return messages
+
+
+def _ingest(
+    messages: list[tuple[str, bytes]], vehicles: int, subscribers: int
+) -> tuple[float, MqttClient]:
+    client = MqttClient()
+    client.set_roamk(RoamK())
+    if vehicles > 1:
+        client.set_fleet(Fleet(max_vehicles=vehicles))
+    else:
+        for _ in range(subscribers):
+            client.roamk.subscribe(lambda state, changed: len(changed))
+    handle = client.handle
+    start = time.perf_counter()
+    for topic, payload in messages:
+        handle(topic, payload)
+    return time.perf_counter() - start, client
+
+
+def _state(client: MqttClient) -> list[dict]:
+    """Final state of every store, without the run-dependent update time."""
+    stores = client.fleet.vehicles.values() if client.fleet is not None else [client.roamk]
+    states = []
+    for store in stores:
+        state = json.loads(store.snapshot_json()[0])
+        state.pop("last_update", None)
+        states.append(state)
+    return states
+
+
+def main() -> None:
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=1000)
+    parser.add_argument("--vehicles", type=int, default=1)
+    parser.add_argument("--subscribers", type=int, default=2, help="RoamK subscribers")
+    args = parser.parse_args()
+    rounds = args.rounds * args.vehicles
+
+    print(f"{'mode':<10} {'packets':>8} {'bytes':>8} {'ingest µs':>10}  (per vehicle round)")
+    states = []
+    for aggregate in (False, True):
+        messages = _capture(args.rounds, args.vehicles, aggregate)
+        size = sum(len(t) + len(p) + _HEADER for t, p in messages)
+        elapsed, client = _ingest(messages, args.vehicles, args.subscribers)
+        states.append(_state(client))
+        print(
+            f"{'aggregate' if aggregate else 'per-value':<10} {len(messages) / rounds:>8.1f} "
+            f"{size / rounds:>8,.0f} {elapsed / rounds * 1e6:>10.1f}"
+        )
+
+    print(f"same state: {states[0] == states[1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Compact state benchmark
+
+Compares the dataclass RoamKState with the array-backed compact state:
+memory held per state, whole-state snapshot cost (deepcopy vs buffer
+copy), and update/get throughput through RoamK. The compact figures
+include per-field write timestamps, which the dataclass does not keep.
+
+Usage:
+    python benchmarks/bench_compact.py [--states N] [--messages N]
+"""
+
+import argparse
+import copy
+import functools
+import time
+import tracemalloc
+
+from openroam_core.compact import compact_state, store_of
+from openroam_core.mqtt_client import TOPIC_MAP
+from openroam_core.roamk import RoamK, RoamKState
+
+
+def _memory_per_state(count: int, compact: bool) -> float:
+    """Bytes allocated per state with every numeric mapped path written."""
+    paths = [path.split(".") for path in _numeric_paths()]
+    factory = compact_state if compact else RoamKState
+    factory()
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    states = []
+    for i in range(count):
+        state = factory()
+        for *parents, leaf in paths:
+            obj = state
+            for name in parents:
+                obj = getattr(obj, name)
+            setattr(obj, leaf, 12.5 + i % 7)
+        states.append(state)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / count
+
+
+def _numeric_paths() -> list[str]:
+    probe = RoamK()
+    return [
+        path
+        for path in TOPIC_MAP.values()
+        if isinstance(probe.get_path(path), float) or probe.get_path(path) is None
+    ]
+
+
+def _snapshot_us(store: RoamK, repeat: int) -> float:
+    """Microseconds per whole-state copy."""
+    if isinstance(store.state, RoamKState):
+        take = functools.partial(copy.deepcopy, store.state)
+    else:
+        take = store_of(store.state).snapshot
+    start = time.perf_counter()
+    for _ in range(repeat):
+        take()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def _throughput(store: RoamK, messages: int) -> tuple[float, float]:
+    """Return (updates/s, gets/s)."""
+    paths = _numeric_paths()
+    workload = [(paths[i % len(paths)], float(i % 1000)) for i in range(messages)]
+    store.compile_paths(paths)
+
+    start = time.perf_counter()
+    for path, value in workload:
+        store.update_path(path, value)
+    update_rate = messages / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for path, _ in workload:
+        store.get_path(path)
+    get_rate = messages / (time.perf_counter() - start)
+    return update_rate, get_rate
+
+
+def main() -> None:
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--states", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=300_000)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(
+        f"{'':10} {'bytes/state':>12} {'snapshot us':>12} "
+        f"{'update msg/s':>14} {'get req/s':>14}"
+    )
+    for label, compact in (("dataclass", False), ("compact", True)):
+        memory = _memory_per_state(args.states, compact)
+        snapshot = _snapshot_us(RoamK(compact=compact), args.repeat)
+        update_rate, get_rate = _throughput(RoamK(compact=compact), args.messages)
+        print(
+            f"{label:10} {memory:>12,.0f} {snapshot:>12.1f} "
+            f"{update_rate:>14,.0f} {get_rate:>14,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
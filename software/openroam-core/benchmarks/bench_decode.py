@@ -0,0 +1,102 @@
+"""
+MQTT payload decode benchmark
+
+Compares the original try-JSON-then-number parsing against the typed
+per-topic decoders, over the payloads MockDataGenerator publishes.
+
+Usage:
+    python benchmarks/bench_decode.py [--messages N]
+"""
+
+import argparse
+import json
+import time
+
+from openroam_core.mqtt_client import _UNDECODED, TOPIC_MAP, MqttClient
+from openroam_core.roamk import RoamK
+
+# Representative payloads for each mapped topic, as the mock publishes them
+SAMPLE_PAYLOADS = {
+    "openroam/power/shore/connected": b"false",
+    "openroam/power/alternator/charging": b"true",
+    "openroam/climate/hvac/mode": b"auto",
+    "openroam/climate/hvac/running": b"false",
+    "openroam/engine/check_engine": b"false",
+    "openroam/engine/rpm": b"1850",
+    "openroam/engine/coolant_temp": b"195",
+    "openroam/engine/oil_temp": b"210",
+    "openroam/engine/throttle": b"42",
+    "openroam/safety/smoke/status": b"ok",
+    "openroam/safety/co/ppm": b"0",
+    "openroam/safety/propane/ppm": b"0",
+    "openroam/nav/gps/latitude": b"35.085300",
+    "openroam/nav/gps/longitude": b"-106.605600",
+}
+
+
+def legacy_parse(payload: str) -> any:
+    """The original _parse_payload: JSON first, then number, then bool."""
+    try:
+        return json.loads(payload)
+    except json.JSONDecodeError:
+        pass
+
+    try:
+        if "." in payload:
+            return float(payload)
+        return int(payload)
+    except ValueError:
+        pass
+
+    if payload.lower() == "true":
+        return True
+    if payload.lower() == "false":
+        return False
+
+    return payload
+
+
+def main() -> None:
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=500_000)
+    args = parser.parse_args()
+
+    topics = list(TOPIC_MAP)
+    messages = [
+        (topic, SAMPLE_PAYLOADS.get(topic, b"12.5"))
+        for topic in (topics[i % len(topics)] for i in range(args.messages))
+    ]
+
+    client = MqttClient()
+    client.set_roamk(RoamK())
+    route = client.router.route
+    decoder_for = client._decoder_for
+    parse = client._parse_payload
+
+    start = time.perf_counter()
+    for _, payload in messages:
+        legacy_parse(payload.decode("utf-8"))
+    legacy_rate = len(messages) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _, payload in messages:
+        parse(payload.decode("utf-8"))
+    generic_rate = len(messages) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for topic, payload in messages:
+        decoder = decoder_for(route(topic))
+        value = decoder(payload) if decoder is not None else _UNDECODED
+        if value is _UNDECODED:
+            parse(payload.decode("utf-8"))
+    typed_rate = len(messages) / (time.perf_counter() - start)
+
+    print(f"{'decoder':12} {'msg/s':>14} {'speedup':>9}")
+    print(f"{'legacy':12} {legacy_rate:>14,.0f} {1:>8.2f}x")
+    print(f"{'generic':12} {generic_rate:>14,.0f} {generic_rate / legacy_rate:>8.2f}x")
+    print(f"{'typed':12} {typed_rate:>14,.0f} {typed_rate / legacy_rate:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
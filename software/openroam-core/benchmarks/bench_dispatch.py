@@ -0,0 +1,79 @@
+"""
+Subscriber dispatch benchmark
+
+Feeds mock traffic through MqttClient.handle with one slow RoamK
+subscriber (a fixed sleep per call, like a blocking network write) and
+reports ingest throughput with the subscriber called inline and queued
+on a Dispatcher under each overflow policy, plus its drops and queue
+lag.
+
+Usage:
+    python benchmarks/bench_dispatch.py [--messages N] [--delay-ms MS] [--max-queue N]
+"""
+
+import argparse
+import time
+
+from openroam_core.dispatch import POLICIES, Dispatcher
+from openroam_core.loadgen import mock_corpus
+from openroam_core.mqtt_client import MqttClient
+from openroam_core.roamk import RoamK
+
+
+def _run(messages: list[tuple[str, bytes]], delay: float, args, policy=None) -> None:
+    calls = 0
+
+    def slow(state, changed) -> None:
+        nonlocal calls
+        calls += 1
+        time.sleep(delay)
+
+    client = MqttClient()
+    client.set_roamk(RoamK())
+    dispatcher = Dispatcher(workers=1, max_queue=args.max_queue) if policy else None
+    client.roamk.subscribe(slow, dispatcher=dispatcher, policy=policy)
+
+    handle = client.handle
+    start = time.perf_counter()
+    for topic, payload in messages:
+        handle(topic, payload)
+    elapsed = time.perf_counter() - start
+
+    line = f"{policy or 'inline':<16} {len(messages) / elapsed:>12,.0f}"
+    if dispatcher is not None:
+        queued = dispatcher.callbacks[0]
+        while queued.depth:
+            time.sleep(delay)
+        time.sleep(delay * 2)
+        line += (
+            f" {queued.delivered:>10,} {queued.dropped:>10,}"
+            f" {queued.lag.quantile(0.5) * 1000:>10g} {queued.lag.quantile(0.99) * 1000:>10g}"
+        )
+        dispatcher.close()
+    else:
+        line += f" {calls:>10,} {0:>10,} {'-':>10} {'-':>10}"
+    print(line)
+
+
+def main() -> None:
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=5_000)
+    parser.add_argument("--delay-ms", type=float, default=1.0, help="subscriber time per call")
+    parser.add_argument("--max-queue", type=int, default=256)
+    args = parser.parse_args()
+
+    corpus = mock_corpus()
+    messages = (corpus * (args.messages // len(corpus) + 1))[: args.messages]
+    delay = args.delay_ms / 1000
+
+    print(
+        f"{'dispatch':<16} {'ingest/s':>12} {'calls':>10} {'dropped':>10} "
+        f"{'lag p50 ms':>10} {'lag p99 ms':>10}"
+    )
+    for policy in (None, *POLICIES):
+        _run(messages, delay, args, policy)
+
+
+if __name__ == "__main__":
+    main()
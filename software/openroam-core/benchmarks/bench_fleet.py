@@ -0,0 +1,93 @@
+"""
+Fleet ingest benchmark
+
+Simulates a fleet hub: every vehicle publishes each mapped topic once per
+second under ``openroam/<vehicle>/...``. Messages are fed straight into
+the MQTT client's message handler (no broker), so the numbers are the
+hub's own CPU cost. Reports the share of one core needed to keep up at
+1 Hz, memory per vehicle and the cost of the aggregate /fleet view.
+
+Usage:
+    python benchmarks/bench_fleet.py [--vehicles N] [--seconds N] [--compact]
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+import paho.mqtt.client as mqtt
+
+from openroam_core.fleet import Fleet
+from openroam_core.mqtt_client import TOPIC_MAP, MqttClient
+
+
+def _message(topic: str, payload: bytes) -> mqtt.MQTTMessage:
+    message = mqtt.MQTTMessage(topic=topic.encode())
+    message.payload = payload
+    return message
+
+
+def _second(vehicles: list[str], rng: random.Random) -> list[mqtt.MQTTMessage]:
+    """One second of traffic: every vehicle publishes every mapped topic."""
+    messages = []
+    for vehicle in vehicles:
+        for topic in TOPIC_MAP:
+            payload = f"{rng.uniform(0, 100):.2f}".encode()
+            messages.append(_message(f"openroam/{vehicle}/{topic[9:]}", payload))
+    return messages
+
+
+def main() -> None:
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--vehicles", type=int, default=500)
+    parser.add_argument("--seconds", type=int, default=10, help="simulated seconds")
+    parser.add_argument("--compact", action="store_true", help="use compact states")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    vehicles = [f"van{i:04d}" for i in range(args.vehicles)]
+    traffic = [_second(vehicles, rng) for _ in range(args.seconds)]
+    per_second = len(traffic[0])
+
+    fleet = Fleet(compact=args.compact, max_vehicles=args.vehicles)
+    client = MqttClient()
+    client.set_fleet(fleet)
+    on_message = client._on_message
+
+    # The first second creates every vehicle; measure its memory separately
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for message in traffic[0]:
+        on_message(client.client, None, message)
+    memory = (tracemalloc.get_traced_memory()[0] - before) / args.vehicles
+    tracemalloc.stop()
+
+    worst = 0.0
+    start = time.perf_counter()
+    for second in traffic[1:]:
+        t0 = time.perf_counter()
+        for message in second:
+            on_message(client.client, None, message)
+        worst = max(worst, time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    mean = elapsed / (args.seconds - 1)
+
+    start = time.perf_counter()
+    body, _ = fleet.summary_json()
+    summary_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    fleet.summary_json()
+    cached_ms = (time.perf_counter() - start) * 1000
+
+    print(f"vehicles:            {args.vehicles} ({'compact' if args.compact else 'dataclass'})")
+    print(f"messages per second: {per_second:,}")
+    print(f"ingest rate:         {per_second * (args.seconds - 1) / elapsed:,.0f} msg/s")
+    print(f"core load at 1 Hz:   {mean * 100:.1f}% mean, {worst * 100:.1f}% worst second")
+    print(f"memory per vehicle:  {memory / 1024:.1f} KiB")
+    print(f"/fleet summary:      {summary_ms:.2f} ms, {cached_ms:.2f} ms cached, {len(body):,} B")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+History store benchmark
+
+Fills a temporary history database with 30 days of one path sampled
+every few seconds, then times 30-day range queries at several steps.
+
+Usage:
+    python benchmarks/bench_history.py [--interval SECONDS] [--repeat N]
+"""
+
+import argparse
+import math
+import tempfile
+import time
+from pathlib import Path
+
+from openroam_core.history import HistoryStore
+
+DAYS = 30
+PATH = "power.house_battery.voltage"
+
+
+def main() -> None:
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between samples")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = HistoryStore(
+            str(Path(tmp) / "history.db"),
+            raw_retention_days=DAYS + 1,
+            minute_retention_days=DAYS + 1,
+        )
+
+        end = time.time()
+        start = end - DAYS * 86400
+        count = int(DAYS * 86400 / args.interval)
+
+        t0 = time.perf_counter()
+        for i in range(count):
+            ts = start + i * args.interval
+            store.record(PATH, 12.6 + 0.5 * math.sin(i / 5000), ts)
+            if i % 100_000 == 0:
+                store.flush()
+        store.flush(close_all=True)
+        ingest = time.perf_counter() - t0
+        size = (Path(tmp) / "history.db").stat().st_size
+
+        rate = count / ingest
+        print(f"ingested {count:,} samples in {ingest:.1f}s ({rate:,.0f}/s), {size / 1e6:.1f} MB")
+        print(f"{'30-day query':24} {'points':>8} {'ms':>8}")
+        for step in (None, 60, 3600, 86400):
+            t0 = time.perf_counter()
+            for _ in range(args.repeat):
+                result = store.query(PATH, start, end, step)
+            ms = (time.perf_counter() - t0) / args.repeat * 1000
+            label = f"step={step or 'auto'} ({result['resolution']}s tier)"
+            print(f"{label:24} {len(result['t']):>8} {ms:>8.2f}")
+
+        store.stop()
+
+
+if __name__ == "__main__":
+    main()
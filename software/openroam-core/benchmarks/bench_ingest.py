@@ -0,0 +1,236 @@
+"""
+Ingest throughput benchmark
+
+Drives MockDataGenerator traffic through the full ingest path at fixed
+rates and reports achieved throughput, p50/p99 ingest-to-visible
+latency (send of a probe message to a RoamK subscriber seeing it) and
+process memory.
+
+inproc: messages go straight into MqttClient._on_message, with extra
+        subscribers and snapshot reads interleaved (no broker, no HTTP).
+broker: messages are published to a broker and ingested by the real
+        API server running in this process, while a reader thread
+        polls GET /state over HTTP.
+
+Usage:
+    python benchmarks/bench_ingest.py [--mode inproc|broker] [--rates 10000,100000]
+        [--duration S] [--broker HOST:PORT] [--subscribers N] [--read-rate N]
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import socket
+import threading
+import time
+import urllib.request
+
+import paho.mqtt.client as mqtt
+
+from openroam_core.loadgen import LatencyProbe, LoadGenerator, mock_corpus
+from openroam_core.mqtt_client import MqttClient
+from openroam_core.roamk import RoamK
+
+
+class _Message:
+    """The parts of an MQTTMessage the client reads."""
+
+    __slots__ = ("topic", "payload")
+
+    def __init__(self, topic: str, payload: bytes) -> None:
+        self.topic = topic
+        self.payload = payload
+
+
+def _rss_mb() -> float:
+    """Current resident set size, falling back to the peak."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def _consumer(roamk: RoamK):
+    """A subscriber that reads every changed value, like the stream encoder."""
+
+    def callback(state, changed):
+        for path in changed:
+            roamk.get_path(path)
+
+    return callback
+
+
+def run_inproc(rate: float, args) -> dict:
+    """Feed the message handler directly at ``rate`` msg/s."""
+    roamk = RoamK()
+    client = MqttClient()
+    client.set_roamk(roamk)
+    probe = LatencyProbe()
+    probe.attach(roamk)
+    for _ in range(args.subscribers):
+        roamk.subscribe(_consumer(roamk))
+
+    on_message = client._on_message
+    paho_client = client.client
+    snapshot = roamk.snapshot_json
+    read_every = max(1, int(rate / args.read_rate)) if args.read_rate else 0
+    reads: list[float] = []
+    count = 0
+
+    def send(topic: str, payload: bytes) -> None:
+        nonlocal count
+        on_message(paho_client, None, _Message(topic, payload))
+        count += 1
+        if read_every and count % read_every == 0:
+            t0 = time.perf_counter()
+            snapshot("")
+            reads.append(time.perf_counter() - t0)
+
+    generator = LoadGenerator(send, args.corpus, rate, probe)
+    elapsed = generator.run(args.duration)
+    reads.sort()
+    return {
+        "sent": generator.sent,
+        "elapsed": elapsed,
+        "probe": probe,
+        "reads": reads[len(reads) // 2] if reads else None,
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class _Server:
+    """The API server on a background thread, ingesting from the broker."""
+
+    def __init__(self, host: str, port: int) -> None:
+        import uvicorn
+
+        from openroam_core import server
+
+        os.environ["MQTT_HOST"] = host
+        os.environ["MQTT_PORT"] = str(port)
+        self.module = server
+        self.port = _free_port()
+        self.uvicorn = uvicorn.Server(
+            uvicorn.Config(server.app, port=self.port, log_level="warning", lifespan="on")
+        )
+        self.thread = threading.Thread(target=self.uvicorn.run, daemon=True)
+
+    def __enter__(self) -> "_Server":
+        self.thread.start()
+        deadline = time.monotonic() + 10
+        while not (self.uvicorn.started and self.module.mqtt_client.connected):
+            if time.monotonic() > deadline:
+                raise RuntimeError("server did not connect to the broker")
+            time.sleep(0.05)
+        time.sleep(0.5)  # let the subscription settle
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.uvicorn.should_exit = True
+        self.thread.join(10)
+
+    def call(self, func, *args):
+        """Run a function on the server's event loop and wait for it."""
+        loop = self.module.mqtt_client.loop
+
+        async def run():
+            return func(*args)
+
+        return asyncio.run_coroutine_threadsafe(run(), loop).result()
+
+
+def run_broker(rate: float, args) -> dict:
+    """Publish to the broker at ``rate`` msg/s while reading over HTTP."""
+    host, port = args.broker.rsplit(":", 1)
+    probe = LatencyProbe()
+    with _Server(host, int(port)) as srv:
+        roamk = srv.module.roamk
+        srv.call(probe.attach, roamk)
+        for _ in range(args.subscribers):
+            srv.call(roamk.subscribe, _consumer(roamk))
+
+        publisher = mqtt.Client(
+            client_id="bench-ingest", callback_api_version=mqtt.CallbackAPIVersion.VERSION2
+        )
+        publisher.connect(host, int(port))
+        publisher.loop_start()
+
+        reads: list[float] = []
+        stop = threading.Event()
+
+        def reader() -> None:
+            url = f"http://127.0.0.1:{srv.port}/state"
+            interval = 1.0 / args.read_rate
+            while not stop.wait(interval):
+                t0 = time.perf_counter()
+                with urllib.request.urlopen(url) as response:
+                    response.read()
+                reads.append(time.perf_counter() - t0)
+
+        thread = threading.Thread(target=reader, daemon=True)
+        if args.read_rate:
+            thread.start()
+
+        generator = LoadGenerator(
+            lambda topic, payload: publisher.publish(topic, payload), args.corpus, rate, probe
+        )
+        elapsed = generator.run(args.duration)
+
+        # Give in-flight messages a moment to arrive
+        deadline = time.monotonic() + 5
+        while probe.sent and time.monotonic() < deadline:
+            time.sleep(0.05)
+        stop.set()
+        thread.join(2)
+        publisher.loop_stop()
+        publisher.disconnect()
+
+    reads.sort()
+    return {
+        "sent": generator.sent,
+        "elapsed": elapsed,
+        "probe": probe,
+        "reads": reads[len(reads) // 2] if reads else None,
+    }
+
+
+def main() -> None:
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mode", choices=("inproc", "broker"), default="inproc")
+    parser.add_argument("--rates", default="10000,50000,100000,500000")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per rate")
+    parser.add_argument("--broker", default="127.0.0.1:1883")
+    parser.add_argument("--subscribers", type=int, default=2, help="extra subscribers")
+    parser.add_argument("--read-rate", type=float, default=50.0, help="state reads per second")
+    args = parser.parse_args()
+    args.corpus = mock_corpus()
+
+    run = run_inproc if args.mode == "inproc" else run_broker
+    print(
+        f"{'target/s':>10} {'achieved/s':>11} {'p50 ms':>8} {'p99 ms':>8} "
+        f"{'probes lost':>11} {'read p50 ms':>11} {'rss MB':>7}"
+    )
+    for rate in (float(r) for r in args.rates.split(",")):
+        result = run(rate, args)
+        probe = result["probe"]
+        p50, p99 = probe.percentile(50), probe.percentile(99)
+        lost = len(probe.sent)
+        reads = result["reads"]
+        print(
+            f"{rate:>10,.0f} {result['sent'] / result['elapsed']:>11,.0f} "
+            f"{p50 * 1000 if p50 is not None else float('nan'):>8.2f} "
+            f"{p99 * 1000 if p99 is not None else float('nan'):>8.2f} "
+            f"{lost:>11} {reads * 1000 if reads else float('nan'):>11.2f} {_rss_mb():>7.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
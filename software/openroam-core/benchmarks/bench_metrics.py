@@ -0,0 +1,96 @@
+"""
+Instrumentation overhead benchmark
+
+Feeds mock traffic through MqttClient.handle with stage timing off and
+on, alternating runs and keeping the best of each. The extra cost of a
+timed message is measured with every message timed; dividing it by the
+sampling interval gives the expected overhead (the target is under 2%),
+which is too small to measure directly against run-to-run noise. Also
+reports the cost of rendering /metrics.
+
+Usage:
+    python benchmarks/bench_metrics.py [--messages N] [--runs N] [--sample-every N]
+"""
+
+import argparse
+import gc
+import time
+
+from openroam_core.loadgen import mock_corpus
+from openroam_core.metrics import Registry
+from openroam_core.mqtt_client import MqttClient
+from openroam_core.roamk import RoamK
+
+
+def _client() -> MqttClient:
+    client = MqttClient()
+    client.set_roamk(RoamK())
+    client.roamk.subscribe(lambda state, changed: None)
+    return client
+
+
+def _run(client: MqttClient, messages: list[tuple[str, bytes]]) -> float:
+    handle = client.handle
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for topic, payload in messages:
+            handle(topic, payload)
+        return time.perf_counter() - start
+    finally:
+        gc.enable()
+
+
+def main() -> None:
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--runs", type=int, default=11)
+    parser.add_argument("--sample-every", type=int, default=256)
+    args = parser.parse_args()
+
+    corpus = mock_corpus()
+    messages = (corpus * (args.messages // len(corpus) + 1))[: args.messages]
+
+    # One client toggled between runs, so every mode shares the same objects.
+    # Timing every message makes the cost of a sampled message large enough
+    # to measure reliably; the overhead at 1/N follows from it.
+    client = _client()
+    modes = {"off": None, "every": 1, "sampled": args.sample_every}
+    best = dict.fromkeys(modes, float("inf"))
+    for _ in range(args.runs):
+        for mode, sample_every in modes.items():
+            if sample_every is None:
+                client.disable_timing()
+            else:
+                client.enable_timing(sample_every)
+            best[mode] = min(best[mode], _run(client, messages) / args.messages)
+
+    base = best["off"]
+    per_sample = best["every"] - base
+    print(f"messages:           {args.messages:,}, best of {args.runs} runs")
+    print(f"timing off:         {base * 1e6:.3f} µs/msg")
+    print(f"timing every msg:   {best['every'] * 1e6:.3f} µs/msg (+{per_sample * 1e6:.2f} µs)")
+    print(
+        f"timing 1/{args.sample_every:<10} {best['sampled'] * 1e6:.3f} µs/msg measured, "
+        f"{(per_sample / args.sample_every) / base * 100:.2f}% overhead expected"
+    )
+    client.disable_timing()
+
+    registry = Registry()
+    registry.counter("messages_total", "", lambda: client.received)
+    registry.histogram("stage_seconds", "", lambda: client.timings, label="stage")
+    start = time.perf_counter()
+    body = registry.render()
+    render_ms = (time.perf_counter() - start) * 1000
+    print(f"render:             {render_ms:.3f} ms, {len(body):,} B")
+    for stage, histogram in client.timings.items():
+        if histogram.count:
+            print(
+                f"  {stage:<10} mean {histogram.sum / histogram.count * 1e6:7.2f} µs, "
+                f"p99 ≤ {histogram.quantile(0.99) * 1e6:g} µs"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+RoamK path access benchmark
+
+Compares the reflective path walk RoamK used originally against the
+precompiled accessors, using the paths and payload shapes the MQTT
+ingest actually produces.
+
+Usage:
+    python benchmarks/bench_roamk.py [--messages N]
+"""
+
+import argparse
+import time
+from datetime import datetime
+
+from openroam_core.mqtt_client import TOPIC_MAP
+from openroam_core.roamk import RoamK
+
+
+class ReflectiveRoamK(RoamK):
+    """RoamK with the original split/hasattr/getattr path walk."""
+
+    def update_path(self, path: str, value: any) -> None:
+        parts = path.split(".")
+        obj = self.state
+
+        for part in parts[:-1]:
+            if hasattr(obj, part):
+                obj = getattr(obj, part)
+            else:
+                return
+
+        if hasattr(obj, parts[-1]):
+            setattr(obj, parts[-1], value)
+            self.state.last_update = datetime.now()
+            self._record_change(path)
+
+    def get_path(self, path: str) -> any:
+        parts = path.split(".")
+        obj = self.state
+
+        for part in parts:
+            if hasattr(obj, part):
+                obj = getattr(obj, part)
+            else:
+                return None
+
+        return obj
+
+
+def _workload(count: int) -> list[tuple[str, any]]:
+    """Build a list of (path, value) updates cycling through TOPIC_MAP."""
+    paths = list(TOPIC_MAP.values())
+    samples = {
+        "power.shore_connected": False,
+        "power.alternator_charging": True,
+        "climate.hvac_running": False,
+        "engine.check_engine": False,
+        "climate.hvac_mode": "auto",
+        "safety.smoke_status": "ok",
+    }
+    return [(paths[i % len(paths)], samples.get(paths[i % len(paths)], 12.5)) for i in range(count)]
+
+
+def _run(store: RoamK, workload: list[tuple[str, any]]) -> tuple[float, float]:
+    """Return (updates/s, gets/s) for one store."""
+    start = time.perf_counter()
+    for path, value in workload:
+        store.update_path(path, value)
+    update_rate = len(workload) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for path, _ in workload:
+        store.get_path(path)
+    get_rate = len(workload) / (time.perf_counter() - start)
+
+    return update_rate, get_rate
+
+
+def main() -> None:
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=500_000)
+    args = parser.parse_args()
+
+    workload = _workload(args.messages)
+
+    reflective = ReflectiveRoamK()
+    compiled = RoamK()
+    compiled.compile_paths(TOPIC_MAP.values())
+
+    before_update, before_get = _run(reflective, workload)
+    after_update, after_get = _run(compiled, workload)
+
+    print(f"{'':12} {'update_path msg/s':>20} {'get_path req/s':>20}")
+    print(f"{'reflective':12} {before_update:>20,.0f} {before_get:>20,.0f}")
+    print(f"{'compiled':12} {after_update:>20,.0f} {after_get:>20,.0f}")
+    print(f"{'speedup':12} {after_update / before_update:>19.2f}x {after_get / before_get:>19.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Sharded ingest scaling benchmark
+
+Runs the sharded ingest path without a broker: each worker process
+builds a ShardWorker for its subsystems and feeds its share of the mock
+corpus through MqttClient.handle, publishing every change to shared
+memory, while this process polls and applies the changes to its RoamK
+as the server does. The total message count is fixed, so with one core
+per worker the aggregate rate should grow close to linearly with the
+number of workers. Also reports a single in-process MqttClient for
+reference.
+
+Usage:
+    python benchmarks/bench_sharding.py [--messages N] [--max-workers N] [--poll-ms MS]
+"""
+
+import argparse
+import functools
+import multiprocessing
+import os
+import time
+
+from openroam_core.loadgen import mock_corpus
+from openroam_core.mqtt_client import SUBSYSTEMS, MqttClient
+from openroam_core.roamk import RoamK
+from openroam_core.sharding import ShardedIngest, ShardWorker, assign_subsystems
+
+
+def _subsystem(topic: str) -> str:
+    return topic.split("/")[1]
+
+
+def _feed(shared_name, shards, shard, subsystems, mqtt, conn, messages, ready, results) -> None:
+    """Worker entry point: handle ``messages`` messages of this shard's subsystems."""
+    worker = ShardWorker(shared_name, shards, shard, subsystems, conn)
+    corpus = [m for m in mock_corpus() if _subsystem(m[0]) in subsystems]
+    feed = (corpus * (messages // len(corpus) + 1))[:messages]
+    handle = worker.client.handle
+    ready.wait()
+    start = time.perf_counter()
+    for topic, payload in feed:
+        handle(topic, payload)
+    results.put((start, time.perf_counter(), worker.client.received))
+    worker.close()
+    try:
+        conn.recv()
+    except EOFError:
+        pass
+
+
+def _inline(messages: list[tuple[str, bytes]]) -> float:
+    client = MqttClient()
+    client.set_roamk(RoamK())
+    handle = client.handle
+    start = time.perf_counter()
+    for topic, payload in messages:
+        handle(topic, payload)
+    return len(messages) / (time.perf_counter() - start)
+
+
+def _sharded(workers: int, args) -> tuple[float, int, float, int]:
+    """(aggregate msg/s, fields applied, server CPU share, read retries)."""
+    context = multiprocessing.get_context("spawn")
+    ready = context.Barrier(workers + 1)
+    results = context.Queue()
+    roamk = RoamK()
+    ingest = ShardedIngest(
+        roamk,
+        assign_subsystems(workers),
+        poll_interval=args.poll_ms / 1000,
+        target=functools.partial(
+            _feed, messages=args.messages // workers, ready=ready, results=results
+        ),
+    )
+    ingest.start()
+    try:
+        ready.wait()
+        cpu = time.process_time()
+        wall = time.perf_counter()
+        done = []
+        while len(done) < workers:
+            ingest.poll()
+            while not results.empty():
+                done.append(results.get())
+            time.sleep(ingest.poll_interval)
+        ingest.poll()
+        cpu = (time.process_time() - cpu) / (time.perf_counter() - wall)
+
+        start = min(r[0] for r in done)
+        end = max(r[1] for r in done)
+        handled = sum(r[2] for r in done)
+        return handled / (end - start), ingest.applied, cpu, ingest.shared.retries
+    finally:
+        ingest.stop()
+
+
+def main() -> None:
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=300_000)
+    parser.add_argument(
+        "--max-workers", type=int, default=min(len(SUBSYSTEMS), os.cpu_count() or 1)
+    )
+    parser.add_argument("--poll-ms", type=float, default=10.0)
+    args = parser.parse_args()
+
+    corpus = mock_corpus()
+    messages = (corpus * (args.messages // len(corpus) + 1))[: args.messages]
+    print(f"cores: {os.cpu_count()}, messages: {args.messages:,}")
+    print(f"in-process:  {_inline(messages):>12,.0f} msg/s")
+    print(
+        f"{'workers':<8} {'msg/s':>12} {'speedup':>8} {'applied':>10} "
+        f"{'server cpu':>10} {'retries':>8}"
+    )
+    base = None
+    for workers in range(1, args.max_workers + 1):
+        rate, applied, cpu, retries = _sharded(workers, args)
+        base = base or rate
+        print(
+            f"{workers:<8} {rate:>12,.0f} {rate / base:>7.2f}x {applied:>10,} "
+            f"{cpu * 100:>9.1f}% {retries:>8,}"
+        )
+
+
+if __name__ == "__main__":
+    main()
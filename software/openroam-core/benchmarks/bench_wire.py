@@ -0,0 +1,131 @@
+"""
+Binary wire format benchmark
+
+Compares binary frames (see openroam_core/wire.py) with the JSON the
+server sends today, over RoamK state built from the mock corpus:
+
+- a full snapshot (GET /state)
+- one mock round of changes as a stream delta (/ws and /events)
+- the same round over MQTT: one text message per value, as the mock
+  publishes it, against one delta frame on openroam/delta
+
+Sizes are reported raw and zlib-compressed, with encode and decode times.
+
+Usage:
+    python benchmarks/bench_wire.py [--rounds N] [--repeat N]
+"""
+
+import argparse
+import json
+import time
+import zlib
+from dataclasses import fields
+
+from openroam_core import wire
+from openroam_core.loadgen import mock_corpus
+from openroam_core.mqtt_client import FRAME_TOPIC, MqttClient
+from openroam_core.roamk import RoamK, encode_json
+
+
+def _mqtt_size(topic: str, payload: bytes) -> int:
+    """Bytes of a QoS 0 PUBLISH packet: fixed header, topic, payload."""
+    remaining = 2 + len(topic.encode()) + len(payload)
+    return 1 + (1 if remaining < 128 else 2) + remaining
+
+
+def _time(func, repeat: int) -> float:
+    """Microseconds per call."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def _rounds(corpus: list[tuple[str, bytes]]) -> list[list[tuple[str, bytes]]]:
+    """Split the corpus into mock rounds, each starting with its first topic."""
+    rounds: list[list[tuple[str, bytes]]] = []
+    for message in corpus:
+        if message[0] == corpus[0][0]:
+            rounds.append([])
+        rounds[-1].append(message)
+    return rounds
+
+
+def _row(name: str, json_size: float, frame_size: float) -> None:
+    print(f"  {name:<24} {json_size:>10,.0f} {frame_size:>10,.0f} {frame_size / json_size:>8.0%}")
+
+
+def main() -> None:
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    roamk = RoamK()
+    client = MqttClient()
+    client.set_roamk(roamk)
+    changed: set[str] = set()
+    roamk.subscribe(lambda state, paths: changed.update(paths))
+
+    deltas = []
+    mqtt_json = mqtt_frame = 0
+    for messages in _rounds(mock_corpus(rounds=args.rounds)):
+        changed.clear()
+        for topic, payload in messages:
+            client.handle(topic, payload)
+        delta = {path: roamk.get_path(path) for path in changed}
+        deltas.append(delta)
+        mqtt_json += sum(_mqtt_size(topic, payload) for topic, payload in messages)
+        mqtt_frame += _mqtt_size(FRAME_TOPIC, wire.encode_frame(delta))
+
+    state = roamk.state
+    sections = [(f.name, getattr(state, f.name)) for f in fields(state)]
+    snapshot_json = encode_json(state)
+    snapshot_frame = wire.encode_frame(sections)
+
+    def delta_json(delta: dict) -> bytes:
+        changes = b",".join(encode_json(p) + b":" + encode_json(v) for p, v in delta.items())
+        return b'{"type":"delta","version":%d,"changes":{%s}}' % (roamk.version, changes)
+
+    json_deltas = [delta_json(d) for d in deltas]
+    frame_deltas = [wire.encode_frame(d, roamk.version) for d in deltas]
+    n = len(deltas)
+
+    print(f"paths in dictionary: {len(wire.PATHS)}, rounds: {n}")
+    print(f"\n{'bytes':<26} {'JSON':>10} {'frame':>10} {'ratio':>8}")
+    _row("snapshot", len(snapshot_json), len(snapshot_frame))
+    _row("snapshot (zlib)", len(zlib.compress(snapshot_json)), len(zlib.compress(snapshot_frame)))
+    _row("delta per round", sum(map(len, json_deltas)) / n, sum(map(len, frame_deltas)) / n)
+    _row(
+        "delta per round (zlib)",
+        sum(len(zlib.compress(d)) for d in json_deltas) / n,
+        sum(len(zlib.compress(d)) for d in frame_deltas) / n,
+    )
+    _row("MQTT per round", mqtt_json / n, mqtt_frame / n)
+
+    repeat = args.repeat
+    delta = deltas[-1]
+    json_delta = json_deltas[-1]
+    frame_delta = frame_deltas[-1]
+    print(f"\n{'microseconds':<26} {'JSON':>10} {'frame':>10}")
+    print(
+        f"  {'snapshot encode':<24} {_time(lambda: encode_json(state), repeat):>10.1f} "
+        f"{_time(lambda: wire.encode_frame(sections), repeat):>10.1f}"
+    )
+    print(
+        f"  {'snapshot decode':<24} {_time(lambda: json.loads(snapshot_json), repeat):>10.1f} "
+        f"{_time(lambda: wire.decode_frame(snapshot_frame), repeat):>10.1f}"
+    )
+    print(
+        f"  {'delta encode':<24} {_time(lambda: delta_json(delta), repeat):>10.1f} "
+        f"{_time(lambda: wire.encode_frame(delta, roamk.version), repeat):>10.1f}"
+    )
+    print(
+        f"  {'delta decode':<24} {_time(lambda: json.loads(json_delta), repeat):>10.1f} "
+        f"{_time(lambda: wire.decode_frame(frame_delta), repeat):>10.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
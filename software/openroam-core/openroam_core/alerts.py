@@ -0,0 +1,374 @@
+"""
+Alert Rules
+
+Evaluates alert rules incrementally as RoamK changes. Rules come from
+config and are compiled into an index from RoamK path to the rules that
+read it, so an update re-evaluates only the rules for the paths it
+changed. Rule paths may use shell-style wildcards (``tanks.*.level``);
+each concrete path matched then gets its own alert (wildcard rules see
+writes to matching paths, not to a whole subtree above them).
+
+A rule has one condition:
+
+    above / below        numeric threshold, with optional hysteresis:
+                         clear_below / clear_above (default: the threshold)
+    equals / one_of      value equality, e.g. smoke_status one_of [warning, alarm]
+    rate_above /         rate of change in units per minute, measured over
+    rate_below           ``window`` seconds
+
+and optionally ``for``: the condition must hold that many seconds before
+the alert is raised. Rate rules are also re-evaluated on each tick against
+the last value, so a rate decays to 0 once the path stops changing.
+Raised and cleared alerts are published as retained JSON on
+``<topic>/<alert name>``. Alerts that start out inactive have their retained message cleared
+(an empty payload), so an alarm raised before a restart does not stay on the
+broker after its condition has gone.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from fnmatch import fnmatchcase
+from typing import Any, Callable, Iterable, Mapping, Optional
+
+from .roamk import RoamK, RoamKState, Subscription
+
+logger = logging.getLogger(__name__)
+
+SEVERITIES = ("info", "warning", "critical")
+
+# Used when the config does not list any rules
+DEFAULT_RULES: list[dict[str, Any]] = [
+    {"name": "smoke", "path": "safety.smoke_status", "one_of": ["warning", "alarm"]},
+    {"name": "co_high", "path": "safety.co_ppm", "above": 35, "clear_below": 25, "for": 30},
+    {"name": "co_alarm", "path": "safety.co_ppm", "above": 100, "clear_below": 70},
+    {
+        "name": "propane_leak",
+        "path": "safety.propane_ppm",
+        "above": 2000,
+        "clear_below": 1000,
+    },
+    {
+        "name": "fresh_low",
+        "path": "tanks.fresh.level",
+        "below": 10,
+        "clear_above": 15,
+        "severity": "warning",
+    },
+    {
+        "name": "grey_full",
+        "path": "tanks.grey.level",
+        "above": 90,
+        "clear_below": 80,
+        "severity": "warning",
+    },
+    {
+        "name": "black_full",
+        "path": "tanks.black.level",
+        "above": 90,
+        "clear_below": 80,
+        "severity": "warning",
+    },
+    {
+        "name": "propane_low",
+        "path": "tanks.propane.level",
+        "below": 15,
+        "clear_above": 20,
+        "severity": "warning",
+    },
+    {
+        "name": "house_battery_low",
+        "path": "power.house_battery.soc",
+        "below": 20,
+        "clear_above": 25,
+        "for": 60,
+        "severity": "warning",
+    },
+]
+
+_CONDITIONS = ("above", "below", "equals", "one_of", "rate_above", "rate_below")
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class Rule:
+    """A compiled alert rule."""
+
+    def __init__(
+        self,
+        name: str,
+        path: str,
+        above: Optional[float] = None,
+        below: Optional[float] = None,
+        clear_below: Optional[float] = None,
+        clear_above: Optional[float] = None,
+        equals: Any = None,
+        one_of: Optional[Iterable[Any]] = None,
+        rate_above: Optional[float] = None,
+        rate_below: Optional[float] = None,
+        window: float = 60.0,
+        duration: float = 0.0,
+        severity: str = "critical",
+        message: Optional[str] = None,
+    ) -> None:
+        given = [
+            c
+            for c, v in zip(
+                _CONDITIONS, (above, below, equals, one_of, rate_above, rate_below), strict=True
+            )
+            if v is not None
+        ]
+        if len(given) != 1:
+            raise ValueError(f"Rule {name}: needs exactly one of {', '.join(_CONDITIONS)}")
+        if severity not in SEVERITIES:
+            raise ValueError(f"Rule {name}: severity must be one of {', '.join(SEVERITIES)}")
+        self.name = name
+        self.path = path
+        self.pattern = any(c in path for c in "*?[")
+        self.kind = given[0]
+        self.above = above
+        self.below = below
+        self.clear_below = above if clear_below is None else clear_below
+        self.clear_above = below if clear_above is None else clear_above
+        self.values = frozenset([equals] if one_of is None else one_of)
+        self.rate_above = rate_above
+        self.rate_below = rate_below
+        self.window = window
+        self.duration = duration
+        self.severity = severity
+        self.message = message
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "Rule":
+        """Build a rule from its config entry (``for`` sets the duration)."""
+        data = dict(data)
+        if "for" in data:
+            data["duration"] = data.pop("for")
+        try:
+            return cls(**data)
+        except TypeError as e:
+            raise ValueError(f"Rule {data.get('name', '?')}: {e}") from None
+
+    def condition(self, alert: "Alert", value: Any, now: float) -> bool:
+        """Whether the alert condition holds, given the alert's current state."""
+        kind = self.kind
+        if kind in ("equals", "one_of"):
+            return value in self.values
+        if not _is_number(value):
+            return False
+        if kind == "above":
+            return value > (self.clear_below if alert.active else self.above)
+        if kind == "below":
+            return value < (self.clear_above if alert.active else self.below)
+
+        rate = alert.rate(value, now, self.window)
+        if rate is None:
+            return alert.active
+        if kind == "rate_above":
+            return rate > self.rate_above
+        return rate < self.rate_below
+
+
+class Alert:
+    """The state of one rule for one concrete path."""
+
+    def __init__(self, rule: Rule, path: str) -> None:
+        self.rule = rule
+        self.path = path
+        self.name = rule.name if path == rule.path else f"{rule.name}/{path}"
+        self.active = False
+        self.since: Optional[float] = None  # wall-clock time of the last transition
+        self.value: Any = None
+        self.pending: Optional[float] = None  # monotonic time the condition started to hold
+        self._samples: Optional[deque[tuple[float, float]]] = None
+
+    def rate(self, value: float, now: float, window: float) -> Optional[float]:
+        """Change per minute over the window, or None until half of it is covered."""
+        samples = self._samples
+        if samples is None:
+            samples = self._samples = deque()
+        samples.append((now, value))
+        while now - samples[0][0] > window:
+            samples.popleft()
+        span = now - samples[0][0]
+        if span < window / 2:
+            return None
+        return (value - samples[0][1]) / span * 60
+
+    def to_dict(self) -> dict[str, Any]:
+        """JSON-ready alert state."""
+        rule = self.rule
+        return {
+            "name": self.name,
+            "rule": rule.name,
+            "path": self.path,
+            "active": self.active,
+            "severity": rule.severity,
+            "value": self.value,
+            "since": datetime.fromtimestamp(self.since).isoformat() if self.since else None,
+            "message": rule.message,
+        }
+
+
+class AlertEngine:
+    """Evaluates rules on RoamK changes and publishes alert transitions."""
+
+    def __init__(
+        self,
+        rules: Iterable[Rule],
+        publish: Optional[Callable[[str, str], None]] = None,
+        topic: str = "openroam/alerts",
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.rules = list(rules)
+        self.publish = publish
+        self.topic = topic.rstrip("/")
+        self.clock = clock
+        self.alerts: dict[str, Alert] = {}
+        self.evaluations = 0
+
+        # Dependency index: changed path -> alerts to re-evaluate. Exact rule
+        # paths are indexed up front; other changed paths (wildcard matches,
+        # replaced subtrees) are resolved the first time they are seen.
+        self._index: dict[str, list[Alert]] = {}
+        self._patterns = [rule for rule in self.rules if rule.pattern]
+        for rule in self.rules:
+            if not rule.pattern:
+                self._add(rule, rule.path)
+        self._pending: set[Alert] = set()
+        self._rates: set[Alert] = set()  # rate alerts with samples, re-evaluated on tick
+        self._lock = threading.Lock()
+        self._roamk: Optional[RoamK] = None
+        self._subscription: Optional[Subscription] = None
+
+    @classmethod
+    def from_config(
+        cls,
+        rules: Optional[list[dict]],
+        topic: str = "openroam/alerts",
+        publish: Optional[Callable[[str, str], None]] = None,
+    ) -> "AlertEngine":
+        """Compile rules from config entries (``DEFAULT_RULES`` when None)."""
+        entries = DEFAULT_RULES if rules is None else rules
+        return cls([Rule.from_dict(entry) for entry in entries], publish, topic)
+
+    def attach(self, roamk: RoamK) -> None:
+        """Evaluate rules whenever a RoamK path they read changes."""
+        self._roamk = roamk
+        self._subscription = roamk.subscribe(
+            self._on_change, paths=[rule.path for rule in self.rules]
+        )
+
+    def clear_inactive(self) -> None:
+        """Clear the retained messages of alerts that are not raised, e.g. on connect."""
+        with self._lock:
+            for alert in self.alerts.values():
+                if not alert.active:
+                    self._clear(alert)
+
+    def detach(self) -> None:
+        """Stop evaluating rules."""
+        if self._roamk is not None and self._subscription is not None:
+            self._roamk.unsubscribe(self._subscription)
+        self._subscription = None
+
+    def active(self) -> list[Alert]:
+        """Currently raised alerts, most severe first."""
+        raised = [alert for alert in self.alerts.values() if alert.active]
+        raised.sort(key=lambda a: (-SEVERITIES.index(a.rule.severity), a.since or 0))
+        return raised
+
+    def evaluate(self, path: str, get: Callable[[str], Any]) -> None:
+        """Re-evaluate the alerts that depend on a changed path."""
+        alerts = self._index.get(path)
+        if alerts is None:
+            alerts = self._resolve(path)
+        if not alerts:
+            return
+        with self._lock:
+            now = self.clock()
+            for alert in alerts:
+                self.evaluations += 1
+                value = alert.value = get(alert.path)
+                if alert.rule.kind in ("rate_above", "rate_below"):
+                    self._rates.add(alert)
+                self._step(alert, alert.rule.condition(alert, value, now), now)
+
+    def tick(self) -> None:
+        """Re-evaluate rate rules and raise ``for`` alerts that have held long enough."""
+        if not self._pending and not self._rates:
+            return
+        with self._lock:
+            now = self.clock()
+            for alert in self._rates:
+                # The value has not changed since it was last seen
+                self.evaluations += 1
+                self._step(alert, alert.rule.condition(alert, alert.value, now), now)
+            for alert in list(self._pending):
+                if now - alert.pending >= alert.rule.duration:
+                    self._set(alert, True)
+
+    def _on_change(self, state: RoamKState, changed: frozenset[str]) -> None:
+        get_path = self._roamk.get_path
+        for path in changed:
+            self.evaluate(path, get_path)
+
+    def _add(self, rule: Rule, path: str) -> Alert:
+        alert = Alert(rule, path)
+        self.alerts[alert.name] = alert
+        self._index.setdefault(path, []).append(alert)
+        return alert
+
+    def _resolve(self, path: str) -> list[Alert]:
+        """Index a changed path not seen before."""
+        with self._lock:
+            for rule in self._patterns:
+                if fnmatchcase(path, rule.path):
+                    self._clear(self._add(rule, path))
+            alerts = self._index.setdefault(path, [])
+            if not alerts:
+                # A replaced subtree: the alerts on paths below it
+                alerts.extend(
+                    alert
+                    for alert in self.alerts.values()
+                    if alert.path.startswith(path)
+                    and alert.path[len(path) : len(path) + 1] in (".", "[")
+                )
+            return alerts
+
+    def _step(self, alert: Alert, holds: bool, now: float) -> None:
+        if not holds:
+            alert.pending = None
+            self._pending.discard(alert)
+            if alert.active:
+                self._set(alert, False)
+            return
+        if alert.active:
+            return
+        if alert.pending is None:
+            alert.pending = now
+        if now - alert.pending >= alert.rule.duration:
+            self._set(alert, True)
+        else:
+            self._pending.add(alert)
+
+    def _clear(self, alert: Alert) -> None:
+        if self.publish is not None:
+            self.publish(f"{self.topic}/{alert.name}", "")
+
+    def _set(self, alert: Alert, active: bool) -> None:
+        alert.active = active
+        alert.since = time.time()
+        alert.pending = None
+        self._pending.discard(alert)
+        state = "raised" if active else "cleared"
+        level = logging.WARNING if active else logging.INFO
+        logger.log(level, f"Alert {alert.name} {state}: {alert.path} = {alert.value!r}")
+        if self.publish is not None:
+            payload = json.dumps(alert.to_dict(), default=str)
+            self.publish(f"{self.topic}/{alert.name}", payload)
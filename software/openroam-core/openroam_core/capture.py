@@ -0,0 +1,228 @@
+"""
+Message Capture Files
+
+A compact file format for streams of timestamped MQTT messages, used for
+simulated datasets and recorded traffic. Each topic string is written
+once and then referenced by a small integer, and timestamps are stored
+as microsecond deltas, so a typical telemetry message costs a few bytes
+plus its payload.
+
+Layout (all integers are unsigned LEB128 varints):
+
+    header:   b"ORCAP1\\n" + float64 start time (Unix seconds, little-endian)
+    topic:    0x00, topic id, length, topic bytes
+    message:  0x01, topic id, microseconds since previous message, length, payload
+
+Opening a writer in append mode starts a new segment with its own
+header and topic table, so recordings can be appended across restarts.
+A record cut off by a crash ends the read with a warning. Files ending
+in ``.gz`` are gzip-compressed transparently.
+"""
+
+import gzip
+import logging
+import struct
+import time
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"ORCAP1\n"
+
+_TOPIC = 0
+_MESSAGE = 1
+
+
+def _open(path: str, mode: str) -> BinaryIO:
+    if str(path).endswith(".gz"):
+        return gzip.open(path, mode + "b", compresslevel=6)
+    return open(path, mode + "b", buffering=1 << 16)
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+class CaptureWriter:
+    """Writes messages to a capture file.
+
+    With ``flush_interval``, buffered data is flushed to the OS at most
+    that many seconds after it was written.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        start: Optional[float] = None,
+        append: bool = False,
+        flush_interval: Optional[float] = None,
+    ) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        if append and not str(path).endswith(".gz") and Path(path).exists():
+            # A crash may have left half a record; appending after it would corrupt the file
+            removed = repair_capture(path)
+            if removed:
+                logger.warning(f"Removed {removed} bytes of partial record from {path}")
+        self._file = _open(path, "a" if append else "w")
+        self.flush_interval = flush_interval
+        self._flushed = time.monotonic()
+        self._start = start
+        self._last_us: Optional[int] = None
+        self._topics: dict[str, int] = {}
+        self.count = 0
+
+    def write(self, timestamp: float, topic: str, payload: bytes) -> None:
+        """Append one message; timestamps must not go backwards."""
+        if self._last_us is None:
+            if self._start is None:
+                self._start = timestamp
+            self._file.write(MAGIC + struct.pack("<d", self._start))
+            self._last_us = 0
+
+        topic_id = self._topics.get(topic)
+        if topic_id is None:
+            topic_id = self._topics[topic] = len(self._topics)
+            encoded = topic.encode()
+            self._file.write(bytes((_TOPIC,)) + _varint(topic_id) + _varint(len(encoded)) + encoded)
+
+        offset_us = max(self._last_us, round((timestamp - self._start) * 1e6))
+        self._file.write(
+            bytes((_MESSAGE,))
+            + _varint(topic_id)
+            + _varint(offset_us - self._last_us)
+            + _varint(len(payload))
+            + payload
+        )
+        self._last_us = offset_us
+        self.count += 1
+
+        if self.flush_interval is not None:
+            now = time.monotonic()
+            if now - self._flushed >= self.flush_interval:
+                self._file.flush()
+                self._flushed = now
+
+    def close(self) -> None:
+        """Flush and close the file."""
+        if self._last_us is None:
+            # Still write a valid (empty) capture
+            self._file.write(MAGIC + struct.pack("<d", self._start or 0.0))
+        self._file.close()
+
+    def __enter__(self) -> "CaptureWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    """Decode a varint at ``pos``; raises IndexError if it is incomplete."""
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _scan(path: str, chunk_size: int) -> Iterator[tuple[int, Optional[tuple]]]:
+    """Yield (end offset, message or None) for every complete record."""
+    header = len(MAGIC) + 8
+    with _open(path, "r") as f:
+        data = f.read(header)
+        if len(data) < header or not data.startswith(MAGIC):
+            raise ValueError(f"Not a capture file: {path}")
+
+        start = 0.0
+        topics: list[str] = []
+        offset_us = 0
+        base = 0  # file offset of data[0]
+        pos = 0
+        eof = False
+        while True:
+            record = pos
+            try:
+                kind = data[pos]
+                message = None
+                if kind == MAGIC[0]:
+                    # Segment header: new start time and topic table
+                    if len(data) < pos + header:
+                        raise IndexError
+                    if not data.startswith(MAGIC, pos):
+                        raise ValueError(f"Corrupt capture file {path}")
+                    (start,) = struct.unpack_from("<d", data, pos + len(MAGIC))
+                    topics = []
+                    offset_us = 0
+                    pos += header
+                elif kind == _TOPIC:
+                    _, pos = _read_varint(data, pos + 1)
+                    length, pos = _read_varint(data, pos)
+                    if pos + length > len(data):
+                        raise IndexError
+                    topics.append(data[pos : pos + length].decode())
+                    pos += length
+                elif kind == _MESSAGE:
+                    topic_id, pos = _read_varint(data, pos + 1)
+                    delta, pos = _read_varint(data, pos)
+                    length, pos = _read_varint(data, pos)
+                    if pos + length > len(data):
+                        raise IndexError
+                    if topic_id >= len(topics):
+                        # Not a truncated record: no topic record defined this id
+                        raise ValueError(f"Corrupt capture file {path}")
+                    offset_us += delta
+                    message = (start + offset_us / 1e6, topics[topic_id], data[pos : pos + length])
+                    pos += length
+                else:
+                    raise ValueError(f"Corrupt capture file {path}")
+            except IndexError:
+                # Record runs past the buffer: keep its start and read more
+                if eof:
+                    if record < len(data):
+                        logger.warning(f"Capture file {path} ends in a partial record")
+                    return
+                try:
+                    chunk = f.read(chunk_size)
+                except EOFError:
+                    # Truncated gzip stream
+                    chunk = b""
+                eof = not chunk
+                base += record
+                data = data[record:] + chunk
+                pos = 0
+                continue
+            yield base + pos, message
+
+
+def read_capture(path: str, chunk_size: int = 1 << 20) -> Iterator[tuple[float, str, bytes]]:
+    """Yield (timestamp, topic, payload) for every message in a capture file."""
+    for _, message in _scan(path, chunk_size):
+        if message is not None:
+            yield message
+
+
+def repair_capture(path: str) -> int:
+    """Cut a partial record off the end of an uncompressed capture file.
+
+    Returns the number of bytes removed.
+    """
+    size = Path(path).stat().st_size
+    if size == 0:
+        return 0
+    end = len(MAGIC) + 8
+    for offset, _ in _scan(path, 1 << 20):
+        end = offset
+    if end < size:
+        with open(path, "r+b") as f:
+            f.truncate(end)
+    return size - end
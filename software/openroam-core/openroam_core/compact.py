@@ -0,0 +1,287 @@
+"""
+Compact RoamK State
+
+An alternative RoamKState representation for processes that hold many
+states at once. Every numeric field (float, int, bool, datetime and their
+Optional forms) lives at a fixed index in one flat preallocated
+``array('d')``, with a parallel array holding the monotonic time each
+field was last written. Strings, lists and dicts stay Python objects in
+a side list.
+
+The nested objects (``state.power.house_battery`` ...) are generated
+slotted views over those arrays that keep the dataclass attribute API,
+so RoamK paths, ``dataclasses.asdict`` and the JSON snapshots work
+unchanged. Copying a whole state is a buffer copy.
+
+Only the root view is stored; nested views are three-slot objects
+created on attribute access, so a state costs its arrays, object slots
+and one view. Views are not identical across accesses (``state.power is
+not state.power``) but compare equal, and RoamK's compiled accessors keep
+theirs, so path reads and writes do not create any.
+
+Optional numeric fields store None as NaN, so a NaN written to such a
+field reads back as None. Datetimes are stored as Unix timestamps.
+"""
+
+import copy
+import time
+from array import array
+from dataclasses import fields, is_dataclass
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+from .roamk import _HINTS_CACHE, RoamKState, _field_hints, _unwrap_optional
+
+_NAN = float("nan")
+
+
+def _zeros(count: int) -> array:
+    return array("d", bytes(8 * count))
+
+
+class CompactStore:
+    """Value, timestamp and object storage behind one compact state."""
+
+    __slots__ = ("layout", "values", "stamps", "objects")
+
+    def __init__(self, layout: "CompactLayout") -> None:
+        self.layout = layout
+        self.values = _zeros(layout.n_values)
+        # Numeric fields first, then object fields
+        self.stamps = _zeros(layout.n_values + layout.n_objects)
+        self.objects: list[Any] = [None] * layout.n_objects
+
+    def snapshot(self) -> tuple[array, array, list]:
+        """Copy the whole state: two buffer copies plus the object slots."""
+        return self.values[:], self.stamps[:], copy.deepcopy(self.objects)
+
+    def restore(self, snapshot: tuple[array, array, list]) -> None:
+        """Load a snapshot taken from a store with the same layout."""
+        values, stamps, objects = snapshot
+        self.values[:] = values
+        self.stamps[:] = stamps
+        self.objects[:] = copy.deepcopy(objects)
+
+    def timestamp(self, path: str) -> Optional[float]:
+        """Monotonic time a leaf field was last written, None if never."""
+        index = self.layout.index.get(path)
+        if index is None:
+            return None
+        return self.stamps[index] or None
+
+
+class CompactView:
+    """Base class for the generated views over a CompactStore."""
+
+    __slots__ = ("_store", "_base", "_obase")
+
+    def __repr__(self) -> str:
+        body = ", ".join(f"{f.name}={getattr(self, f.name)!r}" for f in fields(self))
+        return f"{type(self).__name__}({body})"
+
+    def __eq__(self, other: object) -> bool:
+        if not is_dataclass(other) or other.__dataclass_fields__ is not self.__dataclass_fields__:
+            return NotImplemented
+        return all(getattr(self, f.name) == getattr(other, f.name) for f in fields(self))
+
+    __hash__ = None
+
+
+def _codec(tp: Any, optional: bool) -> tuple[Callable[[float], Any], Callable[[Any], float]]:
+    """(decode, encode) functions between a field type and a stored float."""
+    decode: Callable[[float], Any]
+    if tp is bool:
+        decode = bool
+    elif tp is int:
+        decode = int
+    elif tp is datetime:
+        decode = datetime.fromtimestamp
+    else:
+        decode = float
+    encode = datetime.timestamp if tp is datetime else float
+
+    if not optional:
+        return decode, encode
+
+    def decode_optional(v: float) -> Any:
+        return None if v != v else decode(v)
+
+    def encode_optional(value: Any) -> float:
+        return _NAN if value is None else encode(value)
+
+    return decode_optional, encode_optional
+
+
+def _value_property(offset: int, tp: Any, optional: bool) -> property:
+    decode, encode = _codec(tp, optional)
+
+    def fget(self: CompactView) -> Any:
+        return decode(self._store.values[self._base + offset])
+
+    def fset(self: CompactView, value: Any) -> None:
+        store = self._store
+        index = self._base + offset
+        store.values[index] = encode(value)
+        store.stamps[index] = time.monotonic()
+
+    return property(fget, fset)
+
+
+def _object_property(offset: int) -> property:
+    def fget(self: CompactView) -> Any:
+        return self._store.objects[self._obase + offset]
+
+    def fset(self: CompactView, value: Any) -> None:
+        store = self._store
+        index = self._obase + offset
+        store.objects[index] = value
+        store.stamps[store.layout.n_values + index] = time.monotonic()
+
+    return property(fget, fset)
+
+
+def _child_property(child: "_TypeLayout", offset: int, ooffset: int) -> property:
+    def fget(self: CompactView) -> Any:
+        return child.build(self._store, self._base + offset, self._obase + ooffset)
+
+    def fset(self: CompactView, value: Any) -> None:
+        # Replacing a subtree copies its fields into the existing slots
+        view = fget(self)
+        for f in fields(view):
+            setattr(view, f.name, getattr(value, f.name))
+
+    return property(fget, fset)
+
+
+def _touch(self: CompactView) -> None:
+    """Set last_update to now without building a datetime."""
+    store = self._store
+    index = store.layout.updated_index
+    store.values[index] = time.time()
+    store.stamps[index] = time.monotonic()
+
+
+class _TypeLayout:
+    """Generated view class and field offsets for one dataclass type."""
+
+    def __init__(self, schema: type) -> None:
+        self.schema = schema
+        self.view: type = CompactView
+        self.n_values = 0
+        self.n_objects = 0
+        # (field name, "value" | "object" | child _TypeLayout, value offset, object offset)
+        self.members: list[tuple[str, Any, int, int]] = []
+
+    def build(self, store: CompactStore, base: int, obase: int) -> CompactView:
+        view = object.__new__(self.view)
+        view._store = store
+        view._base = base
+        view._obase = obase
+        return view
+
+
+_NUMERIC = (float, int, bool, datetime)
+
+
+class CompactLayout:
+    """Field-to-index assignment for a dataclass state tree.
+
+    ``index`` maps every leaf path to its position in the store's
+    timestamp array; numeric leaves share that index in ``values``.
+    """
+
+    def __init__(self, schema: type = RoamKState) -> None:
+        self.schema = schema
+        self._types: dict[type, _TypeLayout] = {}
+        self.root = self._layout(schema)
+        self.n_values = self.root.n_values
+        self.n_objects = self.root.n_objects
+        self.index: dict[str, int] = {}
+        self._assign(self.root, "", 0, 0)
+        # Store holding the dataclass defaults, copied into new states
+        self._defaults: Optional[CompactStore] = None
+        self.updated_index = self.index.get("last_update")
+        if self.updated_index is not None and self.updated_index < self.n_values:
+            self.root.view.touch = _touch
+
+    def _layout(self, schema: type) -> _TypeLayout:
+        layout = self._types.get(schema)
+        if layout is not None:
+            return layout
+        layout = _TypeLayout(schema)
+        namespace: dict[str, Any] = {}
+
+        for name, hint in _field_hints(schema).items():
+            tp, optional = _unwrap_optional(hint)
+            if is_dataclass(tp):
+                child = self._layout(tp)
+                layout.members.append((name, child, layout.n_values, layout.n_objects))
+                namespace[name] = _child_property(child, layout.n_values, layout.n_objects)
+                layout.n_values += child.n_values
+                layout.n_objects += child.n_objects
+            elif tp in _NUMERIC:
+                layout.members.append((name, "value", layout.n_values, 0))
+                namespace[name] = _value_property(layout.n_values, tp, optional)
+                layout.n_values += 1
+            else:
+                layout.members.append((name, "object", 0, layout.n_objects))
+                namespace[name] = _object_property(layout.n_objects)
+                layout.n_objects += 1
+
+        namespace["__slots__"] = ()
+        namespace["__doc__"] = f"Compact view of {schema.__name__}."
+        # Lets fields(), asdict() and RoamK path compilation treat views as dataclasses
+        namespace["__dataclass_fields__"] = schema.__dataclass_fields__
+        namespace["__dataclass_params__"] = schema.__dataclass_params__
+        layout.view = type(f"Compact{schema.__name__}", (CompactView,), namespace)
+        _HINTS_CACHE[layout.view] = _field_hints(schema)
+
+        self._types[schema] = layout
+        return layout
+
+    def _assign(self, layout: _TypeLayout, prefix: str, base: int, obase: int) -> None:
+        for name, kind, offset, ooffset in layout.members:
+            path = prefix + name
+            if kind == "value":
+                self.index[path] = base + offset
+            elif kind == "object":
+                self.index[path] = self.n_values + obase + ooffset
+            else:
+                self._assign(kind, path + ".", base + offset, obase + ooffset)
+
+
+_default_layout: Optional[CompactLayout] = None
+
+
+def default_layout() -> CompactLayout:
+    """The shared layout for RoamKState."""
+    global _default_layout
+    if _default_layout is None:
+        _default_layout = CompactLayout(RoamKState)
+    return _default_layout
+
+
+def compact_state(layout: Optional[CompactLayout] = None) -> CompactView:
+    """Create a compact state initialised to the dataclass defaults."""
+    if layout is None:
+        layout = default_layout()
+
+    template = layout._defaults
+    if template is None:
+        template = CompactStore(layout)
+        view = layout.root.build(template, 0, 0)
+        defaults = layout.schema()
+        for f in fields(view):
+            setattr(view, f.name, getattr(defaults, f.name))
+        # Defaults do not count as writes
+        template.stamps[:] = _zeros(len(template.stamps))
+        layout._defaults = template
+
+    store = CompactStore(layout)
+    store.restore((template.values, template.stamps, template.objects))
+    return layout.root.build(store, 0, 0)
+
+
+def store_of(state: CompactView) -> CompactStore:
+    """The CompactStore behind a compact state or any of its views."""
+    return state._store
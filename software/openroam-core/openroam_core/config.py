@@ -19,6 +19,7 @@ class MqttConfig:
     username: Optional[str] = None
     password: Optional[str] = None
     client_id: str = "openroam-core"
+    record_path: Optional[str] = None  # capture file for received messages
 
 
 @dataclass
@@ -29,6 +30,112 @@ class InfluxConfig:
     token: str = ""
     org: str = "openroam"
     bucket: str = "telemetry"
+    enabled: bool = False
+    batch_size: int = 500
+    flush_interval: float = 5.0
+    buffer_size: int = 50000
+    spool_dir: str = "/var/lib/openroam/influx-spool"
+    spool_max_mb: int = 100
+
+
+@dataclass
+class HistoryConfig:
+    """On-device history store configuration."""
+
+    enabled: bool = False
+    path: str = "/var/lib/openroam/history.db"
+    flush_interval: float = 5.0
+    raw_retention_days: float = 2
+    minute_retention_days: float = 30
+    hour_retention_days: float = 365
+
+
+@dataclass
+class FleetConfig:
+    """Fleet mode configuration (many vehicles in one server)."""
+
+    enabled: bool = False
+    compact: bool = False
+    max_vehicles: int = 1000
+    coalesce_window: Optional[float] = None
+    vehicles: list[str] = field(default_factory=list)
+
+
+@dataclass
+class PersistConfig:
+    """RoamK state snapshot and warm start configuration."""
+
+    enabled: bool = False
+    dir: str = "/var/lib/openroam/state"
+    snapshot_interval: float = 300.0  # seconds between full snapshots
+    wal_interval: float = 1.0  # seconds between write-ahead log appends
+    wal_max_kb: int = 1024  # snapshot early once the log is this large
+    fsync: bool = True
+    max_age: float = 0.0  # seconds; older values are not restored (0: no limit)
+
+
+@dataclass
+class StalenessConfig:
+    """Marking RoamK fields stale when their source stops reporting."""
+
+    enabled: bool = False
+    resolution: float = 1.0  # seconds per timer wheel slot
+    default_ttl: Optional[float] = None  # for paths no ttls entry matches; None never expires
+    ttls: Optional[dict] = None  # path pattern -> seconds; None uses staleness.DEFAULT_TTLS
+
+
+@dataclass
+class DispatchConfig:
+    """Queued subscriber dispatch configuration."""
+
+    workers: int = 4  # worker threads; 0 runs callbacks on the server's event loop
+    max_queue: int = 256  # queued calls per subscriber
+    policy: str = "coalesce_latest"  # or drop_oldest
+
+
+@dataclass
+class MetricsConfig:
+    """Prometheus metrics configuration."""
+
+    enabled: bool = True
+    sample_every: int = 256  # time ingest stages for one message in this many
+
+
+@dataclass
+class ShardingConfig:
+    """Multi-process ingest configuration."""
+
+    workers: int = 0  # ingest processes; 0 ingests in the server process
+    subsystems: Optional[list[list[str]]] = None  # per worker; default round-robin
+    poll_interval: float = 0.01  # seconds between applying worker changes
+
+
+@dataclass
+class AlertsConfig:
+    """Alert rule configuration."""
+
+    enabled: bool = False
+    topic: str = "openroam/alerts"
+    rules: Optional[list[dict]] = None  # None uses the built-in rules (see alerts.py)
+
+
+@dataclass
+class UplinkConfig:
+    """Store-and-forward uplink to the back office."""
+
+    enabled: bool = False
+    # http(s)://host/fleet/<vehicle>/delta or mqtt://host:port/openroam/<vehicle>/delta
+    url: str = ""
+    username: Optional[str] = None
+    password: Optional[str] = None
+    batch_interval: float = 60.0  # seconds of samples per uploaded batch
+    budget_bytes_per_hour: int = 0  # 0 is unlimited
+    compress: bool = True  # gzip each batch
+    spool_dir: str = "/var/lib/openroam/uplink-spool"
+    spool_max_mb: int = 50
+    moving_speed: float = 2.0  # vehicle.speed above which "moving" intervals apply
+    default_interval: Optional[float] = 60.0  # for paths no policy entry matches
+    policy: Optional[dict] = None  # path pattern -> interval; None uses uplink.DEFAULT_POLICY
 
 
 @dataclass
@@ -53,6 +160,15 @@ class Config:
 
     mqtt: MqttConfig = field(default_factory=MqttConfig)
     influx: InfluxConfig = field(default_factory=InfluxConfig)
+    history: HistoryConfig = field(default_factory=HistoryConfig)
+    fleet: FleetConfig = field(default_factory=FleetConfig)
+    persist: PersistConfig = field(default_factory=PersistConfig)
+    staleness: StalenessConfig = field(default_factory=StalenessConfig)
+    dispatch: DispatchConfig = field(default_factory=DispatchConfig)
+    metrics: MetricsConfig = field(default_factory=MetricsConfig)
+    sharding: ShardingConfig = field(default_factory=ShardingConfig)
+    alerts: AlertsConfig = field(default_factory=AlertsConfig)
+    uplink: UplinkConfig = field(default_factory=UplinkConfig)
     hardware: HardwareConfig = field(default_factory=HardwareConfig)
     server: ServerConfig = field(default_factory=ServerConfig)
 
@@ -82,6 +198,24 @@ class Config:
                     config.mqtt = MqttConfig(**data["mqtt"])
                 if "influx" in data:
                     config.influx = InfluxConfig(**data["influx"])
+                if "history" in data:
+                    config.history = HistoryConfig(**data["history"])
+                if "fleet" in data:
+                    config.fleet = FleetConfig(**data["fleet"])
+                if "persist" in data:
+                    config.persist = PersistConfig(**data["persist"])
+                if "staleness" in data:
+                    config.staleness = StalenessConfig(**data["staleness"])
+                if "dispatch" in data:
+                    config.dispatch = DispatchConfig(**data["dispatch"])
+                if "metrics" in data:
+                    config.metrics = MetricsConfig(**data["metrics"])
+                if "sharding" in data:
+                    config.sharding = ShardingConfig(**data["sharding"])
+                if "alerts" in data:
+                    config.alerts = AlertsConfig(**data["alerts"])
+                if "uplink" in data:
+                    config.uplink = UplinkConfig(**data["uplink"])
                 if "hardware" in data:
                     config.hardware = HardwareConfig(**data["hardware"])
                 if "server" in data:
@@ -102,6 +236,15 @@ class Config:
         data = {
             "mqtt": asdict(self.mqtt),
             "influx": asdict(self.influx),
+            "history": asdict(self.history),
+            "fleet": asdict(self.fleet),
+            "persist": asdict(self.persist),
+            "staleness": asdict(self.staleness),
+            "dispatch": asdict(self.dispatch),
+            "metrics": asdict(self.metrics),
+            "sharding": asdict(self.sharding),
+            "alerts": asdict(self.alerts),
+            "uplink": asdict(self.uplink),
             "hardware": asdict(self.hardware),
             "server": asdict(self.server),
         }
@@ -0,0 +1,246 @@
+"""
+Subscriber Dispatch
+
+Runs subscriber callbacks off the ingest path. Each dispatched callback
+gets its own bounded queue, drained by a thread pool or an asyncio loop,
+so a slow or failing subscriber only delays itself.
+
+When a queue is full, the overflow policy decides what is lost:
+
+    drop_oldest      the oldest queued call is discarded
+    coalesce_latest  calls with the same key are merged into the queued
+                     one (for RoamK notifications, the changed path sets
+                     are unioned), so nothing is lost for a key that is
+                     already queued; new keys beyond the limit evict the
+                     oldest
+
+Each queue keeps delivery, drop and error counts and a histogram of the
+time calls spent queued.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Hashable, Optional
+
+from .metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+DROP_OLDEST = "drop_oldest"
+COALESCE_LATEST = "coalesce_latest"
+POLICIES = (DROP_OLDEST, COALESCE_LATEST)
+
+# Calls run per drain before yielding the worker to other queues
+_DRAIN_BATCH = 64
+
+
+class QueuedCallback:
+    """A callback run through a bounded queue on a dispatcher.
+
+    ``key`` maps call arguments to the coalescing key (by default all
+    calls share one) and ``merge`` combines queued and new arguments for
+    the same key (by default the newest win).
+    """
+
+    def __init__(
+        self,
+        callback: Callable[..., Any],
+        submit: Callable[[Callable[[], None]], bool],
+        policy: str = COALESCE_LATEST,
+        max_queue: int = 256,
+        name: Optional[str] = None,
+        key: Optional[Callable[..., Hashable]] = None,
+        merge: Optional[Callable[[tuple, tuple], tuple]] = None,
+    ) -> None:
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.callback = callback
+        self.policy = policy
+        self.max_queue = max(1, max_queue)
+        self.name = name or getattr(callback, "__qualname__", repr(callback))
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.lag = Histogram()
+
+        self._submit = submit
+        self._key = key or (lambda *args: None)
+        self._merge = merge or (lambda old, new: new)
+        self._lock = threading.Lock()
+        self._scheduled = False
+        # drop_oldest: (enqueued, args); coalesce_latest: key -> [enqueued, args]
+        self._queue: deque[tuple[float, tuple]] = deque()
+        self._slots: dict[Hashable, list] = {}
+
+    def __call__(self, *args: Any) -> None:
+        """Queue a call; never blocks on the callback."""
+        now = time.monotonic()
+        with self._lock:
+            if self.policy == COALESCE_LATEST:
+                key = self._key(*args)
+                slot = self._slots.get(key)
+                if slot is not None:
+                    slot[1] = self._merge(slot[1], args)
+                else:
+                    if len(self._slots) >= self.max_queue:
+                        del self._slots[next(iter(self._slots))]
+                        self.dropped += 1
+                    self._slots[key] = [now, args]
+            else:
+                if len(self._queue) >= self.max_queue:
+                    self._queue.popleft()
+                    self.dropped += 1
+                self._queue.append((now, args))
+
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._schedule()
+
+    @property
+    def depth(self) -> int:
+        """Calls waiting to run."""
+        return len(self._slots) if self.policy == COALESCE_LATEST else len(self._queue)
+
+    @property
+    def oldest_age(self) -> float:
+        """Seconds the oldest waiting call has been queued (0 if none)."""
+        with self._lock:
+            if self._queue:
+                enqueued = self._queue[0][0]
+            elif self._slots:
+                enqueued = min(slot[0] for slot in self._slots.values())
+            else:
+                return 0.0
+        return time.monotonic() - enqueued
+
+    def _pop(self) -> Optional[tuple[float, tuple]]:
+        if self._queue:
+            return self._queue.popleft()
+        if self._slots:
+            key = next(iter(self._slots))
+            enqueued, args = self._slots.pop(key)
+            return enqueued, args
+        return None
+
+    def flush(self) -> None:
+        """Run every queued call now, in the calling thread."""
+        while self._run(_DRAIN_BATCH):
+            pass
+
+    def _drain(self) -> None:
+        if self._run(_DRAIN_BATCH):
+            # More queued: let other subscribers run first
+            self._schedule()
+
+    def _run(self, limit: int) -> bool:
+        """Run up to ``limit`` queued calls; True if more are waiting."""
+        for _ in range(limit):
+            with self._lock:
+                item = self._pop()
+                if item is None:
+                    self._scheduled = False
+                    return False
+            enqueued, args = item
+            self.lag.observe(time.monotonic() - enqueued)
+            try:
+                self.callback(*args)
+            except Exception:
+                self.errors += 1
+                if self.errors == 1 or self.errors % 1000 == 0:
+                    logger.exception(f"Subscriber {self.name} failed ({self.errors} errors)")
+            self.delivered += 1
+        return True
+
+    def _schedule(self) -> None:
+        if not self._submit(self._drain):
+            # Nothing will drain the queue; let the next call try again
+            with self._lock:
+                self._scheduled = False
+
+
+class Dispatcher:
+    """Runs queued callbacks on a thread pool or an asyncio loop."""
+
+    def __init__(
+        self,
+        workers: int = 4,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+        max_queue: int = 256,
+        policy: str = COALESCE_LATEST,
+    ) -> None:
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.loop = loop
+        self.max_queue = max_queue
+        self.policy = policy
+        self.callbacks: list[QueuedCallback] = []
+        self._pool: Optional[ThreadPoolExecutor] = None
+        if loop is None:
+            self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dispatch")
+
+    def wrap(
+        self,
+        callback: Callable[..., Any],
+        policy: Optional[str] = None,
+        max_queue: Optional[int] = None,
+        name: Optional[str] = None,
+        key: Optional[Callable[..., Hashable]] = None,
+        merge: Optional[Callable[[tuple, tuple], tuple]] = None,
+    ) -> QueuedCallback:
+        """Return a queued version of ``callback`` that runs on this dispatcher."""
+        queued = QueuedCallback(
+            callback,
+            self._submit,
+            policy or self.policy,
+            max_queue or self.max_queue,
+            name,
+            key,
+            merge,
+        )
+        self.callbacks = [*self.callbacks, queued]
+        return queued
+
+    def by_name(self) -> dict[str, QueuedCallback]:
+        """Queued callbacks by name, numbering duplicates (for metrics)."""
+        named: dict[str, QueuedCallback] = {}
+        for queued in self.callbacks:
+            name = queued.name
+            n = 1
+            while name in named:
+                n += 1
+                name = f"{queued.name}#{n}"
+            named[name] = queued
+        return named
+
+    def remove(self, queued: QueuedCallback) -> None:
+        """Stop reporting a queued callback (pending calls still run)."""
+        self.callbacks = [c for c in self.callbacks if c is not queued]
+
+    def close(self, wait: bool = False) -> None:
+        """Stop the worker threads after the calls already submitted.
+
+        With ``wait``, block until every queued call has run: drains cut
+        short by the shutdown are finished in the calling thread.
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=False)
+            if wait:
+                for queued in self.callbacks:
+                    queued.flush()
+
+    def _submit(self, func: Callable[[], None]) -> bool:
+        """Schedule a drain; False if the dispatcher or its loop is closed."""
+        try:
+            if self._pool is not None:
+                self._pool.submit(func)
+            else:
+                self.loop.call_soon_threadsafe(func)
+        except RuntimeError:
+            # Calls stay queued until a later submit succeeds, if ever
+            return False
+        return True
@@ -0,0 +1,125 @@
+"""
+Fleet Mode
+
+Hosts RoamK stores for many vehicles in one process, keyed by vehicle
+ID. Vehicles publish under ``openroam/<vehicle>/...`` with the same
+topic layout as a single install; the MQTT client strips the vehicle
+level and routes the rest through the shared topic router, so routing
+and decoding caches are shared by the whole fleet.
+
+Vehicles are created on their first mapped message, up to
+``max_vehicles``. The aggregate view serializes a few summary paths per
+vehicle and caches each vehicle's fragment until that vehicle changes.
+"""
+
+import logging
+import re
+import time
+from typing import Iterable, Optional
+
+from .config import FleetConfig
+from .mqtt_client import TOPIC_MAP
+from .roamk import RoamK, encode_json
+
+logger = logging.getLogger(__name__)
+
+# Vehicle IDs are one topic level and one URL segment
+VEHICLE_ID = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+# Paths included per vehicle in the aggregate view by default
+SUMMARY_PATHS = (
+    "vehicle.location.latitude",
+    "vehicle.location.longitude",
+    "vehicle.speed",
+    "power.house_battery.soc",
+    "tanks.fresh.level",
+    "engine.rpm",
+)
+
+
+class Fleet:
+    """RoamK stores for a fleet of vehicles."""
+
+    def __init__(
+        self,
+        compact: bool = False,
+        max_vehicles: int = 1000,
+        coalesce_window: Optional[float] = None,
+    ) -> None:
+        self.compact = compact
+        self.max_vehicles = max_vehicles
+        self.coalesce_window = coalesce_window
+        self.vehicles: dict[str, RoamK] = {}
+        self.rejected = 0
+        self._full_logged = False
+
+        self._summary_cache: dict[str, tuple[int, tuple[str, ...], bytes]] = {}
+        self._etag_prefix = f"{time.time_ns():x}"
+
+    @classmethod
+    def from_config(cls, config: FleetConfig) -> "Fleet":
+        """Create a fleet from the fleet section of the configuration."""
+        fleet = cls(
+            compact=config.compact,
+            max_vehicles=config.max_vehicles,
+            coalesce_window=config.coalesce_window,
+        )
+        for vehicle_id in config.vehicles:
+            fleet.vehicle(vehicle_id)
+        return fleet
+
+    def get(self, vehicle_id: str) -> Optional[RoamK]:
+        """Return a vehicle's store, or None if it is not known."""
+        return self.vehicles.get(vehicle_id)
+
+    def vehicle(self, vehicle_id: str) -> Optional[RoamK]:
+        """Return a vehicle's store, creating it on first use.
+
+        Returns None for invalid IDs and once the fleet is full.
+        """
+        roamk = self.vehicles.get(vehicle_id)
+        if roamk is not None:
+            return roamk
+
+        if not VEHICLE_ID.fullmatch(vehicle_id):
+            self.rejected += 1
+            return None
+        if len(self.vehicles) >= self.max_vehicles:
+            if not self._full_logged:
+                logger.warning(f"Fleet is full ({self.max_vehicles}), ignoring new vehicles")
+                self._full_logged = True
+            self.rejected += 1
+            return None
+
+        roamk = RoamK(coalesce_window=self.coalesce_window, compact=self.compact)
+        roamk.compile_paths(TOPIC_MAP.values())
+        self.vehicles[vehicle_id] = roamk
+        logger.info(f"Fleet vehicle added: {vehicle_id}")
+        return roamk
+
+    def summary_json(self, paths: Iterable[str] = SUMMARY_PATHS) -> tuple[bytes, str]:
+        """Return (JSON bytes, ETag) for the aggregate fleet view.
+
+        Each vehicle contributes its version, last update time and the
+        values of ``paths``.
+        """
+        paths = tuple(paths)
+        parts = []
+        total = 0
+        for vehicle_id, roamk in self.vehicles.items():
+            version = roamk.version
+            total += version
+            cached = self._summary_cache.get(vehicle_id)
+            if cached is None or cached[0] != version or cached[1] != paths:
+                summary = {"version": version, "last_update": roamk.state.last_update}
+                for path in paths:
+                    summary[path] = roamk.get_path(path)
+                fragment = encode_json(vehicle_id) + b":" + encode_json(summary)
+                cached = (version, paths, fragment)
+                self._summary_cache[vehicle_id] = cached
+            parts.append(cached[2])
+
+        body = b'{"count":%d,"vehicles":{%s}}' % (len(parts), b",".join(parts))
+        # Versions only grow, so the sum changes whenever any vehicle does
+        etag = f'"{self._etag_prefix}-{len(parts)}-{total}-{hash(paths) & 0xFFFFFFFF:x}"'
+        return body, etag
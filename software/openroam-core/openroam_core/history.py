@@ -0,0 +1,408 @@
+"""
+On-Device History Store
+
+Embedded SQLite time-series store for every numeric RoamK path, so
+history survives without a network. Values are kept at three
+resolutions, each with its own retention:
+
+- raw:  last value per path per second
+- 1m:   min/max/avg/count/seconds covered per path per minute
+- 1h:   min/max/avg/count/seconds covered per path per hour
+
+Rollups are aggregated in memory as values arrive and written when their
+bucket closes, so no background job has to re-scan raw data. Values are
+recorded on change, so a path's last value is carried into each new
+rollup bucket (if the server was not stalled for a whole bucket), and a
+rollup's avg is weighted by how long each value was held; rollups are
+merged and re-bucketed weighted by the seconds they cover. Raw samples
+stay one per change, and their averages are per change. All tables
+are WITHOUT ROWID, keyed by (path id, timestamp), which keeps rows small
+and makes a range query for one path a single index scan.
+"""
+
+import logging
+import math
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from .config import HistoryConfig
+from .roamk import RoamK, RoamKState, Subscription
+
+logger = logging.getLogger(__name__)
+
+# (table, bucket width in seconds) for each rollup tier
+TIERS = (("samples", 1), ("rollup_1m", 60), ("rollup_1h", 3600))
+_WIDTHS = dict(TIERS)
+
+# Target number of points when the caller does not give a step
+DEFAULT_POINTS = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS paths (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS samples (
+    path_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (path_id, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_1m (
+    path_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    avg REAL NOT NULL,
+    count INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    PRIMARY KEY (path_id, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_1h (
+    path_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    avg REAL NOT NULL,
+    count INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    PRIMARY KEY (path_id, ts)
+) WITHOUT ROWID;
+"""
+
+# Merge a closed bucket into any row already stored for it (e.g. after a restart)
+_UPSERT_ROLLUP = """
+INSERT INTO {table} (path_id, ts, min, max, avg, count, seconds) VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (path_id, ts) DO UPDATE SET
+    min = MIN(min, excluded.min),
+    max = MAX(max, excluded.max),
+    avg = COALESCE(
+        (avg * seconds + excluded.avg * excluded.seconds) / NULLIF(seconds + excluded.seconds, 0),
+        excluded.avg
+    ),
+    count = count + excluded.count,
+    seconds = seconds + excluded.seconds
+"""
+
+
+def _weighted_avg(rows: list[tuple[float, float]]) -> float:
+    """Mean of (avg, seconds) pairs weighted by seconds; plain mean if none cover time."""
+    seconds = sum(s for _, s in rows)
+    if seconds <= 0:
+        return sum(a for a, _ in rows) / len(rows)
+    return sum(a * s for a, s in rows) / seconds
+
+
+class _Bucket:
+    """Running min/max/time-weighted sum/count for one path and one rollup interval."""
+
+    __slots__ = ("start", "min", "max", "area", "count", "first", "last", "last_ts")
+
+    def __init__(self, start: int, value: float, ts: float) -> None:
+        self.start = start
+        self.min = value
+        self.max = value
+        self.area = 0.0  # value integrated over time up to last_ts
+        self.count = 1
+        self.first = ts
+        self.last = value
+        self.last_ts = ts
+
+    def add(self, value: float, ts: float) -> None:
+        if value < self.min:
+            self.min = value
+        elif value > self.max:
+            self.max = value
+        if ts > self.last_ts:
+            self.area += self.last * (ts - self.last_ts)
+            self.last_ts = ts
+        self.last = value
+        self.count += 1
+
+    def row(self, path_id: int, end: float) -> tuple:
+        """The rollup row, with the last value held until ``end``."""
+        span = end - self.first
+        if span <= 0:
+            avg = self.last
+        else:
+            avg = (self.area + self.last * max(0.0, end - self.last_ts)) / span
+        return (path_id, self.start, self.min, self.max, avg, self.count, max(0.0, span))
+
+
+class HistoryStore:
+    """Embedded time-series history for RoamK paths."""
+
+    def __init__(
+        self,
+        path: str,
+        flush_interval: float = 5.0,
+        raw_retention_days: float = 2,
+        minute_retention_days: float = 30,
+        hour_retention_days: float = 365,
+    ) -> None:
+        self.path = path
+        self.flush_interval = flush_interval
+        self.retention = {
+            "samples": raw_retention_days * 86400,
+            "rollup_1m": minute_retention_days * 86400,
+            "rollup_1h": hour_retention_days * 86400,
+        }
+
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        for table, width in TIERS[1:]:
+            columns = [row[1] for row in self._db.execute(f"PRAGMA table_info({table})")]
+            if "seconds" not in columns:
+                # Databases from before time weighting: assume full buckets
+                self._db.execute(
+                    f"ALTER TABLE {table} ADD COLUMN seconds REAL NOT NULL DEFAULT {width}"
+                )
+        self._db_lock = threading.Lock()
+
+        self._path_ids: dict[str, int] = dict(self._db.execute("SELECT path, id FROM paths"))
+        self._next_id = max(self._path_ids.values(), default=0) + 1
+        self._new_paths: list[tuple[int, str]] = []
+
+        # Pending writes, swapped out by the flusher under _lock
+        self._lock = threading.Lock()
+        self._raw: dict[tuple[int, int], float] = {}
+        self._closed: dict[str, list[tuple]] = {"rollup_1m": [], "rollup_1h": []}
+        self._open: dict[str, dict[int, _Bucket]] = {"rollup_1m": {}, "rollup_1h": {}}
+
+        self._roamk: Optional[RoamK] = None
+        self._subscription: Optional[Subscription] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._last_retention = 0.0
+
+    @classmethod
+    def from_config(cls, config: HistoryConfig) -> "HistoryStore":
+        """Create a store from the history section of the configuration."""
+        return cls(
+            config.path,
+            flush_interval=config.flush_interval,
+            raw_retention_days=config.raw_retention_days,
+            minute_retention_days=config.minute_retention_days,
+            hour_retention_days=config.hour_retention_days,
+        )
+
+    def attach(self, roamk: RoamK) -> None:
+        """Record every numeric change made to a RoamK store."""
+        self._roamk = roamk
+        self._subscription = roamk.subscribe(self._on_change)
+
+    def start(self) -> None:
+        """Start the background flush thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="history-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop recording, write everything pending and close the database."""
+        if self._subscription is not None and self._roamk is not None:
+            self._roamk.unsubscribe(self._subscription)
+            self._subscription = None
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush(close_all=True)
+        with self._db_lock:
+            self._db.close()
+
+    def record(self, path: str, value: Any, ts: Optional[float] = None) -> None:
+        """Record one value; non-numeric values are ignored."""
+        if isinstance(value, bool):
+            value = float(value)
+        elif isinstance(value, (int, float)):
+            value = float(value)
+            if math.isnan(value):
+                return
+        else:
+            return
+
+        ts = time.time() if ts is None else ts
+        second = int(ts)
+        with self._lock:
+            path_id = self._path_ids.get(path)
+            if path_id is None:
+                path_id = self._next_id
+                self._next_id += 1
+                self._path_ids[path] = path_id
+                self._new_paths.append((path_id, path))
+
+            self._raw[(path_id, second)] = value
+            for table, width in TIERS[1:]:
+                start = second - second % width
+                buckets = self._open[table]
+                bucket = buckets.get(path_id)
+                if bucket is None:
+                    buckets[path_id] = _Bucket(start, value, ts)
+                elif bucket.start != start:
+                    self._closed[table].append(bucket.row(path_id, bucket.start + width))
+                    # The previous value held from the start of this bucket
+                    bucket = buckets[path_id] = _Bucket(start, bucket.last, start)
+                    bucket.add(value, ts)
+                else:
+                    bucket.add(value, ts)
+
+    def flush(self, close_all: bool = False, now: Optional[float] = None) -> None:
+        """Write pending samples and closed rollup buckets."""
+        now = time.time() if now is None else now
+        second = int(now)
+        with self._lock:
+            new_paths, self._new_paths = self._new_paths, []
+            raw, self._raw = self._raw, {}
+            closed = self._closed
+            self._closed = {"rollup_1m": [], "rollup_1h": []}
+            # Close buckets whose interval has ended even if no new value came
+            for table, width in TIERS[1:]:
+                buckets = self._open[table]
+                current = second - second % width
+                for path_id, bucket in list(buckets.items()):
+                    end = bucket.start + width
+                    if close_all:
+                        closed[table].append(bucket.row(path_id, min(now, end)))
+                        del buckets[path_id]
+                    elif end <= second:
+                        closed[table].append(bucket.row(path_id, end))
+                        # The value still holds: carry it into the current bucket
+                        buckets[path_id] = _Bucket(current, bucket.last, current)
+
+        if not (new_paths or raw or closed["rollup_1m"] or closed["rollup_1h"]):
+            return
+
+        with self._db_lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany("INSERT OR IGNORE INTO paths VALUES (?, ?)", new_paths)
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO samples VALUES (?, ?, ?)",
+                    [(pid, ts, value) for (pid, ts), value in raw.items()],
+                )
+                for table, rows in closed.items():
+                    self._db.executemany(_UPSERT_ROLLUP.format(table=table), rows)
+                self._db.execute("COMMIT")
+            except sqlite3.Error:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def apply_retention(self) -> None:
+        """Delete data older than each tier's retention."""
+        now = time.time()
+        with self._db_lock:
+            for table, seconds in self.retention.items():
+                self._db.execute(f"DELETE FROM {table} WHERE ts < ?", (int(now - seconds),))
+
+    def paths(self) -> list[str]:
+        """All paths with recorded history."""
+        with self._lock:
+            return sorted(self._path_ids)
+
+    def query(
+        self, path: str, start: float, end: float, step: Optional[float] = None
+    ) -> Optional[dict]:
+        """Return history for one path between two Unix timestamps.
+
+        Uses the coarsest tier that still resolves ``step`` (chosen to give
+        about DEFAULT_POINTS points if omitted) and re-buckets to ``step``.
+        Returns None if the path has no history.
+        """
+        now = time.time()
+        with self._lock:
+            path_id = self._path_ids.get(path)
+            open_buckets = [
+                (table, bucket.row(path_id, min(now, bucket.start + _WIDTHS[table])))
+                for table in self._open
+                if path_id is not None and (bucket := self._open[table].get(path_id))
+            ]
+        if path_id is None:
+            return None
+
+        start, end = int(start), int(end)
+        if step is None:
+            step = max(1, (end - start) // DEFAULT_POINTS)
+        step = max(1, int(step))
+
+        # Coarsest tier that resolves the step, moving to coarser tiers when
+        # the range reaches back past a tier's retention
+        finest = max((w for _, w in TIERS if w <= step), default=1)
+        table, width = TIERS[-1]
+        for candidate, candidate_width in TIERS:
+            if candidate_width >= finest and start >= now - self.retention[candidate]:
+                table, width = candidate, candidate_width
+                break
+        step = max(step, width)
+
+        if table == "samples":
+            sql = (
+                "SELECT ts / :step * :step AS t, MIN(value), MAX(value), AVG(value), COUNT(*) "
+                "FROM samples WHERE path_id = :id AND ts >= :start AND ts <= :end "
+                "GROUP BY t ORDER BY t"
+            )
+            extra: list[tuple] = []
+        else:
+            sql = (
+                "SELECT ts / :step * :step AS t, MIN(min), MAX(max), "
+                "COALESCE(SUM(avg * seconds) / NULLIF(SUM(seconds), 0), AVG(avg)), "
+                "SUM(count), SUM(seconds) "
+                f"FROM {table} WHERE path_id = :id AND ts >= :start AND ts <= :end "
+                "GROUP BY t ORDER BY t"
+            )
+            # Include the bucket still being aggregated in memory
+            extra = [row for t, row in open_buckets if t == table and start <= row[1] <= end]
+
+        params = {"step": step, "id": path_id, "start": start, "end": end}
+        with self._db_lock:
+            rows = self._db.execute(sql, params).fetchall()
+
+        for _, ts, lo, hi, avg, count, seconds in extra:
+            t = ts // step * step
+            if rows and rows[-1][0] == t:
+                _, plo, phi, pavg, pcount, pseconds = rows[-1]
+                merged_avg = _weighted_avg([(pavg, pseconds), (avg, seconds)])
+                rows[-1] = (
+                    t,
+                    min(plo, lo),
+                    max(phi, hi),
+                    merged_avg,
+                    pcount + count,
+                    pseconds + seconds,
+                )
+            else:
+                rows.append((t, lo, hi, avg, count, seconds))
+
+        return {
+            "path": path,
+            "from": start,
+            "to": end,
+            "step": step,
+            "resolution": width,
+            "t": [r[0] for r in rows],
+            "min": [r[1] for r in rows],
+            "max": [r[2] for r in rows],
+            "avg": [r[3] for r in rows],
+            "count": [r[4] for r in rows],
+        }
+
+    def _on_change(self, state: RoamKState, changed: frozenset[str]) -> None:
+        ts = time.time()
+        for path in changed:
+            self.record(path, self._roamk.get_path(path), ts)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+                if time.monotonic() - self._last_retention > 3600:
+                    self.apply_retention()
+                    self._last_retention = time.monotonic()
+            except sqlite3.Error as e:
+                logger.error(f"History flush failed: {e}")
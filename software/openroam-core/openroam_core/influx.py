@@ -0,0 +1,306 @@
+"""
+InfluxDB History Writer
+
+Subscribes to RoamK changes and writes them to InfluxDB as line
+protocol. Points are buffered in memory (bounded, oldest dropped first)
+and written in size/time-bounded batches by a background thread. When
+the endpoint is unreachable, batches are spooled to disk and replayed
+once it comes back.
+"""
+
+import http.client
+import logging
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import deque
+from pathlib import Path
+from typing import Any, Mapping, Optional
+
+from .config import InfluxConfig
+from .roamk import RoamK, RoamKState, Subscription, flatten_path
+
+logger = logging.getLogger(__name__)
+
+# Spooled batches replayed per pass, alongside the new points
+DRAIN_BATCHES = 4
+
+
+def _escape_key(text: str) -> str:
+    return text.replace("\\", "\\\\").replace(",", "\\,").replace("=", "\\=").replace(" ", "\\ ")
+
+
+def _format_value(value: Any) -> Optional[str]:
+    """Format a field value for line protocol, None if unsupported."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return f"{value}i"
+    if isinstance(value, float):
+        return repr(value) if value == value else None
+    if isinstance(value, str):
+        return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+    return None
+
+
+def to_line(path: str, value: Any, timestamp_ns: int, tags: str = "") -> Optional[str]:
+    """Format one RoamK value as a line protocol point.
+
+    The top-level section is the measurement and the rest of the path is
+    the field key, e.g. ``power,host=nav house_battery.voltage=12.8 <ns>``.
+    """
+    formatted = _format_value(value)
+    if formatted is None:
+        return None
+    section, _, field_key = path.partition(".")
+    if not field_key:
+        return None
+    return f"{_escape_key(section)}{tags} {_escape_key(field_key)}={formatted} {timestamp_ns}"
+
+
+class InfluxWriter:
+    """Batched, spooling InfluxDB writer for RoamK telemetry."""
+
+    def __init__(
+        self,
+        url: str = "http://localhost:8086",
+        token: str = "",
+        org: str = "openroam",
+        bucket: str = "telemetry",
+        batch_size: int = 500,
+        flush_interval: float = 5.0,
+        buffer_size: int = 50000,
+        spool_dir: Optional[str] = None,
+        spool_max_mb: int = 100,
+        tags: Optional[Mapping[str, str]] = None,
+        timeout: float = 10.0,
+    ) -> None:
+        query = urllib.parse.urlencode({"org": org, "bucket": bucket, "precision": "ns"})
+        self.write_url = f"{url.rstrip('/')}/api/v2/write?{query}"
+        self.token = token
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self.spool_dir = Path(spool_dir) if spool_dir else None
+        self.spool_max_bytes = spool_max_mb * 1024 * 1024
+        self.tags = "".join(
+            f",{_escape_key(k)}={_escape_key(v)}" for k, v in sorted((tags or {}).items())
+        )
+
+        self._buffer: deque[str] = deque(maxlen=buffer_size)
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._subscription: Optional[Subscription] = None
+        self._roamk: Optional[RoamK] = None
+
+        # Backoff while the endpoint is unreachable
+        self._retry_at = 0.0
+        self._retry_delay = 1.0
+
+        # Metrics
+        self.points_written = 0
+        self.points_dropped = 0
+        self.points_spooled = 0
+        self.points_rejected = 0
+        self.failed_writes = 0
+        self.last_error: Optional[str] = None
+        self.last_write_seconds = 0.0
+
+    @classmethod
+    def from_config(cls, config: InfluxConfig, tags: Optional[Mapping[str, str]] = None):
+        """Create a writer from the influx section of the configuration."""
+        return cls(
+            url=config.url,
+            token=config.token,
+            org=config.org,
+            bucket=config.bucket,
+            batch_size=config.batch_size,
+            flush_interval=config.flush_interval,
+            buffer_size=config.buffer_size,
+            spool_dir=config.spool_dir,
+            spool_max_mb=config.spool_max_mb,
+            tags=tags,
+        )
+
+    def attach(self, roamk: RoamK) -> None:
+        """Record every change made to a RoamK store."""
+        self._roamk = roamk
+        self._subscription = roamk.subscribe(self._on_change)
+
+    def start(self) -> None:
+        """Start the background writer thread."""
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="influx-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop writing, flushing (or spooling) whatever is buffered."""
+        if self._subscription is not None and self._roamk is not None:
+            self._roamk.unsubscribe(self._subscription)
+            self._subscription = None
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def add(self, path: str, value: Any, timestamp_ns: Optional[int] = None) -> None:
+        """Buffer one value for writing."""
+        if timestamp_ns is None:
+            timestamp_ns = time.time_ns()
+        lines = [
+            line
+            for p, v in flatten_path(path, value)
+            if (line := to_line(p, v, timestamp_ns, self.tags)) is not None
+        ]
+        if not lines:
+            return
+
+        with self._cond:
+            free = self._buffer.maxlen - len(self._buffer)
+            if len(lines) > free:
+                self.points_dropped += len(lines) - free
+            self._buffer.extend(lines)
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify()
+
+    def stats(self) -> dict:
+        """Writer and backpressure metrics."""
+        return {
+            "buffered": len(self._buffer),
+            "buffer_size": self._buffer.maxlen,
+            "points_written": self.points_written,
+            "points_dropped": self.points_dropped,
+            "points_spooled": self.points_spooled,
+            "points_rejected": self.points_rejected,
+            "failed_writes": self.failed_writes,
+            "spool_bytes": self._spool_bytes(),
+            "endpoint_up": self._retry_at <= time.monotonic(),
+            "last_error": self.last_error,
+            "last_write_seconds": self.last_write_seconds,
+        }
+
+    def _on_change(self, state: RoamKState, changed: frozenset[str]) -> None:
+        timestamp_ns = time.time_ns()
+        for path in changed:
+            self.add(path, self._roamk.get_path(path), timestamp_ns)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._stopping and len(self._buffer) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                count = min(self.batch_size, len(self._buffer))
+                batch = [self._buffer.popleft() for _ in range(count)]
+                stopping = self._stopping
+
+            try:
+                if batch:
+                    self._write_or_spool(batch)
+                if not stopping:
+                    # Catch up on the backlog while new points keep arriving
+                    self._drain_spool()
+            except Exception as e:
+                # Keep writing; the points of this batch are lost
+                logger.exception("InfluxDB write failed")
+                self.points_dropped += len(batch)
+                self.last_error = repr(e)
+
+            if stopping and not self._buffer:
+                return
+
+    def _write_or_spool(self, lines: list[str]) -> None:
+        body = "\n".join(lines).encode()
+        if time.monotonic() >= self._retry_at and self._post(body, len(lines)):
+            return
+        self._spool(body, len(lines))
+
+    def _post(self, body: bytes, count: int) -> bool:
+        """Write a batch; False if it should be retried later."""
+        request = urllib.request.Request(self.write_url, data=body, method="POST")
+        request.add_header("Content-Type", "text/plain; charset=utf-8")
+        if self.token:
+            request.add_header("Authorization", f"Token {self.token}")
+
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout):
+                pass
+        except urllib.error.HTTPError as e:
+            if 400 <= e.code < 500 and e.code != 429:
+                # The data itself was refused; retrying will not help
+                logger.error(f"InfluxDB rejected {count} points: HTTP {e.code}")
+                self.points_rejected += count
+                self.last_error = f"HTTP {e.code}"
+                return True
+            self._mark_down(f"HTTP {e.code}")
+            return False
+        except (urllib.error.URLError, OSError, http.client.HTTPException) as e:
+            self._mark_down(str(e) or type(e).__name__)
+            return False
+
+        self.last_write_seconds = time.perf_counter() - start
+        self.points_written += count
+        self._retry_delay = 1.0
+        self._retry_at = 0.0
+        return True
+
+    def _mark_down(self, error: str) -> None:
+        if self._retry_at == 0.0:
+            logger.warning(f"InfluxDB unreachable, spooling to disk: {error}")
+        self.failed_writes += 1
+        self.last_error = error
+        self._retry_at = time.monotonic() + self._retry_delay
+        self._retry_delay = min(self._retry_delay * 2, 60.0)
+
+    def _spool(self, body: bytes, count: int) -> None:
+        if self.spool_dir is None:
+            self.points_dropped += count
+            return
+        try:
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+            self._trim_spool(len(body))
+            path = self.spool_dir / f"{time.time_ns()}.lp"
+            tmp = path.with_suffix(".tmp")
+            tmp.write_bytes(body)
+            os.replace(tmp, path)
+            self.points_spooled += count
+        except OSError as e:
+            logger.error(f"Failed to spool InfluxDB batch: {e}")
+            self.points_dropped += count
+
+    def _spool_files(self) -> list[Path]:
+        if self.spool_dir is None or not self.spool_dir.is_dir():
+            return []
+        return sorted(self.spool_dir.glob("*.lp"))
+
+    def _spool_bytes(self) -> int:
+        return sum(f.stat().st_size for f in self._spool_files())
+
+    def _trim_spool(self, incoming: int) -> None:
+        """Delete the oldest spool files to stay under the size limit."""
+        files = self._spool_files()
+        total = sum(f.stat().st_size for f in files) + incoming
+        for f in files:
+            if total <= self.spool_max_bytes:
+                break
+            size = f.stat().st_size
+            self.points_dropped += f.read_bytes().count(b"\n") + 1
+            f.unlink()
+            total -= size
+
+    def _drain_spool(self) -> None:
+        """Replay the oldest spooled batches while the endpoint is up."""
+        for path in self._spool_files()[:DRAIN_BATCHES]:
+            if time.monotonic() < self._retry_at:
+                return
+            body = path.read_bytes()
+            count = body.count(b"\n") + 1
+            if not self._post(body, count):
+                return
+            path.unlink()
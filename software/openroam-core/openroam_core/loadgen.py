@@ -0,0 +1,160 @@
+"""
+Load Generator
+
+Replays MockDataGenerator traffic at a fixed message rate, either into
+an MQTT broker or into any in-process sink, for load and regression
+testing of the ingest path.
+
+A round of mock data is captured once and cycled, so generating the
+load costs almost nothing. Every ``probe_every`` messages a probe is
+sent on a topic the mock never publishes, carrying a sequence number;
+a LatencyProbe subscribed to the receiving RoamK turns probe arrivals
+into ingest-to-visible latencies. Latency is measured from when the
+probe was scheduled, so a receiver that falls behind shows up as
+latency rather than as a slower sender.
+"""
+
+import argparse
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+import paho.mqtt.client as mqtt
+
+from .config import Config
+from .mock_data import MockDataGenerator, SimClock
+from .roamk import RoamK, RoamKState
+
+logger = logging.getLogger(__name__)
+
+PROBE_TOPIC = "openroam/power/solar/lifetime_kwh"
+PROBE_PATH = "power.solar_lifetime_kwh"
+
+
+def mock_corpus(rounds: int = 100, seed: int = 0) -> list[tuple[str, bytes]]:
+    """Capture ``rounds`` rounds of MockDataGenerator output."""
+    messages: list[tuple[str, bytes]] = []
+    generator = MockDataGenerator(
+        publisher=lambda t, p: messages.append((t, p.encode())),
+        clock=SimClock(speed=None),
+        seed=seed,
+    )
+    for _ in range(rounds):
+        generator.generate()
+        generator.clock.sleep(1.0)
+    return messages
+
+
+class LatencyProbe:
+    """Measures probe latency as seen by RoamK subscribers."""
+
+    def __init__(self) -> None:
+        self.sent: dict[int, float] = {}
+        self.latencies: list[float] = []
+        self._lock = threading.Lock()
+
+    def attach(self, roamk: RoamK) -> None:
+        """Watch the probe path of a RoamK store."""
+        roamk.subscribe(lambda state, changed: self._seen(state), paths=[PROBE_PATH])
+
+    def mark_sent(self, seq: int, scheduled: float) -> None:
+        with self._lock:
+            self.sent[seq] = scheduled
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Latency percentile in seconds (q in 0..100), None without samples."""
+        with self._lock:
+            ordered = sorted(self.latencies)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+    def _seen(self, state: RoamKState) -> None:
+        now = time.perf_counter()
+        seq = int(state.power.solar_lifetime_kwh)
+        with self._lock:
+            scheduled = self.sent.pop(seq, None)
+            if scheduled is not None:
+                self.latencies.append(now - scheduled)
+
+
+class LoadGenerator:
+    """Sends a message corpus to a sink at a target rate."""
+
+    def __init__(
+        self,
+        send: Callable[[str, bytes], None],
+        corpus: list[tuple[str, bytes]],
+        rate: float,
+        probe: Optional[LatencyProbe] = None,
+        probe_every: int = 100,
+    ) -> None:
+        self.send = send
+        self.corpus = corpus
+        self.rate = rate
+        self.probe = probe
+        self.probe_every = probe_every
+        self.sent = 0
+
+    def run(self, duration: float) -> float:
+        """Send for ``duration`` seconds; returns the elapsed time."""
+        send = self.send
+        corpus = self.corpus
+        size = len(corpus)
+        total = int(duration * self.rate)
+        seq = 0
+        i = 0
+        start = time.perf_counter()
+        while i < total:
+            due = min(total, int((time.perf_counter() - start) * self.rate) + 1)
+            if due <= i:
+                time.sleep(min(0.001, (i - due + 1) / self.rate))
+                continue
+            while i < due:
+                if self.probe is not None and i % self.probe_every == 0:
+                    seq += 1
+                    self.probe.mark_sent(seq, start + i / self.rate)
+                    send(PROBE_TOPIC, str(seq).encode())
+                else:
+                    topic, payload = corpus[i % size]
+                    send(topic, payload)
+                i += 1
+        self.sent = i
+        return time.perf_counter() - start
+
+
+def main() -> None:
+    """Main entry point: publish mock traffic to the configured broker."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    parser = argparse.ArgumentParser(description="Publish mock OpenRoam traffic at a fixed rate")
+    parser.add_argument("--rate", type=float, default=1000.0, help="messages per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = Config.load()
+    client = mqtt.Client(
+        client_id="openroam-loadgen",
+        callback_api_version=mqtt.CallbackAPIVersion.VERSION2,
+    )
+    client.connect(config.mqtt.host, config.mqtt.port)
+    client.loop_start()
+    try:
+        generator = LoadGenerator(
+            lambda topic, payload: client.publish(topic, payload),
+            mock_corpus(seed=args.seed),
+            args.rate,
+        )
+        elapsed = generator.run(args.duration)
+        logger.info(f"Published {generator.sent:,} messages in {elapsed:.1f}s")
+    finally:
+        client.loop_stop()
+        client.disconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Metrics
+
+Counters, gauges and latency histograms rendered in the Prometheus text
+exposition format.
+
+Counters and gauges are read from callbacks at scrape time, so
+components keep plain integer attributes and pay nothing extra on their
+hot paths. Histograms have fixed log-spaced buckets and cost a bisect
+and three additions per observation.
+"""
+
+from bisect import bisect_left
+from typing import Callable, Mapping, Union
+
+# Upper bounds in seconds, from 1 µs to 1 s
+BUCKETS = (
+    1e-6,
+    2.5e-6,
+    5e-6,
+    1e-5,
+    2.5e-5,
+    5e-5,
+    1e-4,
+    2.5e-4,
+    5e-4,
+    1e-3,
+    2.5e-3,
+    5e-3,
+    1e-2,
+    2.5e-2,
+    5e-2,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+)
+
+# A metric value, or label value -> metric value for a labelled family
+Sample = Union[float, Mapping[str, float]]
+
+
+class Histogram:
+    """A latency histogram with fixed buckets."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        """Record one duration."""
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile (0..1) as the upper bound of its bucket."""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts, strict=False):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format(value: float) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+class Registry:
+    """A set of metric families to render for a scrape."""
+
+    def __init__(self) -> None:
+        self._families: list[tuple[str, str, str, str, Callable[[], object]]] = []
+
+    def counter(self, name: str, help: str, collect: Callable[[], Sample], label: str = "") -> None:
+        """Register a counter read from ``collect``; a mapping result uses ``label``."""
+        self._families.append((name, "counter", help, label, collect))
+
+    def gauge(self, name: str, help: str, collect: Callable[[], Sample], label: str = "") -> None:
+        """Register a gauge read from ``collect``; a mapping result uses ``label``."""
+        self._families.append((name, "gauge", help, label, collect))
+
+    def histogram(
+        self, name: str, help: str, collect: Callable[[], Mapping[str, Histogram]], label: str
+    ) -> None:
+        """Register histograms keyed by the value of ``label``."""
+        self._families.append((name, "histogram", help, label, collect))
+
+    def render(self) -> str:
+        """Render every family in the Prometheus text format."""
+        lines: list[str] = []
+        for name, kind, help, label, collect in self._families:
+            sample = collect()
+            if sample is None:
+                continue
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "histogram":
+                for key, histogram in sample.items():
+                    _render_histogram(lines, name, f'{label}="{_escape(key)}"', histogram)
+            elif isinstance(sample, Mapping):
+                for key, value in sample.items():
+                    lines.append(f'{name}{{{label}="{_escape(key)}"}} {_format(value)}')
+            else:
+                lines.append(f"{name} {_format(sample)}")
+        return "\n".join(lines) + "\n"
+
+
+def _render_histogram(lines: list[str], name: str, labels: str, histogram: Histogram) -> None:
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts, strict=False):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+    lines.append(f"{name}_sum{{{labels}}} {histogram.sum!r}")
+    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
@@ -3,31 +3,98 @@ Mock Data Generator
 
 Generates simulated sensor data for development and testing
 without actual hardware.
+
+For reproducible datasets, generators take a seed and a SimClock, which
+runs simulated time at a fixed speed factor (or as fast as possible), so
+a day of solar and battery behaviour can be produced in seconds. The
+command line can simulate many vehicles at once and write the stream to
+a capture file instead of the broker. In aggregate mode each round is
+sent as one JSON state document per subsystem instead of one message
+per value.
 """
 
+import argparse
+import json
 import logging
 import math
 import random
 import time
 from datetime import datetime
+from typing import Callable, Optional
 
 import paho.mqtt.client as mqtt
 
+from .capture import CaptureWriter
 from .config import Config
+from .mqtt_client import group_messages
 
 logger = logging.getLogger(__name__)
 
 
+class SimClock:
+    """Simulated time, advanced only by ``sleep``.
+
+    Each ``sleep(seconds)`` moves simulated time forward by exactly
+    ``seconds`` and waits ``seconds / speed`` of real time; a speed of
+    None runs as fast as possible. Timestamps therefore depend only on
+    the start time and the sequence of sleeps, never on wall time.
+    """
+
+    def __init__(self, start: Optional[float] = None, speed: Optional[float] = 1.0) -> None:
+        self._now = time.time() if start is None else start
+        self.speed = speed
+
+    def time(self) -> float:
+        """Current simulated time as a Unix timestamp."""
+        return self._now
+
+    def now(self) -> datetime:
+        """Current simulated local time."""
+        return datetime.fromtimestamp(self._now)
+
+    def sleep(self, seconds: float) -> None:
+        """Advance simulated time, pacing against real time."""
+        self._now += seconds
+        if self.speed:
+            time.sleep(seconds / self.speed)
+
+
+def _json_value(value: object) -> object:
+    """Turn a formatted reading back into a JSON number or boolean if it is one."""
+    try:
+        return json.loads(value)
+    except (TypeError, ValueError):
+        return value
+
+
 class MockDataGenerator:
     """Generate mock sensor data for testing."""
 
-    def __init__(self, mqtt_host: str = "localhost", mqtt_port: int = 1883) -> None:
+    def __init__(
+        self,
+        mqtt_host: str = "localhost",
+        mqtt_port: int = 1883,
+        publisher: Optional[Callable[[str, str], None]] = None,
+        clock: Optional[SimClock] = None,
+        seed: Optional[object] = None,
+        vehicle_id: Optional[str] = None,
+        aggregate: bool = False,
+    ) -> None:
         self.client = mqtt.Client(
             client_id="openroam-mock",
             callback_api_version=mqtt.CallbackAPIVersion.VERSION2,
         )
         self.mqtt_host = mqtt_host
         self.mqtt_port = mqtt_port
+        # Receives (topic, payload) instead of the MQTT client when set
+        self.publisher = publisher
+        self.clock = clock or SimClock()
+        self.rng = random.Random(seed)
+        # Publish under openroam/<vehicle>/... for fleet mode
+        self.prefix = f"openroam/{vehicle_id}/" if vehicle_id else "openroam/"
+        # Collect each round into one JSON document per subsystem
+        self.aggregate = aggregate
+        self._pending: list[tuple[str, object]] = []
 
         # State for realistic simulation
         self.time_offset = 0
@@ -51,40 +118,59 @@ class MockDataGenerator:
 
     def publish(self, topic: str, value) -> None:
         """Publish a value to MQTT."""
-        self.client.publish(topic, str(value))
+        if self.prefix != "openroam/":
+            topic = self.prefix + topic.removeprefix("openroam/")
+        if self.aggregate:
+            self._pending.append((topic, value))
+        else:
+            self._send(topic, str(value))
+
+    def _send(self, topic: str, payload: str) -> None:
+        if self.publisher is not None:
+            self.publisher(topic, payload)
+        else:
+            self.client.publish(topic, payload)
+
+    def flush(self) -> None:
+        """Publish the values collected in aggregate mode."""
+        pending, self._pending = self._pending, []
+        values = ((topic, _json_value(value)) for topic, value in pending)
+        for topic, document in group_messages(values, self.prefix).items():
+            self._send(topic, json.dumps(document, separators=(",", ":")))
 
     def generate_power_data(self) -> None:
         """Generate power system data."""
         # Simulate solar based on time of day
-        hour = (datetime.now().hour + self.time_offset) % 24
+        now = self.clock.now()
+        hour = (now.hour + now.minute / 60 + self.time_offset) % 24
         if 6 <= hour <= 18:
             # Daylight hours - sine curve peaking at noon
             solar_factor = math.sin((hour - 6) * math.pi / 12)
-            self.solar_base = 400 * solar_factor + random.uniform(-20, 20)
+            self.solar_base = 400 * solar_factor + self.rng.uniform(-20, 20)
         else:
             self.solar_base = 0
 
         solar_watts = max(0, self.solar_base)
-        solar_voltage = 35.0 + random.uniform(-2, 2) if solar_watts > 0 else 0
+        solar_voltage = 35.0 + self.rng.uniform(-2, 2) if solar_watts > 0 else 0
         solar_current = solar_watts / solar_voltage if solar_voltage > 0 else 0
 
         # House battery - discharge at night, charge during day
-        load = random.uniform(50, 150)  # Base load in watts
+        load = self.rng.uniform(50, 150)  # Base load in watts
         net_power = solar_watts - load
 
         # SOC changes based on net power
         self.house_soc += net_power * 0.0001  # Very slow change
         self.house_soc = max(20, min(100, self.house_soc))
 
-        house_voltage = 12.0 + (self.house_soc - 50) * 0.04 + random.uniform(-0.1, 0.1)
+        house_voltage = 12.0 + (self.house_soc - 50) * 0.04 + self.rng.uniform(-0.1, 0.1)
         house_current = net_power / house_voltage
 
         self.publish("openroam/power/battery/house/voltage", f"{house_voltage:.2f}")
         self.publish("openroam/power/battery/house/current", f"{house_current:.1f}")
         self.publish("openroam/power/battery/house/soc", f"{self.house_soc:.0f}")
-        self.publish("openroam/power/battery/house/temp", f"{75 + random.uniform(-5, 5):.0f}")
+        self.publish("openroam/power/battery/house/temp", f"{75 + self.rng.uniform(-5, 5):.0f}")
 
-        self.publish("openroam/power/battery/chassis/voltage", f"{12.6 + random.uniform(-0.2, 0.2):.2f}")
+        self.publish("openroam/power/battery/chassis/voltage", f"{12.6 + self.rng.uniform(-0.2, 0.2):.2f}")
         self.publish("openroam/power/battery/chassis/soc", "100")
 
         self.publish("openroam/power/solar/voltage", f"{solar_voltage:.1f}")
@@ -95,16 +181,16 @@ class MockDataGenerator:
         self.publish("openroam/power/shore/connected", "false")
         self.publish("openroam/power/alternator/charging", "true" if self.engine_running else "false")
         if self.engine_running:
-            self.publish("openroam/power/alternator/amps", f"{45 + random.uniform(-5, 5):.0f}")
+            self.publish("openroam/power/alternator/amps", f"{45 + self.rng.uniform(-5, 5):.0f}")
 
     def generate_tank_data(self) -> None:
         """Generate tank level data."""
         # Slowly decreasing fresh water, slowly increasing waste
-        fresh = 65 + random.uniform(-2, 2)
-        grey = 35 + random.uniform(-2, 2)
-        black = 20 + random.uniform(-2, 2)
-        propane = 55 + random.uniform(-1, 1)
-        fuel = 45 + random.uniform(-1, 1)
+        fresh = 65 + self.rng.uniform(-2, 2)
+        grey = 35 + self.rng.uniform(-2, 2)
+        black = 20 + self.rng.uniform(-2, 2)
+        propane = 55 + self.rng.uniform(-1, 1)
+        fuel = 45 + self.rng.uniform(-1, 1)
 
         self.publish("openroam/tanks/fresh/level", f"{fresh:.0f}")
         self.publish("openroam/tanks/fresh/gallons", f"{fresh * 0.4:.1f}")
@@ -116,14 +202,15 @@ class MockDataGenerator:
 
     def generate_climate_data(self) -> None:
         """Generate climate data."""
-        hour = datetime.now().hour
+        now = self.clock.now()
+        hour = now.hour + now.minute / 60
         # Simulate temperature variation
         base_exterior = 70 + 15 * math.sin((hour - 6) * math.pi / 12)
-        exterior_temp = base_exterior + random.uniform(-2, 2)
+        exterior_temp = base_exterior + self.rng.uniform(-2, 2)
 
         # Interior tries to maintain ~72F
-        interior_temp = 72 + random.uniform(-2, 2)
-        interior_humidity = 45 + random.uniform(-5, 5)
+        interior_temp = 72 + self.rng.uniform(-2, 2)
+        interior_humidity = 45 + self.rng.uniform(-5, 5)
 
         self.publish("openroam/climate/interior/temperature", f"{interior_temp:.1f}")
         self.publish("openroam/climate/interior/humidity", f"{interior_humidity:.0f}")
@@ -134,9 +221,9 @@ class MockDataGenerator:
     def generate_vehicle_data(self) -> None:
         """Generate vehicle/GPS data."""
         # Simulate slow movement
-        if random.random() > 0.95:
-            self.speed = random.uniform(0, 65)
-            self.heading = random.uniform(0, 360)
+        if self.rng.random() > 0.95:
+            self.speed = self.rng.uniform(0, 65)
+            self.heading = self.rng.uniform(0, 360)
 
         # Update location based on speed/heading
         if self.speed > 0:
@@ -148,30 +235,30 @@ class MockDataGenerator:
         self.publish("openroam/nav/gps/longitude", f"{self.location['lon']:.6f}")
         self.publish("openroam/nav/gps/speed", f"{self.speed:.1f}")
         self.publish("openroam/nav/gps/heading", f"{self.heading:.0f}")
-        self.publish("openroam/nav/gps/altitude", f"{1500 + random.uniform(-10, 10):.0f}")
-        self.publish("openroam/nav/gps/satellites", f"{random.randint(8, 12)}")
+        self.publish("openroam/nav/gps/altitude", f"{1500 + self.rng.uniform(-10, 10):.0f}")
+        self.publish("openroam/nav/gps/satellites", f"{self.rng.randint(8, 12)}")
 
     def generate_engine_data(self) -> None:
         """Generate engine/OBD data."""
         self.engine_running = self.speed > 0
 
         if self.engine_running:
-            rpm = 1000 + self.speed * 30 + random.uniform(-100, 100)
-            coolant = 195 + random.uniform(-5, 5)
-            oil_temp = 210 + random.uniform(-10, 10)
-            throttle = min(100, self.speed * 1.5 + random.uniform(-5, 5))
-            mpg = 10 + random.uniform(-2, 2) if self.speed > 10 else 0
+            rpm = 1000 + self.speed * 30 + self.rng.uniform(-100, 100)
+            coolant = 195 + self.rng.uniform(-5, 5)
+            oil_temp = 210 + self.rng.uniform(-10, 10)
+            throttle = min(100, self.speed * 1.5 + self.rng.uniform(-5, 5))
+            mpg = 10 + self.rng.uniform(-2, 2) if self.speed > 10 else 0
         else:
             rpm = 0
-            coolant = 75 + random.uniform(-5, 5)
-            oil_temp = 75 + random.uniform(-5, 5)
+            coolant = 75 + self.rng.uniform(-5, 5)
+            oil_temp = 75 + self.rng.uniform(-5, 5)
             throttle = 0
             mpg = 0
 
         self.publish("openroam/engine/rpm", f"{rpm:.0f}")
         self.publish("openroam/engine/coolant_temp", f"{coolant:.0f}")
         self.publish("openroam/engine/oil_temp", f"{oil_temp:.0f}")
-        self.publish("openroam/engine/oil_pressure", f"{45 + random.uniform(-5, 5):.0f}")
+        self.publish("openroam/engine/oil_pressure", f"{45 + self.rng.uniform(-5, 5):.0f}")
         self.publish("openroam/engine/throttle", f"{throttle:.0f}")
         self.publish("openroam/engine/load", f"{throttle * 0.7:.0f}")
         self.publish("openroam/engine/mpg_instant", f"{mpg:.1f}")
@@ -187,35 +274,122 @@ class MockDataGenerator:
         self.publish("openroam/safety/propane/status", "ok")
         self.publish("openroam/safety/alarm/armed", "false")
 
+    def generate(self) -> None:
+        """Generate one round of data for every subsystem."""
+        self.generate_power_data()
+        self.generate_tank_data()
+        self.generate_climate_data()
+        self.generate_vehicle_data()
+        self.generate_engine_data()
+        self.generate_safety_data()
+        if self.aggregate:
+            self.flush()
+
     def run(self, interval: float = 1.0) -> None:
         """Run the mock data generator."""
         logger.info("Starting mock data generation...")
         try:
             while True:
-                self.generate_power_data()
-                self.generate_tank_data()
-                self.generate_climate_data()
-                self.generate_vehicle_data()
-                self.generate_engine_data()
-                self.generate_safety_data()
-                time.sleep(interval)
+                self.generate()
+                self.clock.sleep(interval)
         except KeyboardInterrupt:
             logger.info("Stopping mock data generation")
 
 
+def simulate(
+    clock: SimClock,
+    publish: Callable[[str, str], None],
+    vehicles: int = 1,
+    seed: Optional[int] = None,
+    duration: Optional[float] = None,
+    interval: float = 1.0,
+    aggregate: bool = False,
+) -> int:
+    """Run generators for one or more vehicles on a shared clock.
+
+    With several vehicles, each publishes under ``openroam/simNNN/...``
+    with its own seed derived from ``seed``. Runs for ``duration``
+    simulated seconds (forever if None) and returns the message count.
+    """
+    count = 0
+
+    def counted(topic: str, payload: str) -> None:
+        nonlocal count
+        count += 1
+        publish(topic, payload)
+
+    generators = [
+        MockDataGenerator(
+            publisher=counted,
+            clock=clock,
+            seed=None if seed is None else f"{seed}:{i}",
+            vehicle_id=f"sim{i:03d}" if vehicles > 1 else None,
+            aggregate=aggregate,
+        )
+        for i in range(vehicles)
+    ]
+    end = None if duration is None else clock.time() + duration
+    while end is None or clock.time() < end:
+        for generator in generators:
+            generator.generate()
+        clock.sleep(interval)
+    return count
+
+
 def main() -> None:
     """Main entry point."""
     logging.basicConfig(
         level=logging.INFO,
         format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
     )
+    parser = argparse.ArgumentParser(description="Publish simulated OpenRoam sensor data")
+    parser.add_argument("--vehicles", type=int, default=1, help="simulated vehicles")
+    parser.add_argument("--interval", type=float, default=1.0, help="simulated seconds per round")
+    parser.add_argument("--duration", type=float, help="simulated seconds (default: forever)")
+    parser.add_argument("--speed", type=float, default=1.0, help="time factor, 0 = max speed")
+    parser.add_argument("--seed", type=int, help="random seed for reproducible runs")
+    parser.add_argument("--start", help="simulated start time, ISO 8601 (default: now)")
+    parser.add_argument("--output", help="write a capture file instead of publishing")
+    parser.add_argument(
+        "--aggregate", action="store_true", help="one JSON document per subsystem and round"
+    )
+    args = parser.parse_args()
+
+    start = datetime.fromisoformat(args.start).timestamp() if args.start else None
+    clock = SimClock(start=start, speed=args.speed or None)
+
+    if args.output:
+        if args.duration is None:
+            parser.error("--output needs --duration")
+        with CaptureWriter(args.output, start=clock.time()) as writer:
+            count = simulate(
+                clock,
+                lambda topic, payload: writer.write(clock.time(), topic, payload.encode()),
+                vehicles=args.vehicles,
+                seed=args.seed,
+                duration=args.duration,
+                interval=args.interval,
+                aggregate=args.aggregate,
+            )
+        logger.info(f"Wrote {count:,} messages to {args.output}")
+        return
 
     config = Config.load()
     generator = MockDataGenerator(config.mqtt.host, config.mqtt.port)
     generator.connect()
 
     try:
-        generator.run()
+        simulate(
+            clock,
+            lambda topic, payload: generator.client.publish(topic, payload),
+            vehicles=args.vehicles,
+            seed=args.seed,
+            duration=args.duration,
+            interval=args.interval,
+            aggregate=args.aggregate,
+        )
+    except KeyboardInterrupt:
+        logger.info("Stopping mock data generation")
     finally:
         generator.disconnect()
 
@@ -4,13 +4,24 @@ MQTT Client for OpenRoam
 Handles connection to MQTT broker and message routing.
 """
 
+import asyncio
 import json
 import logging
-from typing import Callable, Optional
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Mapping, Optional, Union
 
 import paho.mqtt.client as mqtt
 
+from . import wire
+from .capture import CaptureWriter
+from .dispatch import Dispatcher
+from .metrics import Histogram
 from .roamk import RoamK
+from .topics import TopicRouter
+
+if TYPE_CHECKING:
+    from .fleet import Fleet
 
 logger = logging.getLogger(__name__)
 
@@ -23,10 +34,17 @@ TOPIC_MAP = {
     "openroam/power/battery/house/soc": "power.house_battery.soc",
     "openroam/power/battery/house/temp": "power.house_battery.temp",
     "openroam/power/battery/chassis/voltage": "power.chassis_battery.voltage",
+    "openroam/power/battery/chassis/soc": "power.chassis_battery.soc",
+    "openroam/power/solar/voltage": "power.solar_voltage",
+    "openroam/power/solar/current": "power.solar_current",
     "openroam/power/solar/watts": "power.solar_watts",
     "openroam/power/solar/daily_wh": "power.solar_daily_wh",
+    "openroam/power/solar/lifetime_kwh": "power.solar_lifetime_kwh",
     "openroam/power/shore/connected": "power.shore_connected",
+    "openroam/power/shore/voltage": "power.shore_voltage",
+    "openroam/power/shore/amps": "power.shore_amps",
     "openroam/power/alternator/charging": "power.alternator_charging",
+    "openroam/power/alternator/amps": "power.alternator_amps",
     # Tanks
     "openroam/tanks/fresh/level": "tanks.fresh.level",
     "openroam/tanks/grey/level": "tanks.grey.level",
@@ -37,27 +55,162 @@ TOPIC_MAP = {
     "openroam/climate/interior/temperature": "climate.interior_temp",
     "openroam/climate/interior/humidity": "climate.interior_humidity",
     "openroam/climate/exterior/temperature": "climate.exterior_temp",
+    "openroam/climate/exterior/humidity": "climate.exterior_humidity",
     "openroam/climate/hvac/mode": "climate.hvac_mode",
     "openroam/climate/hvac/running": "climate.hvac_running",
+    "openroam/climate/hvac/fan_speed": "climate.hvac_fan_speed",
     # Engine
     "openroam/engine/rpm": "engine.rpm",
     "openroam/engine/coolant_temp": "engine.coolant_temp",
     "openroam/engine/oil_temp": "engine.oil_temp",
+    "openroam/engine/oil_pressure": "engine.oil_pressure",
     "openroam/engine/throttle": "engine.throttle",
+    "openroam/engine/load": "engine.load",
     "openroam/engine/mpg_instant": "engine.mpg_instant",
+    "openroam/engine/mpg_average": "engine.mpg_average",
     "openroam/engine/check_engine": "engine.check_engine",
     # Vehicle
     "openroam/nav/gps/latitude": "vehicle.location.latitude",
     "openroam/nav/gps/longitude": "vehicle.location.longitude",
     "openroam/nav/gps/speed": "vehicle.speed",
     "openroam/nav/gps/heading": "vehicle.heading",
+    "openroam/nav/gps/altitude": "vehicle.location.altitude",
+    "openroam/nav/gps/satellites": "vehicle.location.satellites",
     # Safety
     "openroam/safety/smoke/status": "safety.smoke_status",
     "openroam/safety/co/ppm": "safety.co_ppm",
+    "openroam/safety/co/status": "safety.co_status",
     "openroam/safety/propane/ppm": "safety.propane_ppm",
+    "openroam/safety/propane/status": "safety.propane_status",
+    "openroam/safety/alarm/armed": "safety.alarm_armed",
+    "openroam/safety/alarm/triggered": "safety.alarm_triggered",
+}
+
+# Wildcard topic mappings; {n} inserts the n-th captured topic level
+TOPIC_PATTERNS = {
+    # Tanks
+    "openroam/tanks/+/level": "tanks.{1}.level",
+    "openroam/tanks/+/gallons": "tanks.{1}.gallons",
+    "openroam/tanks/+/capacity": "tanks.{1}.capacity",
+    # Climate zones
+    "openroam/climate/zone/+/temperature": "climate.zones[{1}].temperature",
+    "openroam/climate/zone/+/setpoint": "climate.zones[{1}].setpoint",
+    "openroam/climate/zone/+/humidity": "climate.zones[{1}].humidity",
+    # Engine (any EngineState field)
+    "openroam/engine/+": "engine.{1}",
+    # Safety
+    "openroam/safety/door/+": "safety.doors[{1}]",
+}
+
+# A subsystem may instead publish a batch of values as one JSON document on
+# openroam/<subsystem>/state, keyed by the rest of each value's topic:
+#   openroam/power/state  {"battery/house/voltage": 13.2, "solar/watts": 410}
+SUBSYSTEMS = ("power", "tanks", "climate", "nav", "engine", "safety")
+AGGREGATE_TOPICS = {f"openroam/{name}/state": f"openroam/{name}/" for name in SUBSYSTEMS}
+
+
+# Bridges may send binary frames of changed paths (see wire.py) instead, on
+# openroam/delta, or openroam/<vehicle>/delta to a fleet
+FRAME_TOPIC = "openroam/delta"
+
+
+def group_messages(
+    messages: Iterable[tuple[str, Any]], prefix: str = "openroam/"
+) -> dict[str, dict[str, Any]]:
+    """Group per-value topics under ``prefix`` into subsystem state documents."""
+    groups: dict[str, dict[str, Any]] = {}
+    for topic, value in messages:
+        subsystem, _, key = topic.removeprefix(prefix).partition("/")
+        groups.setdefault(f"{prefix}{subsystem}/state", {})[key] = value
+    return groups
+
+
+def _message_topic(topic: str, value: Any) -> str:
+    """Coalescing key of a queued message callback."""
+    return topic
+
+
+# Ingest stages timed by MqttClient.enable_timing()
+_STAGES = ("read", "route", "parse", "apply", "notify", "callbacks", "document")
+
+# Distinct unmapped topics counted individually; the rest only in the total
+MAX_UNMAPPED_TOPICS = 100
+
+# Sentinel returned by typed decoders for payloads they cannot parse
+_UNDECODED = object()
+
+_BOOL_PAYLOADS = {
+    b"true": True,
+    b"false": False,
+    b"1": True,
+    b"0": False,
+    b"on": True,
+    b"off": False,
+}
+
+_NULL_PAYLOADS = frozenset((b"", b"null", b"none"))
+
+
+def _decode_float(payload: bytes) -> Any:
+    try:
+        return float(payload)
+    except ValueError:
+        return _UNDECODED
+
+
+def _decode_int(payload: bytes) -> Any:
+    if payload.isdigit():
+        return int(payload)
+    try:
+        return round(float(payload))
+    except ValueError:
+        return _UNDECODED
+
+
+def _decode_bool(payload: bytes) -> Any:
+    return _BOOL_PAYLOADS.get(payload.strip().lower(), _UNDECODED)
+
+
+def _decode_str(payload: bytes) -> Any:
+    # JSON-encoded strings ("auto") lose their quotes and escapes
+    if payload.startswith(b'"'):
+        try:
+            value = json.loads(payload)
+        except ValueError:
+            pass
+        else:
+            if isinstance(value, str):
+                return value
+    return payload.decode("utf-8", errors="replace")
+
+
+_DECODERS: dict[type, Callable[[bytes], Any]] = {
+    float: _decode_float,
+    int: _decode_int,
+    bool: _decode_bool,
+    str: _decode_str,
 }
 
 
+def make_decoder(tp: type, optional: bool = False) -> Optional[Callable[[bytes], Any]]:
+    """Build a raw-payload decoder for a RoamK field type, if one exists.
+
+    Decoders return the target type directly and hand back a sentinel
+    (instead of raising) when the payload does not fit, so the caller can
+    fall back to generic parsing.
+    """
+    decode = _DECODERS.get(tp)
+    if decode is None or not optional:
+        return decode
+
+    def decode_optional(payload: bytes) -> Any:
+        if payload.strip().lower() in _NULL_PAYLOADS:
+            return None
+        return decode(payload)
+
+    return decode_optional
+
+
 class MqttClient:
     """MQTT client for OpenRoam."""
 
@@ -88,31 +241,140 @@ class MqttClient:
         self.client.on_message = self._on_message
 
         self.roamk: Optional[RoamK] = None
+        self.fleet: Optional[Fleet] = None
+        self.router = TopicRouter({**TOPIC_MAP, **TOPIC_PATTERNS})
+        self._decoders: dict[str, Optional[Callable[[bytes], Any]]] = {}
+        self._group_routes: dict[str, dict[str, Optional[str]]] = {}
         self.message_callbacks: list[Callable[[str, any], None]] = []
+        # Called on every (re)connect, after subscribing
+        self.connect_callbacks: list[Callable[[], None]] = []
+        # Topic filters subscribed on connect
+        self.topics: list[str] = ["openroam/#"]
         self.connected = False
+        self.recorder: Optional[CaptureWriter] = None
+
+        # Ingest counters, read by the metrics endpoint
+        self.received = 0
+        self.unmapped = 0
+        self.malformed = 0
+        self.callback_errors = 0
+        self.unmapped_topics: dict[str, int] = {}
+        # Topics this process publishes itself (e.g. alerts), not counted as unmapped
+        self.own_prefixes: tuple[str, ...] = ()
+
+        # Stage timings of one message in every sample_every, when enabled
+        self.timings: Optional[dict[str, Histogram]] = None
+        self.sample_every = 256
+        self._next_sample = -1  # value of received that is timed next; never while disabled
+        self._reads = 0
+
+        # Set when the socket is driven by an asyncio loop instead of paho's thread
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._loop_task: Optional[asyncio.Task] = None
 
     def set_roamk(self, roamk: RoamK) -> None:
         """Set the RoamK data store."""
         self.roamk = roamk
+        self.roamk.compile_paths(TOPIC_MAP.values())
+
+        # Typed decoders keyed by RoamK path, from the target field types
+        self._decoders = {}
+        for path in TOPIC_MAP.values():
+            self._decoder_for(path)
+
+    def set_fleet(self, fleet: "Fleet") -> None:
+        """Route ``openroam/<vehicle>/...`` topics to the stores of a fleet."""
+        self.fleet = fleet
 
-    def add_message_callback(self, callback: Callable[[str, any], None]) -> None:
-        """Add a callback for incoming messages."""
+    def enable_timing(self, sample_every: int = 256) -> None:
+        """Time each ingest stage for one message in every ``sample_every``.
+
+        Stages: ``read`` (a socket read, including handling its message),
+        ``route``, ``parse``, ``apply`` (the RoamK update), ``notify``
+        (subscriber callbacks), ``callbacks`` (message callbacks) and
+        ``document`` (a whole subsystem state document).
+        """
+        self.sample_every = max(1, sample_every)
+        if self.timings is None:
+            self.timings = {stage: Histogram() for stage in _STAGES}
+        self._next_sample = self.received + self.sample_every
+
+    def disable_timing(self) -> None:
+        """Stop sampling stage timings; recorded histograms are kept."""
+        self._next_sample = -1
+
+    def start_recording(self, path: str) -> None:
+        """Append every received message to a capture file."""
+        self.stop_recording()
+        self.recorder = CaptureWriter(path, append=True, flush_interval=1.0)
+        logger.info(f"Recording MQTT messages to {path}")
+
+    def stop_recording(self) -> None:
+        """Close the capture file, if recording."""
+        recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            recorder.close()
+            logger.info(f"Recorded {recorder.count} messages to {recorder.path}")
+
+    def add_message_callback(
+        self,
+        callback: Callable[[str, any], None],
+        dispatcher: Optional[Dispatcher] = None,
+        policy: Optional[str] = None,
+        max_queue: Optional[int] = None,
+    ) -> Callable[[str, any], None]:
+        """Add a callback for incoming messages.
+
+        With a ``dispatcher`` the callback runs there through a bounded
+        queue; coalesce_latest keeps the latest value per topic. Returns
+        the callable that was registered.
+        """
+        if dispatcher is not None:
+            callback = dispatcher.wrap(callback, policy, max_queue, key=_message_topic)
         self.message_callbacks.append(callback)
+        return callback
 
-    def connect(self) -> None:
-        """Connect to MQTT broker."""
+    def connect(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """Connect to MQTT broker.
+
+        Without a loop, paho runs its own network thread and messages are
+        handled there. With an asyncio loop (which must be the running loop),
+        the socket is driven by that loop, so message handling and every
+        RoamK update happen on the loop thread alongside the API handlers.
+        Connection and reconnection then run in the background with backoff.
+        """
         logger.info(f"Connecting to MQTT broker at {self.host}:{self.port}")
-        self.client.connect(self.host, self.port)
-        self.client.loop_start()
+        if loop is None:
+            self.client.connect(self.host, self.port)
+            self.client.loop_start()
+            return
+
+        self.loop = loop
+        self._loop_thread = threading.get_ident()
+        self.client.on_socket_open = self._on_socket_open
+        self.client.on_socket_close = self._on_socket_close
+        self.client.on_socket_register_write = self._on_socket_register_write
+        self.client.on_socket_unregister_write = self._on_socket_unregister_write
+        self._loop_task = loop.create_task(self._run_loop())
 
     def disconnect(self) -> None:
         """Disconnect from MQTT broker."""
-        self.client.loop_stop()
+        if self.loop is None:
+            self.client.loop_stop()
+            self.client.disconnect()
+            return
+
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            self._loop_task = None
         self.client.disconnect()
 
     def publish(self, topic: str, payload: any, retain: bool = False) -> None:
         """Publish a message."""
-        if isinstance(payload, (dict, list)):
+        if isinstance(payload, (bytes, bytearray)):
+            pass
+        elif isinstance(payload, (dict, list)):
             payload = json.dumps(payload)
         elif isinstance(payload, bool):
             payload = str(payload).lower()
@@ -121,10 +383,79 @@ class MqttClient:
 
         self.client.publish(topic, payload, retain=retain)
 
+    def publish_many(
+        self, messages: Iterable[tuple[str, Any]], aggregate: bool = False, retain: bool = False
+    ) -> None:
+        """Publish several values, optionally as one document per subsystem."""
+        if aggregate:
+            messages = group_messages(messages).items()
+        for topic, payload in messages:
+            self.publish(topic, payload, retain=retain)
+
+    def publish_frame(
+        self,
+        changes: Union[Mapping[str, Any], Iterable[tuple[str, Any]]],
+        topic: str = FRAME_TOPIC,
+        stamps: Optional[Mapping[str, float]] = None,
+        retain: bool = False,
+    ) -> int:
+        """Publish changed RoamK paths as one binary delta frame; returns its size."""
+        payload = wire.encode_frame(changes, stamps=stamps)
+        self.client.publish(topic, payload, retain=retain)
+        return len(payload)
+
     def subscribe(self, topic: str) -> None:
         """Subscribe to a topic."""
         self.client.subscribe(topic)
 
+    async def _run_loop(self) -> None:
+        """Connect, service keepalives and reconnect on an asyncio loop."""
+        delay = 1.0
+        while True:
+            if self.client.socket() is None:
+                try:
+                    # connect() blocks on DNS/TCP, so keep it off the loop
+                    await self.loop.run_in_executor(None, self.client.connect, self.host, self.port)
+                    delay = 1.0
+                except OSError as e:
+                    logger.warning(f"MQTT connection failed, retrying in {delay:.0f}s: {e}")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 30.0)
+                    continue
+
+            self.client.loop_misc()
+            await asyncio.sleep(1.0)
+
+    def _call_in_loop(self, func: Callable[..., Any], *args: Any) -> None:
+        """Run a loop method now if on the loop thread, else schedule it."""
+        if threading.get_ident() == self._loop_thread:
+            func(*args)
+        else:
+            self.loop.call_soon_threadsafe(func, *args)
+
+    def _on_socket_open(self, client: mqtt.Client, userdata: any, sock: Any) -> None:
+        self._call_in_loop(self.loop.add_reader, sock, self._read)
+
+    def _read(self) -> None:
+        """Service a readable socket, timing one read in every sample_every."""
+        if self._next_sample >= 0:
+            self._reads += 1
+            if not self._reads % self.sample_every:
+                start = time.perf_counter()
+                self.client.loop_read()
+                self.timings["read"].observe(time.perf_counter() - start)
+                return
+        self.client.loop_read()
+
+    def _on_socket_close(self, client: mqtt.Client, userdata: any, sock: Any) -> None:
+        self._call_in_loop(self.loop.remove_reader, sock.fileno())
+
+    def _on_socket_register_write(self, client: mqtt.Client, userdata: any, sock: Any) -> None:
+        self._call_in_loop(self.loop.add_writer, sock, client.loop_write)
+
+    def _on_socket_unregister_write(self, client: mqtt.Client, userdata: any, sock: Any) -> None:
+        self._call_in_loop(self.loop.remove_writer, sock.fileno())
+
     def _on_connect(
         self, client: mqtt.Client, userdata: any, flags: any, rc: int, properties: any = None
     ) -> None:
@@ -132,58 +463,273 @@ class MqttClient:
         if rc == 0:
             logger.info("Connected to MQTT broker")
             self.connected = True
-            # Subscribe to all openroam topics
-            self.client.subscribe("openroam/#")
+            for topic in self.topics:
+                self.client.subscribe(topic)
+            for callback in self.connect_callbacks:
+                try:
+                    callback()
+                except Exception:
+                    logger.exception("MQTT connect callback failed")
         else:
             logger.error(f"Failed to connect to MQTT broker: {rc}")
 
     def _on_disconnect(
-        self, client: mqtt.Client, userdata: any, rc: int, properties: any = None
+        self, client: mqtt.Client, userdata: any, flags: any, rc: int, properties: any = None
     ) -> None:
         """Handle disconnection."""
         logger.warning(f"Disconnected from MQTT broker: {rc}")
         self.connected = False
 
-    def _on_message(
-        self, client: mqtt.Client, userdata: any, message: mqtt.MQTTMessage
-    ) -> None:
+    def _on_message(self, client: mqtt.Client, userdata: any, message: mqtt.MQTTMessage) -> None:
         """Handle incoming message."""
-        topic = message.topic
-        payload = message.payload.decode("utf-8")
+        if self.recorder is not None:
+            self.recorder.write(time.time(), message.topic, message.payload)
+        self.handle(message.topic, message.payload)
+
+    def handle(self, topic: str, payload: bytes) -> None:
+        """Route one message into RoamK, as if received from the broker."""
+        self.received += 1
+        if self.received == self._next_sample:
+            self._next_sample += self.sample_every
+            self._handle_timed(topic, payload)
+            return
+
+        if topic.endswith("/state") and self._handle_group(topic, payload):
+            return
+        if topic.endswith("/delta") and self._handle_frame(topic, payload):
+            return
 
-        # Parse payload
-        value = self._parse_payload(payload)
+        roamk, path = self._route(topic)
+
+        # Parse payload, using the typed decoder when the path has one
+        decoder = self._decoder_for(path, roamk) if path is not None else None
+        value = decoder(payload) if decoder is not None else _UNDECODED
+        if value is _UNDECODED:
+            value = self._parse_payload(payload.decode("utf-8"))
 
         # Update RoamK if topic is mapped
-        if self.roamk and topic in TOPIC_MAP:
-            path = TOPIC_MAP[topic]
-            self.roamk.update_path(path, value)
+        if path is not None:
+            roamk.update_path(path, value)
+        else:
+            self._count_unmapped(topic)
 
         # Call message callbacks
+        if self.message_callbacks:
+            self._call_callbacks(topic, value)
+
+    def _handle_timed(self, topic: str, payload: bytes) -> None:
+        """handle() with each stage timed."""
+        timings = self.timings
+        clock = time.perf_counter
+        start = clock()
+        if topic.endswith("/state") and self._handle_group(topic, payload):
+            timings["document"].observe(clock() - start)
+            return
+        if topic.endswith("/delta") and self._handle_frame(topic, payload):
+            timings["document"].observe(clock() - start)
+            return
+
+        roamk, path = self._route(topic)
+        routed = clock()
+
+        decoder = self._decoder_for(path, roamk) if path is not None else None
+        value = decoder(payload) if decoder is not None else _UNDECODED
+        if value is _UNDECODED:
+            value = self._parse_payload(payload.decode("utf-8"))
+        parsed = clock()
+
+        applied = None
+        if path is not None and roamk.coalesce_window:
+            # Notifications are deferred to the coalescing window anyway
+            applying = parsed
+            roamk.update_path(path, value)
+        elif path is not None:
+            # Hold notifications back so the update and the callbacks are timed apart
+            with roamk.batch():
+                applying = clock()
+                roamk.update_path(path, value)
+                applied = clock()
+        else:
+            self._count_unmapped(topic)
+        notified = clock()
+
+        if self.message_callbacks:
+            self._call_callbacks(topic, value)
+        done = clock()
+
+        timings["route"].observe(routed - start)
+        timings["parse"].observe(parsed - routed)
+        if path is not None:
+            timings["apply"].observe((applied or notified) - applying)
+        if applied is not None:
+            timings["notify"].observe(notified - applied)
+        timings["callbacks"].observe(done - notified)
+
+    def _count_unmapped(self, topic: str) -> None:
+        """Count a topic that no mapping (or no fleet vehicle) accepted."""
+        if self.own_prefixes and topic.startswith(self.own_prefixes):
+            return
+        self.unmapped += 1
+        count = self.unmapped_topics.get(topic)
+        if count is not None:
+            self.unmapped_topics[topic] = count + 1
+        elif len(self.unmapped_topics) < MAX_UNMAPPED_TOPICS:
+            self.unmapped_topics[topic] = 1
+            logger.debug(f"Unmapped MQTT topic: {topic}")
+
+    def _handle_group(self, topic: str, payload: bytes) -> bool:
+        """Fan a subsystem state document out into one batched update.
+
+        Returns False if the topic is not a state document topic.
+        """
+        parts = topic.split("/", 2)
+        if self.fleet is None:
+            base = topic
+        elif len(parts) == 3 and parts[0] == "openroam":
+            base = f"openroam/{parts[2]}"
+        else:
+            return False
+        routes = self._group_routes.get(base)
+        if routes is None:
+            if base not in AGGREGATE_TOPICS:
+                return False
+            routes = self._group_routes[base] = {}
+
+        try:
+            values = json.loads(payload.decode("utf-8"))
+        except ValueError:
+            values = None
+        if not isinstance(values, dict):
+            self.malformed += 1
+            logger.debug(f"Ignoring malformed state document on {topic}")
+            return True
+
+        # Keys resolve the same way for every vehicle, so paths are cached per subsystem
+        updates = []
+        for key, value in values.items():
+            try:
+                path = routes[key]
+            except KeyError:
+                path = routes[key] = self.router.route(AGGREGATE_TOPICS[base] + key)
+            if path is not None:
+                updates.append((path, value))
+            else:
+                self._count_unmapped(topic[: -len("state")] + key)
+
+        roamk = self.roamk
+        if self.fleet is not None and updates:
+            roamk = self.fleet.vehicle(parts[1])
+        if roamk is not None and updates:
+            roamk.update_many(updates)
+
+        if self.message_callbacks:
+            prefix = topic[: -len("state")]
+            for key, value in values.items():
+                self._call_callbacks(prefix + key, value)
+        return True
+
+    def _handle_frame(self, topic: str, payload: bytes) -> bool:
+        """Apply binary delta frames (a frame or a batch), one batched update each.
+
+        Returns False if the topic is not a frame topic.
+        """
+        roamk = self.roamk
+        if self.fleet is not None:
+            parts = topic.split("/")
+            if len(parts) != 3 or parts[0] != "openroam":
+                return False
+            roamk = self.fleet.vehicle(parts[1])
+        elif topic != FRAME_TOPIC:
+            return False
+
+        try:
+            frames = wire.decode_batch(payload)
+        except ValueError as e:
+            self.malformed += 1
+            logger.debug(f"Ignoring malformed delta frame on {topic}: {e}")
+            return True
+        for frame in frames:
+            if roamk is not None and frame.changes:
+                roamk.update_many(frame.changes)
+
+            # Frames carry paths, not topics: callbacks get the whole change set
+            if self.message_callbacks:
+                self._call_callbacks(topic, frame.changes)
+        return True
+
+    def _call_callbacks(self, topic: str, value: Any) -> None:
+        """Call every message callback, isolating their failures."""
         for callback in self.message_callbacks:
-            callback(topic, value)
+            try:
+                callback(topic, value)
+            except Exception:
+                self.callback_errors += 1
+                if self.callback_errors == 1 or self.callback_errors % 1000 == 0:
+                    logger.exception(
+                        f"Message callback {callback!r} failed ({self.callback_errors} errors)"
+                    )
 
-    def _parse_payload(self, payload: str) -> any:
-        """Parse MQTT payload."""
-        # Try JSON
+    def _route(self, topic: str) -> tuple[Optional[RoamK], Optional[str]]:
+        """Resolve a topic to the store and path it updates."""
+        if self.fleet is not None:
+            return self._route_fleet(topic)
+        roamk = self.roamk
+        return roamk, self.router.route(topic) if roamk else None
+
+    def _route_fleet(self, topic: str) -> tuple[Optional[RoamK], Optional[str]]:
+        """Resolve ``openroam/<vehicle>/<rest>`` to a vehicle store and path."""
+        parts = topic.split("/", 2)
+        if len(parts) < 3 or parts[0] != "openroam":
+            return None, None
+        # Vehicles share one router, so its cache is keyed by the unprefixed topic
+        path = self.router.route(f"openroam/{parts[2]}")
+        if path is None:
+            return None, None
+        roamk = self.fleet.vehicle(parts[1])
+        return roamk, path if roamk is not None else None
+
+    def _decoder_for(
+        self, path: str, roamk: Optional[RoamK] = None
+    ) -> Optional[Callable[[bytes], Any]]:
+        """Typed decoder for a RoamK path, built on first use."""
         try:
-            return json.loads(payload)
-        except json.JSONDecodeError:
+            return self._decoders[path]
+        except KeyError:
             pass
 
+        accessor = (roamk or self.roamk).compile_path(path)
+        if accessor is None:
+            # Not cached: dict entries such as new zones appear on first update
+            return None
+        decoder = make_decoder(accessor.type, accessor.optional)
+        self._decoders[path] = decoder
+        return decoder
+
+    def _parse_payload(self, payload: str) -> any:
+        """Parse MQTT payload."""
+        # Try JSON, but only for payloads that look like documents or strings
+        if payload[:1] in ("{", "[", '"'):
+            try:
+                return json.loads(payload)
+            except json.JSONDecodeError:
+                pass
+
+        # Try boolean and null
+        lowered = payload.lower()
+        if lowered == "true":
+            return True
+        if lowered == "false":
+            return False
+        if lowered == "null":
+            return None
+
         # Try number
         try:
-            if "." in payload:
+            if "." in payload or "e" in lowered:
                 return float(payload)
             return int(payload)
         except ValueError:
             pass
 
-        # Try boolean
-        if payload.lower() == "true":
-            return True
-        if payload.lower() == "false":
-            return False
-
         # Return as string
         return payload
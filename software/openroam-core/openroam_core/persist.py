@@ -0,0 +1,412 @@
+"""
+State Persistence
+
+Keeps the last known RoamK values on disk so a restarted server serves
+them at once instead of defaults until every topic has been republished.
+
+Changes are appended to a write-ahead log every ``wal_interval`` seconds
+as one stamped binary frame (see wire.py) per flush, and the whole state
+is snapshotted every ``snapshot_interval`` seconds, or sooner once the
+log grows past ``wal_max_kb``. Snapshots are written to a temporary file,
+fsynced and renamed over the previous one, so a crash leaves either the
+old or the new snapshot. Each snapshot starts a new log segment; on
+start the snapshot is loaded and the segments written after it are
+replayed, up to the first torn or corrupt record.
+
+Only values that were actually received are stored, each with the time
+it was received. Restored values keep those times, so clients can tell
+how stale they are until live data replaces them.
+
+Files in ``dir``:
+
+    state.snap      b"RKSNAP", format u8, first segment u32, time f64,
+                    CRC-32 u32, then a stamped frame
+    <n>.wal         records of length u32, CRC-32 u32, stamped frame
+"""
+
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Optional
+
+from . import wire
+from .config import PersistConfig
+from .roamk import RoamK, RoamKState, Subscription, flatten_path
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_NAME = "state.snap"
+
+_SNAP_HEADER = struct.Struct("<6sBIdI")
+_SNAP_MAGIC = b"RKSNAP"
+_FORMAT = 1
+_RECORD = struct.Struct("<II")
+
+
+class StatePersister:
+    """Snapshots RoamK state with a write-ahead log, and restores it on start."""
+
+    def __init__(
+        self,
+        directory: str,
+        snapshot_interval: float = 300.0,
+        wal_interval: float = 1.0,
+        wal_max_kb: int = 1024,
+        fsync: bool = True,
+        max_age: float = 0.0,
+    ) -> None:
+        self.dir = Path(directory)
+        self.snapshot_interval = snapshot_interval
+        self.wal_interval = wal_interval
+        self.wal_max_bytes = wal_max_kb * 1024
+        self.fsync = fsync
+        self.max_age = max_age
+
+        # Leaf path -> (value, receive time) of everything received or restored
+        self._known: dict[str, tuple[Any, float]] = {}
+        # Changes not yet in the log
+        self._pending: dict[str, tuple[Any, float]] = {}
+        # Restored paths not received since, with the Unix time they were received,
+        # and their backdated monotonic stamps in RoamK.received
+        self._restored: dict[str, float] = {}
+        self._restored_at: dict[str, float] = {}
+
+        self._segment = 0
+        self._wal: Optional[Any] = None
+        self._wal_bytes = 0
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._subscription: Optional[Subscription] = None
+        self._roamk: Optional[RoamK] = None
+
+        # Metrics
+        self.snapshots = 0
+        self.wal_records = 0
+        self.write_errors = 0
+        self.last_snapshot: Optional[float] = None
+        self.restore_seconds: Optional[float] = None
+
+    @classmethod
+    def from_config(cls, config: PersistConfig) -> "StatePersister":
+        """Create a persister from the persist section of the configuration."""
+        return cls(
+            directory=config.dir,
+            snapshot_interval=config.snapshot_interval,
+            wal_interval=config.wal_interval,
+            wal_max_kb=config.wal_max_kb,
+            fsync=config.fsync,
+            max_age=config.max_age,
+        )
+
+    def restore(self, roamk: RoamK) -> int:
+        """Apply the saved state to a store as one update; returns the paths restored.
+
+        Call before anything else subscribes to the store, so the restored
+        values are not taken for new data.
+        """
+        start = time.perf_counter()
+        values: dict[str, tuple[Any, float]] = {}
+        first_segment = 0
+        snapshot = self._read_snapshot()
+        if snapshot is not None:
+            first_segment, frame = snapshot
+            values.update(self._stamped(frame))
+
+        segments = self._segments()
+        for segment, path in segments:
+            if segment >= first_segment:
+                for frame in self._read_wal(path):
+                    values.update(self._stamped(frame))
+        # Continue in a new segment rather than after a possibly torn record
+        self._segment = max([first_segment] + [s + 1 for s, _ in segments])
+
+        if self.max_age:
+            cutoff = time.time() - self.max_age
+            values = {path: entry for path, entry in values.items() if entry[1] >= cutoff}
+        if values:
+            roamk.update_many((path, value) for path, (value, _) in values.items())
+        self._known = values
+        self._roamk = roamk
+        self._restored = {path: stamp for path, (_, stamp) in values.items()}
+        # Restored values are as fresh as when they were received, not now
+        roamk.set_received(self._restored)
+        self._restored_at = {
+            path: roamk.received.get(path, roamk.stale.get(path, 0.0)) for path in self._restored
+        }
+        self.restore_seconds = time.perf_counter() - start
+        if values:
+            oldest = time.time() - min(self._restored.values())
+            logger.info(
+                f"Restored {len(values)} RoamK values in {self.restore_seconds * 1000:.1f} ms "
+                f"(oldest {oldest:.0f} s old)"
+            )
+        return len(values)
+
+    @property
+    def restored(self) -> dict[str, float]:
+        """Restored paths not received live since, with the Unix time they were received.
+
+        A live value equal to the restored one changes nothing, so paths
+        are also dropped once RoamK has a newer receive time for them.
+        """
+        if self._restored_at and self._roamk is not None:
+            received = self._roamk.received
+            stale = self._roamk.stale
+            for path, restored_at in list(self._restored_at.items()):
+                stamp = received.get(path)
+                if stamp is None:
+                    stamp = stale.get(path)
+                if stamp is not None and stamp > restored_at:
+                    del self._restored_at[path]
+                    self._restored.pop(path, None)
+        return self._restored
+
+    def attach(self, roamk: RoamK) -> None:
+        """Persist every change made to a RoamK store."""
+        self._roamk = roamk
+        self._subscription = roamk.subscribe(self._on_change)
+
+    def start(self) -> None:
+        """Start the background writer thread."""
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="state-persist", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop persisting, writing a final snapshot."""
+        if self._subscription is not None and self._roamk is not None:
+            self._roamk.unsubscribe(self._subscription)
+            self._subscription = None
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> dict:
+        """Persistence metrics."""
+        return {
+            "paths": len(self._known),
+            "restored_stale": len(self.restored),
+            "restore_ms": (
+                round(self.restore_seconds * 1000, 2) if self.restore_seconds is not None else None
+            ),
+            "snapshots": self.snapshots,
+            "snapshot_age": (
+                round(time.time() - self.last_snapshot, 1) if self.last_snapshot else None
+            ),
+            "wal_bytes": self._wal_bytes,
+            "wal_records": self.wal_records,
+            "write_errors": self.write_errors,
+        }
+
+    def _on_change(self, state: RoamKState, changed: frozenset[str]) -> None:
+        get_path = self._roamk.get_path
+        now = time.time()
+        with self._lock:
+            for changed_path in changed:
+                for path, value in flatten_path(changed_path, get_path(changed_path)):
+                    entry = (value, now)
+                    self._known[path] = entry
+                    self._pending[path] = entry
+                    if self._restored:
+                        self._restored.pop(path, None)
+                        self._restored_at.pop(path, None)
+
+    @staticmethod
+    def _stamped(frame: wire.Frame) -> dict[str, tuple[Any, float]]:
+        stamps = frame.stamps
+        default = frame.time or 0.0
+        return {path: (value, stamps.get(path, default)) for path, value in frame.changes.items()}
+
+    def _run(self) -> None:
+        next_snapshot = time.monotonic() + self.snapshot_interval
+        while True:
+            with self._cond:
+                if not self._stopping:
+                    self._cond.wait(self.wal_interval)
+                stopping = self._stopping
+
+            try:
+                if (
+                    stopping
+                    or time.monotonic() >= next_snapshot
+                    or (self._wal_bytes >= self.wal_max_bytes)
+                ):
+                    next_snapshot = time.monotonic() + self.snapshot_interval
+                    self._snapshot()
+                else:
+                    self._append()
+            except Exception as e:
+                # Keep persisting; the next snapshot covers what was lost here
+                self._write_error(f"Failed to persist RoamK state: {e!r}")
+            if stopping:
+                self._close_wal()
+                return
+
+    def _append(self) -> None:
+        """Write pending changes to the log as one record."""
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            segment = self._segment
+        frame = self._encode(pending)
+        record = _RECORD.pack(len(frame), zlib.crc32(frame)) + frame
+        try:
+            if self._wal is None:
+                self.dir.mkdir(parents=True, exist_ok=True)
+                self._wal = open(self.dir / f"{segment}.wal", "ab")
+            self._wal.write(record)
+            self._wal.flush()
+            if self.fsync:
+                os.fsync(self._wal.fileno())
+            self._wal_bytes += len(record)
+            self.wal_records += 1
+        except OSError as e:
+            self._write_error(f"Failed to append to the state log: {e}")
+
+    def _snapshot(self) -> None:
+        """Write all known values to a new snapshot and drop the old log segments."""
+        with self._lock:
+            known = dict(self._known)
+            # In the snapshot; back to the log if the snapshot is not written
+            pending, self._pending = self._pending, {}
+            self._segment += 1
+            segment = self._segment
+        self._close_wal()
+        self._wal_bytes = 0
+        if not known:
+            return
+
+        replaced = False
+        try:
+            now = time.time()
+            frame = self._encode(known, now)
+            header = _SNAP_HEADER.pack(_SNAP_MAGIC, _FORMAT, segment, now, zlib.crc32(frame))
+            path = self.dir / SNAPSHOT_NAME
+            tmp = path.with_suffix(".tmp")
+            self.dir.mkdir(parents=True, exist_ok=True)
+            with open(tmp, "wb") as f:
+                f.write(header + frame)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            os.replace(tmp, path)
+            replaced = True
+            if self.fsync:
+                self._fsync_dir()
+        except OSError as e:
+            if not replaced:
+                self._requeue(pending)
+                # The older log segments are kept and the changes go to the new one
+                self._write_error(f"Failed to write the state snapshot: {e}")
+                return
+            self._write_error(f"Failed to sync the state directory: {e}")
+        except Exception:
+            self._requeue(pending)
+            raise
+        self.snapshots += 1
+        self.last_snapshot = now
+
+        for old, wal in self._segments():
+            if old < segment:
+                try:
+                    wal.unlink()
+                except OSError as e:
+                    logger.warning(f"Failed to remove old state log {wal}: {e}")
+
+    def _requeue(self, pending: dict[str, tuple[Any, float]]) -> None:
+        """Put changes back in front of those made since, for the next log append."""
+        with self._lock:
+            self._pending = {**pending, **self._pending}
+
+    def _encode(self, entries: dict[str, tuple[Any, float]], now: Optional[float] = None) -> bytes:
+        return wire.encode_frame(
+            ((path, value) for path, (value, _) in entries.items()),
+            stamps={path: stamp for path, (_, stamp) in entries.items()},
+            now=now,
+        )
+
+    def _close_wal(self) -> None:
+        if self._wal is not None:
+            try:
+                self._wal.close()
+            except OSError as e:
+                self._write_error(f"Failed to close the state log: {e}")
+            self._wal = None
+
+    def _fsync_dir(self) -> None:
+        """Make the rename itself durable."""
+        fd = os.open(self.dir, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _write_error(self, message: str) -> None:
+        self.write_errors += 1
+        if self.write_errors == 1 or self.write_errors % 100 == 0:
+            logger.error(f"{message} ({self.write_errors} errors)")
+
+    def _segments(self) -> list[tuple[int, Path]]:
+        """Log segments on disk, oldest first."""
+        if not self.dir.is_dir():
+            return []
+        segments = []
+        for path in self.dir.glob("*.wal"):
+            try:
+                segments.append((int(path.stem), path))
+            except ValueError:
+                continue
+        return sorted(segments)
+
+    def _read_snapshot(self) -> Optional[tuple[int, wire.Frame]]:
+        """(first log segment after it, frame), or None if missing or unusable."""
+        path = self.dir / SNAPSHOT_NAME
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.error(f"Failed to read the state snapshot: {e}")
+            return None
+        try:
+            magic, fmt, segment, _, crc = _SNAP_HEADER.unpack_from(data)
+            frame = data[_SNAP_HEADER.size :]
+            if magic != _SNAP_MAGIC or fmt != _FORMAT or zlib.crc32(frame) != crc:
+                raise ValueError("bad header or checksum")
+            return segment, wire.decode_frame(frame)
+        except (struct.error, ValueError) as e:
+            logger.warning(f"Ignoring unusable state snapshot {path}: {e}")
+            return None
+
+    def _read_wal(self, path: Path) -> list[wire.Frame]:
+        """The frames of a log segment, up to the first torn or corrupt record."""
+        try:
+            data = path.read_bytes()
+        except OSError as e:
+            logger.error(f"Failed to read state log {path}: {e}")
+            return []
+        frames = []
+        pos = 0
+        while pos + _RECORD.size <= len(data):
+            length, crc = _RECORD.unpack_from(data, pos)
+            frame = data[pos + _RECORD.size : pos + _RECORD.size + length]
+            if len(frame) != length or zlib.crc32(frame) != crc:
+                break
+            try:
+                frames.append(wire.decode_frame(frame))
+            except ValueError:
+                break
+            pos += _RECORD.size + length
+        if pos != len(data):
+            logger.warning(f"State log {path} ends with {len(data) - pos} unreadable bytes")
+        return frames
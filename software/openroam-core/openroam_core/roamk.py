@@ -5,10 +5,26 @@ Similar to Signal K for marine vessels, RoamK provides a unified
 data model for all vehicle systems.
 """
 
-from dataclasses import dataclass, field
-from typing import Optional
+import bisect
+import inspect
+import json
+import logging
+import re
+import threading
+import time
+import types
+import typing
+from collections import deque
+from contextlib import contextmanager
+from fnmatch import fnmatchcase
+from dataclasses import asdict, dataclass, field, fields, is_dataclass
+from typing import Any, Callable, Iterable, Iterator, Mapping, Optional, Union
 from datetime import datetime
 
+from .dispatch import Dispatcher
+
+logger = logging.getLogger(__name__)
+
 
 @dataclass
 class Location:
@@ -172,57 +188,815 @@ class RoamKState:
     last_update: datetime = field(default_factory=datetime.now)
 
 
-class RoamK:
-    """RoamK data store."""
+def _to_bool(value: Any) -> bool:
+    """Coerce a payload value to bool."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in ("true", "1", "on", "yes"):
+            return True
+        if text in ("false", "0", "off", "no"):
+            return False
+        raise ValueError(f"Not a boolean: {value!r}")
+    return bool(value)
 
-    def __init__(self) -> None:
-        self.state = RoamKState()
-        self._callbacks: list[callable] = []
 
-    def update_path(self, path: str, value: any) -> None:
-        """Update a value at the given path."""
-        parts = path.split(".")
-        obj = self.state
+def _to_int(value: Any) -> int:
+    """Coerce a payload value to int, accepting float-formatted input."""
+    if isinstance(value, int):
+        return int(value)
+    if isinstance(value, float):
+        return round(value)
+    return round(float(value))
 
-        for part in parts[:-1]:
-            if hasattr(obj, part):
-                obj = getattr(obj, part)
-            else:
-                return
 
-        if hasattr(obj, parts[-1]):
-            setattr(obj, parts[-1], value)
-            self.state.last_update = datetime.now()
-            self._notify()
+def _identity(value: Any) -> Any:
+    return value
 
-    def get_path(self, path: str) -> any:
-        """Get a value at the given path."""
-        parts = path.split(".")
-        obj = self.state
 
-        for part in parts:
-            if hasattr(obj, part):
-                obj = getattr(obj, part)
-            else:
-                return None
+_COERCERS: dict[Any, Callable[[Any], Any]] = {
+    float: float,
+    int: _to_int,
+    bool: _to_bool,
+    str: str,
+}
+
+
+def _unwrap_optional(tp: Any) -> tuple[Any, bool]:
+    """Return (inner type, is_optional) for Optional[X] annotations."""
+    origin = typing.get_origin(tp)
+    if origin is typing.Union or origin is types.UnionType:
+        args = [arg for arg in typing.get_args(tp) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0], True
+    return tp, False
+
+
+def _make_coercer(tp: Any) -> Callable[[Any], Any]:
+    """Build a coercion function for a dataclass field annotation."""
+    inner, optional = _unwrap_optional(tp)
+    coerce = _COERCERS.get(inner, _identity)
+    if not optional or coerce is _identity:
+        return coerce
+
+    def coerce_optional(value: Any) -> Any:
+        return None if value is None else coerce(value)
+
+    return coerce_optional
+
+
+_HINTS_CACHE: dict[type, dict[str, Any]] = {}
 
-        return obj
 
-    def subscribe(self, callback: callable) -> None:
-        """Subscribe to state changes."""
-        self._callbacks.append(callback)
+def _field_hints(cls: type) -> dict[str, Any]:
+    """Resolved type hints for the fields of a dataclass type."""
+    hints = _HINTS_CACHE.get(cls)
+    if hints is None:
+        resolved = typing.get_type_hints(cls)
+        hints = {f.name: resolved[f.name] for f in fields(cls)}
+        _HINTS_CACHE[cls] = hints
+    return hints
 
-    def unsubscribe(self, callback: callable) -> None:
-        """Unsubscribe from state changes."""
-        self._callbacks.remove(callback)
 
-    def _notify(self) -> None:
+# One path segment: a dataclass field (".name") or a dict key ("[key]")
+_PATH_SEGMENT = re.compile(r"(?:^|\.)([A-Za-z_]\w*)|\[([^\[\].]+)\]")
+
+
+def _split_path(path: str) -> Optional[list[tuple[str, bool]]]:
+    """Split a path into (name, is_key) tokens, or None if malformed."""
+    tokens = []
+    pos = 0
+    while pos < len(path):
+        match = _PATH_SEGMENT.match(path, pos)
+        if match is None:
+            return None
+        if match.group(1) is not None:
+            tokens.append((match.group(1), False))
+        else:
+            tokens.append((match.group(2), True))
+        pos = match.end()
+    return tokens or None
+
+
+class PathAccessor:
+    """Precompiled getter/setter for one RoamK path.
+
+    Holds a direct reference to the parent object and the attribute name,
+    so reads and writes skip string parsing and reflection entirely.
+    """
+
+    __slots__ = ("path", "section", "parent", "attr", "type", "optional", "coerce", "branch")
+
+    def __init__(self, path: str, parent: Any, attr: str, annotation: Any) -> None:
+        self.path = path
+        self.section = path.split(".", 1)[0]
+        self.parent = parent
+        self.attr = attr
+        self.type, self.optional = _unwrap_optional(annotation)
+        self.coerce = _make_coercer(annotation)
+        self.branch = is_dataclass(self.type) or typing.get_origin(self.type) in (dict, list)
+
+    def get(self) -> Any:
+        """Read the current value."""
+        return getattr(self.parent, self.attr)
+
+    def write(self, value: Any) -> None:
+        """Write an already coerced value."""
+        setattr(self.parent, self.attr, value)
+
+    def set(self, value: Any) -> None:
+        """Coerce and write a value."""
+        self.write(self.coerce(value))
+
+
+class KeyAccessor(PathAccessor):
+    """Accessor for one entry of a dict field, e.g. ``safety.doors[rear]``."""
+
+    __slots__ = ()
+
+    def get(self) -> Any:
+        """Read the current value, None if the key is absent."""
+        return self.parent.get(self.attr)
+
+    def write(self, value: Any) -> None:
+        """Write an already coerced value."""
+        self.parent[self.attr] = value
+
+
+def path_matches(pattern: str, path: str) -> bool:
+    """Check a changed path against a subscription pattern.
+
+    Patterns are dotted paths with optional shell-style wildcards
+    (``power.*``, ``tanks.*.level``). A plain path also matches its
+    descendants, and a changed subtree matches patterns below it.
+    """
+    if pattern == path or fnmatchcase(path, pattern):
+        return True
+    return _is_descendant(path, pattern) or _is_descendant(pattern, path)
+
+
+def _is_descendant(path: str, ancestor: str) -> bool:
+    return path.startswith(ancestor) and path[len(ancestor) : len(ancestor) + 1] in (".", "[")
+
+
+def flatten_path(path: str, value: Any) -> Iterator[tuple[str, Any]]:
+    """Yield (path, scalar) pairs for a value, expanding replaced subtrees."""
+    if is_dataclass(value):
+        for f in fields(value):
+            yield from flatten_path(f"{path}.{f.name}", getattr(value, f.name))
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            yield from flatten_path(f"{path}[{key}]", item)
+    else:
+        yield path, value
+
+
+class Subscription:
+    """A subscriber callback with optional path filters and deadbands."""
+
+    def __init__(
+        self,
+        callback: Callable[["RoamKState", frozenset[str]], None],
+        paths: Optional[Iterable[str]] = None,
+        deadbands: Optional[Mapping[str, float]] = None,
+    ) -> None:
+        self.callback = callback
+        # What _notify calls: the callback itself, or its dispatcher queue
+        self.deliver: Callable[[RoamKState, frozenset[str]], None] = callback
+        self.dispatcher: Optional[Dispatcher] = None
+        self.patterns = tuple(paths) if paths else None
+        self.deadbands = dict(deadbands) if deadbands else {}
+        self._matches: dict[str, bool] = {}
+        self._bands: dict[str, Optional[float]] = {}
+        self._last_sent: dict[str, float] = {}
+
+    @property
+    def filtered(self) -> bool:
+        """Whether this subscription needs per-path filtering."""
+        return self.patterns is not None or bool(self.deadbands)
+
+    def matches(self, path: str) -> bool:
+        """Check whether a path is covered by this subscription."""
+        hit = self._matches.get(path)
+        if hit is None:
+            hit = self.patterns is None or any(path_matches(p, path) for p in self.patterns)
+            self._matches[path] = hit
+        return hit
+
+    def _deadband(self, path: str) -> Optional[float]:
+        if path not in self._bands:
+            band = self.deadbands.get(path)
+            if band is None:
+                band = next((b for p, b in self.deadbands.items() if fnmatchcase(path, p)), None)
+            self._bands[path] = band
+        return self._bands[path]
+
+    def select(self, changed: frozenset[str], roamk: "RoamK") -> frozenset[str]:
+        """Return the changed paths this subscriber should hear about."""
+        selected = []
+        for path in changed:
+            if not self.matches(path):
+                continue
+            band = self._deadband(path)
+            if band is not None:
+                value = roamk.get_path(path)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    last = self._last_sent.get(path)
+                    if last is not None and abs(value - last) < band:
+                        continue
+                    self._last_sent[path] = value
+            selected.append(path)
+        return frozenset(selected)
+
+
+def _json_default(value: Any) -> Any:
+    """JSON encoder fallback for RoamK values."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if is_dataclass(value):
+        return asdict(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def encode_json(value: Any) -> bytes:
+    """Encode a RoamK value (dataclass or plain) as compact JSON bytes."""
+    if is_dataclass(value):
+        value = asdict(value)
+    return json.dumps(value, default=_json_default, separators=(",", ":")).encode()
+
+
+SECTIONS = tuple(f.name for f in fields(RoamKState) if is_dataclass(f.type))
+
+Scheduler = Callable[[float, Callable[[], None]], Any]
+
+
+def _merge_notifications(queued: tuple, new: tuple) -> tuple:
+    """Combine two queued (state, changed) notifications into one."""
+    return new[0], queued[1] | new[1]
+
+
+def _two_args(callback: Callable) -> Callable[[RoamKState, frozenset[str]], None]:
+    """Adapt a ``callback(state)`` subscriber from before changed paths were passed."""
+    try:
+        params = inspect.signature(callback).parameters.values()
+    except (TypeError, ValueError):
+        return callback
+    if any(p.kind is p.VAR_POSITIONAL for p in params):
+        return callback
+    positional = [p for p in params if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)]
+    if len(positional) != 1:
+        return callback
+    return lambda state, changed: callback(state)
+
+
+def _thread_timer(delay: float, callback: Callable[[], None]) -> threading.Timer:
+    """Default coalescer scheduler: run callback on a daemon timer thread."""
+    timer = threading.Timer(delay, callback)
+    timer.daemon = True
+    timer.start()
+    return timer
+
+
+class RoamK:
+    """RoamK data store.
+
+    Subscribers are called as ``callback(state, changed_paths)`` with the
+    frozenset of paths whose value changed since the previous notification;
+    writes of an identical value are suppressed. Callbacks that take a
+    single argument are still called as ``callback(state)``. Updates made inside
+    ``batch()`` or ``update_many()`` produce one notification per batch;
+    with ``coalesce_window`` set, unbatched updates are also gathered and
+    delivered at most once per window.
+
+    With ``compact``, the state is held in the array-backed representation
+    from ``openroam_core.compact``, which has the same attribute API.
+
+    Every change advances ``version``. The version at which each path last
+    changed is kept, along with a log of the last ``change_log_size``
+    changes, so clients can fetch what changed since a version they saw.
+
+    Every accepted write, changed or not, stamps the path's receive time
+    in ``received`` (monotonic seconds). A staleness monitor (see
+    staleness.py) moves paths whose source has gone quiet to ``stale``
+    and tells ``subscribe_stale`` subscribers; the next write makes them
+    fresh again.
+    """
+
+    def __init__(
+        self,
+        coalesce_window: Optional[float] = None,
+        scheduler: Optional[Scheduler] = None,
+        compact: bool = False,
+        change_log_size: int = 4096,
+    ) -> None:
+        if compact:
+            from .compact import compact_state
+
+            self._state = compact_state()
+        else:
+            self._state = RoamKState()
+        # Compact states stamp last_update without building a datetime
+        self._mark_updated = getattr(self._state, "touch", self._stamp_last_update)
+        self._accessors: dict[str, PathAccessor] = {}
+        self._subscriptions: list[Subscription] = []
+
+        self.coalesce_window = coalesce_window
+        self._scheduler = scheduler or _thread_timer
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._pending: set[str] = set()
+        self._flush_scheduled = False
+
+        # Change versions drive the serialized snapshot cache and ETags
+        self.version = 0
+        self._section_versions: dict[str, int] = {}
+        self._json_cache: dict[str, tuple[int, bytes]] = {}
+        # Binary frame entries (see wire.py): path -> (version, entry count, entries)
+        self._frame_cache: dict[str, tuple[int, int, bytes]] = {}
+        self._etag_prefix = f"{time.time_ns():x}"
+
+        # Per-path versions and the (version, path) change log; changes at or
+        # before _log_floor have been evicted from the log
+        self._path_versions: dict[str, int] = {}
+        self._change_log: deque[tuple[int, str]] = deque(maxlen=change_log_size)
+        self._log_floor = 0
+
+        # Path -> monotonic time last written; stale paths move to ``stale``
+        # until written again, and each move advances stale_version
+        self.received: dict[str, float] = {}
+        self.stale: dict[str, float] = {}
+        self.stale_version = 0
+        self._stale_subscriptions: list[Subscription] = []
+        # Paths new to ``received``, for the staleness monitor once one is attached
+        self._arrivals: Optional[deque[str]] = None
+        # Every path ever received, sorted, so a subtree is one contiguous range
+        self._received_paths: list[str] = []
+
+        # Updates whose value could not be coerced to the field type
+        self.rejected = 0
+        # Exceptions raised by inline subscriber callbacks
+        self.callback_errors = 0
+
+    @property
+    def state(self) -> RoamKState:
+        """Current state tree."""
+        return self._state
+
+    @state.setter
+    def state(self, state: RoamKState) -> None:
+        self._state = state
+        self._mark_updated = getattr(state, "touch", self._stamp_last_update)
+        self._accessors.clear()
+        self._json_cache.clear()
+        self._frame_cache.clear()
+        self.version += 1
+        self._section_versions = dict.fromkeys(SECTIONS, self.version)
+        # Everything changed; clients behind this point must resync
+        self._path_versions.clear()
+        self._change_log.clear()
+        self._log_floor = self.version
+
+    @property
+    def epoch(self) -> str:
+        """Identifies this store instance; versions from another epoch are meaningless."""
+        return self._etag_prefix
+
+    def compile_path(self, path: str, create: bool = False) -> Optional[PathAccessor]:
+        """Resolve a path to a cached accessor, or None if invalid.
+
+        Paths are dotted field names with ``[key]`` segments for dict fields
+        (``climate.zones[front].temperature``, ``safety.doors[rear]``). With
+        ``create``, missing dict entries along the way are created; otherwise
+        paths through absent keys do not resolve.
+        """
+        accessor = self._accessors.get(path)
+        if accessor is not None:
+            return accessor
+
+        tokens = _split_path(path)
+        if tokens is None:
+            return None
+
+        obj: Any = self._state
+        annotation: Any = RoamKState
+        last = len(tokens) - 1
+        for i, (token, is_key) in enumerate(tokens):
+            if is_key:
+                if not isinstance(obj, dict):
+                    return None
+                value_type = typing.get_args(annotation)[1]
+                if i == last:
+                    if not create and token not in obj:
+                        return None
+                    accessor = KeyAccessor(path, obj, token, value_type)
+                    break
+                child = obj.get(token)
+                if child is None:
+                    if not create or not is_dataclass(value_type):
+                        return None
+                    child = obj[token] = value_type()
+                    self._touch(tokens[0][0])
+                obj, annotation = child, value_type
+            else:
+                if not is_dataclass(obj):
+                    return None
+                hints = _field_hints(type(obj))
+                if token not in hints:
+                    return None
+                if i == last:
+                    accessor = PathAccessor(path, obj, token, hints[token])
+                    break
+                obj, annotation = getattr(obj, token), _unwrap_optional(hints[token])[0]
+
+        self._accessors[path] = accessor
+        return accessor
+
+    def compile_paths(self, paths: Iterable[str]) -> None:
+        """Precompile accessors for a set of known paths."""
+        for path in paths:
+            if self.compile_path(path) is None:
+                logger.warning(f"Unknown RoamK path: {path}")
+
+    def update_path(self, path: str, value: any) -> None:
+        """Update a value at the given path."""
+        accessor = self._accessors.get(path) or self.compile_path(path, create=True)
+        if accessor is None:
+            return
+
+        try:
+            value = accessor.coerce(value)
+        except (TypeError, ValueError):
+            self.rejected += 1
+            logger.debug(f"Rejected value {value!r} for {path}")
+            return
+
+        received = self.received
+        if path not in received:
+            self._arrived(path)
+        received[path] = time.monotonic()
+
+        if accessor.get() == value:
+            return
+
+        accessor.write(value)
+        if accessor.branch:
+            # A subtree was replaced; cached parent references are stale
+            self._accessors.clear()
+
+        self._touch(accessor.section)
+        self._log_change(path)
+        self._record_change(path)
+
+    def _touch(self, section: str) -> None:
+        """Advance the change version for a top-level section."""
+        self._mark_updated()
+        self.version += 1
+        self._section_versions[section] = self.version
+
+    def _log_change(self, path: str) -> None:
+        """Record the current version as a path's last change."""
+        log = self._change_log
+        if len(log) == log.maxlen:
+            self._log_floor = log[0][0]
+        log.append((self.version, path))
+        self._path_versions[path] = self.version
+
+    def path_version(self, path: str) -> int:
+        """Version at which a path, an ancestor or a descendant last changed."""
+        return max(
+            (
+                version
+                for changed, version in self._path_versions.items()
+                if changed == path or _is_descendant(changed, path) or _is_descendant(path, changed)
+            ),
+            default=self._log_floor,
+        )
+
+    def changes_since(self, since: int) -> Optional[list[str]]:
+        """Paths changed after version ``since``, oldest change first.
+
+        Returns None when the change log no longer reaches back to
+        ``since`` (or ``since`` is from the future), in which case the
+        caller needs a full snapshot.
+        """
+        if since < self._log_floor or since > self.version:
+            return None
+        paths: dict[str, None] = {}
+        for version, path in reversed(self._change_log):
+            if version <= since:
+                break
+            paths[path] = None
+        return list(reversed(paths))
+
+    def _arrived(self, path: str) -> None:
+        """Note a path received for the first time, or again after going stale."""
+        if self._arrivals is not None:
+            self._arrivals.append(path)
+        if path not in self.stale:
+            bisect.insort(self._received_paths, path)
+
+    def received_at(self, path: str) -> Optional[float]:
+        """Unix time a path was last received, as itself, in a subtree or below it."""
+        stamp = None
+        paths = self._received_paths
+        for separator in ".[":
+            prefix = path + separator
+            for i in range(bisect.bisect_left(paths, prefix), len(paths)):
+                below = paths[i]
+                if not below.startswith(prefix):
+                    break
+                s = self.received.get(below)
+                if s is None:
+                    s = self.stale.get(below)
+                if s is not None and (stamp is None or s > stamp):
+                    stamp = s
+        ancestor = path
+        while stamp is None and ancestor:
+            stamp = self.received.get(ancestor)
+            if stamp is None:
+                stamp = self.stale.get(ancestor)
+            cut = max(ancestor.rfind("."), ancestor.rfind("["))
+            ancestor = ancestor[:cut] if cut > 0 else ""
+        if stamp is None:
+            return None
+        return time.time() - time.monotonic() + stamp
+
+    def set_received(self, stamps: Mapping[str, float]) -> None:
+        """Backdate receive times to the given Unix times, e.g. for restored values."""
+        offset = time.monotonic() - time.time()
+        for path, stamp in stamps.items():
+            target = self.stale if path in self.stale else self.received
+            target[path] = stamp + offset
+
+    def stale_paths(self, path: str = "") -> dict[str, float]:
+        """Stale paths at, below or above a path (all if empty), with Unix receive times."""
+        offset = time.time() - time.monotonic()
+        return {
+            stale: stamp + offset
+            for stale, stamp in list(self.stale.items())
+            if not path or path_matches(path, stale)
+        }
+
+    def track_arrivals(self) -> deque[str]:
+        """Start queueing paths new to ``received``; the queue starts with those known."""
+        if self._arrivals is None:
+            self._arrivals = deque(self.received)
+        return self._arrivals
+
+    def mark_stale(self, paths: Iterable[str]) -> None:
+        """Move paths to ``stale`` and notify stale subscribers."""
+        marked = []
+        for path in paths:
+            stamp = self.received.pop(path, None)
+            if stamp is not None:
+                self.stale[path] = stamp
+                marked.append(path)
+        if marked:
+            self.stale_version += 1
+            self._notify_stale(frozenset(marked), frozenset())
+
+    def mark_fresh(self, paths: Iterable[str]) -> None:
+        """Drop written-again paths from ``stale`` and notify stale subscribers."""
+        fresh = [path for path in paths if self.stale.pop(path, None) is not None]
+        if fresh:
+            self.stale_version += 1
+            self._notify_stale(frozenset(), frozenset(fresh))
+
+    def _stamp_last_update(self) -> None:
+        self._state.last_update = datetime.now()
+
+    def update_many(self, updates: Union[Mapping[str, Any], Iterable[tuple[str, Any]]]) -> None:
+        """Apply several updates and notify subscribers once."""
+        items = updates.items() if isinstance(updates, Mapping) else updates
+        with self.batch():
+            for path, value in items:
+                self.update_path(path, value)
+
+    @contextmanager
+    def batch(self) -> Iterator["RoamK"]:
+        """Group updates into a single notification, delivered on exit."""
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                done = self._batch_depth == 0
+            if done:
+                self.flush()
+
+    def flush(self) -> None:
+        """Deliver any pending change notification immediately."""
+        with self._lock:
+            changed = self._pending
+            self._pending = set()
+            self._flush_scheduled = False
+        if changed:
+            self._notify(frozenset(changed))
+
+    def get_path(self, path: str) -> any:
+        """Get a value at the given path."""
+        accessor = self._accessors.get(path) or self.compile_path(path)
+        if accessor is None:
+            return None
+        return accessor.get()
+
+    def subscribe(
+        self,
+        callback: Callable[[RoamKState, frozenset[str]], None],
+        paths: Optional[Iterable[str]] = None,
+        deadbands: Optional[Mapping[str, float]] = None,
+        dispatcher: Optional[Dispatcher] = None,
+        policy: Optional[str] = None,
+        max_queue: Optional[int] = None,
+    ) -> Subscription:
+        """Subscribe to state changes.
+
+        ``paths`` limits notifications to matching path patterns and
+        ``deadbands`` maps numeric paths (or patterns) to the minimum change
+        from the last value delivered to this subscriber.
+
+        With a ``dispatcher`` the callback runs on the dispatcher through a
+        bounded queue (see dispatch.py), so it never blocks ingest. It then
+        sees the state as of when it runs; with the coalesce_latest policy
+        notifications waiting in the queue are merged into one.
+        """
+        subscription = Subscription(callback, paths, deadbands)
+        subscription.deliver = _two_args(callback)
+        if dispatcher is not None:
+            subscription.dispatcher = dispatcher
+            subscription.deliver = dispatcher.wrap(
+                subscription.deliver,
+                policy,
+                max_queue,
+                name=getattr(callback, "__qualname__", repr(callback)),
+                merge=_merge_notifications,
+            )
+        self._subscriptions = [*self._subscriptions, subscription]
+        return subscription
+
+    def subscribe_stale(
+        self,
+        callback: Callable[[frozenset[str], frozenset[str]], None],
+        paths: Optional[Iterable[str]] = None,
+    ) -> Subscription:
+        """Subscribe to paths going stale or fresh again.
+
+        Called as ``callback(stale, fresh)`` from the staleness monitor's
+        tick, with the paths matching ``paths`` that changed each way.
+        """
+        subscription = Subscription(callback, paths)
+        self._stale_subscriptions = [*self._stale_subscriptions, subscription]
+        return subscription
+
+    def unsubscribe(self, callback: Union[Callable, Subscription]) -> None:
+        """Unsubscribe from state changes or stale events."""
+        self._stale_subscriptions = [
+            s for s in self._stale_subscriptions if s is not callback and s.callback != callback
+        ]
+        removed = [s for s in self._subscriptions if s is callback or s.callback == callback]
+        self._subscriptions = [s for s in self._subscriptions if s not in removed]
+        for subscription in removed:
+            if subscription.dispatcher is not None:
+                subscription.dispatcher.remove(subscription.deliver)
+
+    def _record_change(self, path: str) -> None:
+        """Queue a changed path and notify now or when the window closes."""
+        with self._lock:
+            self._pending.add(path)
+            if self._batch_depth:
+                return
+            if self.coalesce_window:
+                if not self._flush_scheduled:
+                    self._flush_scheduled = True
+                    self._scheduler(self.coalesce_window, self.flush)
+                return
+        self.flush()
+
+    def _notify(self, changed: frozenset[str]) -> None:
         """Notify all subscribers of state change."""
-        for callback in self._callbacks:
-            callback(self.state)
+        for subscription in self._subscriptions:
+            # A failing subscriber must not keep the others from hearing about it
+            try:
+                if subscription.filtered:
+                    selected = subscription.select(changed, self)
+                    if selected:
+                        subscription.deliver(self.state, selected)
+                else:
+                    subscription.deliver(self.state, changed)
+            except Exception:
+                self._callback_failed(subscription)
+
+    def _notify_stale(self, stale: frozenset[str], fresh: frozenset[str]) -> None:
+        """Notify stale subscribers of paths going stale or fresh."""
+        for subscription in self._stale_subscriptions:
+            try:
+                if subscription.filtered:
+                    selected_stale = frozenset(p for p in stale if subscription.matches(p))
+                    selected_fresh = frozenset(p for p in fresh if subscription.matches(p))
+                    if selected_stale or selected_fresh:
+                        subscription.callback(selected_stale, selected_fresh)
+                else:
+                    subscription.callback(stale, fresh)
+            except Exception:
+                self._callback_failed(subscription)
+
+    def _callback_failed(self, subscription: Subscription) -> None:
+        self.callback_errors += 1
+        if self.callback_errors == 1 or self.callback_errors % 1000 == 0:
+            logger.exception(
+                f"Subscriber {subscription.callback!r} failed ({self.callback_errors} errors)"
+            )
 
     def to_dict(self) -> dict:
         """Convert state to dictionary."""
-        from dataclasses import asdict
-
         return asdict(self.state)
+
+    def snapshot_json(self, path: str = "") -> Optional[tuple[bytes, str]]:
+        """Return (JSON bytes, ETag) for the whole state or one path.
+
+        Serialized subtrees are cached per path and reused until an update
+        touches the same top-level section, so repeated polls of unchanged
+        data cost a dict lookup. Returns None for unknown paths.
+        """
+        if not path:
+            version = self.version
+            body = self._cached_json("", version)
+            if body is None:
+                parts = [
+                    b'"%s":%s' % (name.encode(), self.snapshot_json(name)[0]) for name in SECTIONS
+                ]
+                parts.append(b'"last_update":' + encode_json(self._state.last_update))
+                body = b"{" + b",".join(parts) + b"}"
+                self._json_cache[""] = (version, body)
+            return body, self._etag(version)
+
+        accessor = self.compile_path(path)
+        if accessor is None:
+            return None
+
+        if accessor.section in SECTIONS:
+            version = self._section_versions.get(accessor.section, 0)
+        else:
+            version = self.version
+        body = self._cached_json(path, version)
+        if body is None:
+            body = encode_json(accessor.get())
+            self._json_cache[path] = (version, body)
+        return body, self._etag(version)
+
+    def snapshot_frame(self, path: str = "") -> Optional[tuple[bytes, str]]:
+        """Return (binary snapshot frame, ETag) for the whole state or one path.
+
+        The binary counterpart of snapshot_json (see wire.py), cached the
+        same way. Returns None for unknown paths.
+        """
+        from . import wire
+
+        if not path:
+            version = self.version
+            count = 0
+            parts = []
+            for name in SECTIONS:
+                n, entries = self._frame_entries(name, self._section_versions.get(name, 0))
+                count += n
+                parts.append(entries)
+            n, entries = wire.encode_change("last_update", self._state.last_update)
+            parts.append(entries)
+            frame = wire.build_frame(count + n, b"".join(parts), version, self.epoch)
+            return frame, self._etag(version, "b")
+
+        accessor = self.compile_path(path)
+        if accessor is None:
+            return None
+
+        if accessor.section in SECTIONS:
+            version = self._section_versions.get(accessor.section, 0)
+        else:
+            version = self.version
+        count, entries = self._frame_entries(path, version)
+        return wire.build_frame(count, entries, version, self.epoch), self._etag(version, "b")
+
+    def _frame_entries(self, path: str, version: int) -> tuple[int, bytes]:
+        from . import wire
+
+        cached = self._frame_cache.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2]
+        count, entries = wire.encode_change(path, self.get_path(path))
+        self._frame_cache[path] = (version, count, entries)
+        return count, entries
+
+    def _cached_json(self, path: str, version: int) -> Optional[bytes]:
+        cached = self._json_cache.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        return None
+
+    def _etag(self, version: int, suffix: str = "") -> str:
+        # Each representation of the same version has its own tag
+        if suffix:
+            return f'"{self._etag_prefix}-{version}-{suffix}"'
+        return f'"{self._etag_prefix}-{version}"'
@@ -4,16 +4,34 @@ OpenRoam API Server
 FastAPI server providing REST API for the dashboard and external integrations.
 """
 
+import asyncio
+import json
 import logging
+import time
 from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, Optional
 
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 
+from . import wire
+from .alerts import SEVERITIES, AlertEngine
 from .config import Config
-from .mqtt_client import MqttClient
-from .roamk import RoamK
+from .dispatch import Dispatcher
+from .fleet import SUMMARY_PATHS, Fleet
+from .history import HistoryStore
+from .influx import InfluxWriter
+from .metrics import Histogram, Registry
+from .mqtt_client import FRAME_TOPIC, SUBSYSTEMS, MqttClient
+from .persist import StatePersister
+from .roamk import RoamK, encode_json
+from .sharding import ShardedIngest
+from .staleness import StalenessMonitor
+from .streaming import DeltaBroadcaster, StreamClient
+from .uplink import UplinkBridge
 
 logger = logging.getLogger(__name__)
 
@@ -21,12 +39,37 @@ logger = logging.getLogger(__name__)
 config: Config
 roamk: RoamK
 mqtt_client: MqttClient
+broadcaster: DeltaBroadcaster
+influx_writer: Optional[InfluxWriter] = None
+history: Optional[HistoryStore] = None
+fleet: Optional[Fleet] = None
+alerts: Optional[AlertEngine] = None
+uplink: Optional[UplinkBridge] = None
+# Saves RoamK state for warm starts, when enabled
+persister: Optional[StatePersister] = None
+# Marks RoamK paths stale when their source goes quiet, when enabled
+staleness: Optional[StalenessMonitor] = None
+# Worker processes ingesting some subsystems, when sharding is enabled
+sharded: Optional[ShardedIngest] = None
+metrics: Optional[Registry] = None
+# Runs queued subscriber callbacks (RoamK.subscribe/add_message_callback with dispatcher=)
+dispatcher: Optional[Dispatcher] = None
+
+# Time from request to response start per route template, when metrics are enabled
+http_timings: dict[str, Histogram] = {}
+
+# Interval between SSE keep-alive comments, in seconds
+SSE_KEEPALIVE = 15.0
+
+# Interval between checks of alert rules with a duration, in seconds
+ALERT_TICK = 1.0
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager."""
-    global config, roamk, mqtt_client
+    global config, roamk, mqtt_client, broadcaster, influx_writer, history, fleet, metrics
+    global dispatcher, alerts, sharded, uplink, persister, staleness
 
     # Load configuration
     config = Config.load()
@@ -34,6 +77,30 @@ async def lifespan(app: FastAPI):
     # Initialize RoamK data store
     roamk = RoamK()
 
+    # Queued dispatch for subscribers that must not hold up ingest. The built-in
+    # consumers below stay inline: they only copy changes into their own buffers,
+    # and must read each value on this thread at the time it changes.
+    dispatcher = Dispatcher(
+        workers=config.dispatch.workers,
+        loop=asyncio.get_running_loop() if config.dispatch.workers <= 0 else None,
+        max_queue=config.dispatch.max_queue,
+        policy=config.dispatch.policy,
+    )
+
+    # Serve the last known values at once, before any subscriber sees updates
+    if config.persist.enabled and not config.fleet.enabled:
+        persister = StatePersister.from_config(config.persist)
+        persister.restore(roamk)
+        persister.attach(roamk)
+        persister.start()
+
+    # Mark fields stale when their source stops reporting; runs on this loop with ingest
+    staleness_task = None
+    if config.staleness.enabled and not config.fleet.enabled:
+        staleness = StalenessMonitor.from_config(roamk, config.staleness)
+        staleness.start()
+        staleness_task = asyncio.create_task(staleness.run())
+
     # Initialize MQTT client
     mqtt_client = MqttClient(
         host=config.mqtt.host,
@@ -43,17 +110,103 @@ async def lifespan(app: FastAPI):
         password=config.mqtt.password,
     )
     mqtt_client.set_roamk(roamk)
-    mqtt_client.connect()
+    # In fleet mode telemetry arrives as openroam/<vehicle>/... instead
+    if config.fleet.enabled:
+        fleet = Fleet.from_config(config.fleet)
+        mqtt_client.set_fleet(fleet)
+    # Hand the sharded subsystems to worker processes (single-vehicle mode only)
+    shard_task = None
+    if config.sharding.workers > 0 and fleet is None:
+        sharded = ShardedIngest.from_config(roamk, config.sharding, config.mqtt)
+        sharded.start()
+        shard_task = asyncio.create_task(sharded.run())
+        mqtt_client.topics = [
+            f"openroam/{name}/#" for name in SUBSYSTEMS if name not in sharded.subsystems
+        ] + [FRAME_TOPIC]
+    if config.mqtt.record_path:
+        if sharded is not None:
+            logger.warning("Recording only covers subsystems not handled by ingest workers")
+        mqtt_client.start_recording(config.mqtt.record_path)
+    # Drive MQTT from the server's event loop so RoamK is only touched here
+    mqtt_client.connect(loop=asyncio.get_running_loop())
+
+    # Stream RoamK deltas to WebSocket/SSE clients
+    broadcaster = DeltaBroadcaster(roamk)
+    broadcaster.start()
+
+    # Write telemetry history to InfluxDB
+    if config.influx.enabled:
+        influx_writer = InfluxWriter.from_config(config.influx)
+        influx_writer.attach(roamk)
+        influx_writer.start()
+
+    # Keep local history for offline use
+    if config.history.enabled:
+        history = HistoryStore.from_config(config.history)
+        history.attach(roamk)
+        history.start()
+
+    # Forward downsampled state to the back office (a fleet server is the back office)
+    if config.uplink.enabled and fleet is None:
+        uplink = UplinkBridge.from_config(config.uplink)
+        uplink.attach(roamk)
+        uplink.start()
+
+    # Evaluate alert rules on changes (fleet vehicles are not covered)
+    alert_ticker = None
+    if config.alerts.enabled and fleet is None:
+        alerts = AlertEngine.from_config(
+            config.alerts.rules,
+            config.alerts.topic,
+            lambda topic, payload: mqtt_client.publish(topic, payload, retain=True),
+        )
+        alerts.attach(roamk)
+        # Clear alarms retained before a restart whose condition no longer holds
+        mqtt_client.connect_callbacks.append(alerts.clear_inactive)
+        mqtt_client.own_prefixes += (config.alerts.topic.rstrip("/") + "/",)
+        alert_ticker = asyncio.create_task(_tick_alerts(alerts))
+
+    if config.metrics.enabled:
+        mqtt_client.enable_timing(config.metrics.sample_every)
+        metrics = _build_metrics()
 
     logger.info("OpenRoam server started")
 
     yield
 
     # Cleanup
+    if alert_ticker is not None:
+        alert_ticker.cancel()
+        alerts.detach()
     mqtt_client.disconnect()
+    mqtt_client.stop_recording()
+    if shard_task is not None:
+        shard_task.cancel()
+        await asyncio.to_thread(sharded.stop)
+    # After ingest has stopped, deliver the changes still queued for subscribers
+    await asyncio.to_thread(dispatcher.close, True)
+    if history is not None:
+        await asyncio.to_thread(history.stop)
+    if influx_writer is not None:
+        await asyncio.to_thread(influx_writer.stop)
+    if uplink is not None:
+        await asyncio.to_thread(uplink.stop)
+    broadcaster.stop()
+    if persister is not None:
+        # So the final snapshot is complete
+        await asyncio.to_thread(persister.stop)
+    if staleness_task is not None:
+        staleness_task.cancel()
     logger.info("OpenRoam server stopped")
 
 
+async def _tick_alerts(engine: AlertEngine) -> None:
+    """Raise alerts whose condition has held for the rule's duration."""
+    while True:
+        await asyncio.sleep(ALERT_TICK)
+        engine.tick()
+
+
 app = FastAPI(
     title="OpenRoam API",
     description="REST API for OpenRoam mobile living computing platform",
@@ -61,6 +214,212 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+
+class _TimingMiddleware:
+    """Records per-route handler time (until the response starts)."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or metrics is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+
+        async def send_timed(message) -> None:
+            if message["type"] == "http.response.start":
+                route = scope.get("route")
+                if route is not None:
+                    histogram = http_timings.get(route.path)
+                    if histogram is None:
+                        histogram = http_timings[route.path] = Histogram()
+                    histogram.observe(time.perf_counter() - start)
+            await send(message)
+
+        await self.app(scope, receive, send_timed)
+
+
+def _build_metrics() -> Registry:
+    """Register the metrics served at /metrics."""
+    registry = Registry()
+    registry.gauge(
+        "openroam_mqtt_connected",
+        "Whether the MQTT client is connected",
+        lambda: mqtt_client.connected,
+    )
+    registry.counter(
+        "openroam_mqtt_messages_total", "MQTT messages handled", lambda: mqtt_client.received
+    )
+    registry.counter(
+        "openroam_mqtt_unmapped_total",
+        "Messages whose topic maps to no RoamK path",
+        lambda: mqtt_client.unmapped,
+    )
+    registry.counter(
+        "openroam_mqtt_unmapped_topic_total",
+        "Unmapped messages by topic (first topics seen only)",
+        lambda: mqtt_client.unmapped_topics,
+        label="topic",
+    )
+    registry.counter(
+        "openroam_mqtt_malformed_total",
+        "State documents and delta frames that could not be decoded",
+        lambda: mqtt_client.malformed,
+    )
+    registry.counter(
+        "openroam_roamk_rejected_total",
+        "Updates dropped because the value did not fit the field type",
+        lambda: roamk.rejected + (sum(v.rejected for v in fleet.vehicles.values()) if fleet else 0),
+    )
+    registry.counter(
+        "openroam_roamk_callback_errors_total",
+        "Exceptions raised by inline RoamK subscribers",
+        lambda: roamk.callback_errors,
+    )
+    registry.counter(
+        "openroam_mqtt_callback_errors_total",
+        "Exceptions raised by inline message callbacks",
+        lambda: mqtt_client.callback_errors,
+    )
+    registry.counter(
+        "openroam_shard_messages_total",
+        "MQTT messages handled per ingest worker",
+        lambda: sharded.messages() if sharded else None,
+        label="shard",
+    )
+    registry.counter(
+        "openroam_shard_read_retries_total",
+        "Shared state reads retried because a worker was writing",
+        lambda: sharded.shared.retries if sharded else None,
+    )
+    registry.counter(
+        "openroam_shard_restarts_total",
+        "Ingest workers restarted after exiting",
+        lambda: sharded.restarts if sharded else None,
+    )
+    registry.gauge("openroam_roamk_version", "RoamK change version", lambda: roamk.version)
+    registry.gauge(
+        "openroam_fleet_vehicles", "Fleet vehicles", lambda: len(fleet.vehicles) if fleet else None
+    )
+    registry.counter(
+        "openroam_fleet_rejected_total",
+        "Messages dropped because the fleet is full or the vehicle ID is invalid",
+        lambda: fleet.rejected if fleet else None,
+    )
+    registry.gauge("openroam_stream_clients", "Streaming clients", lambda: len(broadcaster.clients))
+    registry.counter(
+        "openroam_stream_dropped_total",
+        "Deltas dropped for slow streaming clients",
+        lambda: broadcaster.dropped,
+    )
+    registry.counter(
+        "openroam_influx_points_dropped_total",
+        "InfluxDB points dropped",
+        lambda: influx_writer.points_dropped if influx_writer else None,
+    )
+    registry.counter(
+        "openroam_uplink_bytes_total",
+        "Bytes of batches sent over the uplink",
+        lambda: uplink.bytes_sent if uplink else None,
+    )
+    registry.gauge(
+        "openroam_uplink_queued_bytes",
+        "Bytes of batches waiting to be sent over the uplink",
+        lambda: uplink.stats()["queued_bytes"] if uplink else None,
+    )
+    registry.counter(
+        "openroam_uplink_batches_dropped_total",
+        "Uplink batches dropped because the queue was full",
+        lambda: uplink.batches_dropped if uplink else None,
+    )
+    registry.gauge(
+        "openroam_state_restored_stale",
+        "Restored RoamK values not yet replaced by live data",
+        lambda: len(persister.restored) if persister else None,
+    )
+    registry.counter(
+        "openroam_state_persist_errors_total",
+        "Failed writes of the state snapshot or log",
+        lambda: persister.write_errors if persister else None,
+    )
+    registry.gauge(
+        "openroam_state_stale_paths",
+        "RoamK paths whose source has stopped reporting",
+        lambda: len(roamk.stale) if staleness else None,
+    )
+    registry.counter(
+        "openroam_state_expired_total",
+        "Times a RoamK path went stale",
+        lambda: staleness.expired if staleness else None,
+    )
+    registry.gauge(
+        "openroam_subscriber_queue_depth",
+        "Calls waiting per queued subscriber",
+        lambda: {name: q.depth for name, q in dispatcher.by_name().items()},
+        label="subscriber",
+    )
+    registry.gauge(
+        "openroam_subscriber_lag_seconds",
+        "Age of the oldest waiting call per queued subscriber",
+        lambda: {name: q.oldest_age for name, q in dispatcher.by_name().items()},
+        label="subscriber",
+    )
+    registry.counter(
+        "openroam_subscriber_dropped_total",
+        "Calls dropped by the overflow policy per queued subscriber",
+        lambda: {name: q.dropped for name, q in dispatcher.by_name().items()},
+        label="subscriber",
+    )
+    registry.counter(
+        "openroam_subscriber_errors_total",
+        "Exceptions raised per queued subscriber",
+        lambda: {name: q.errors for name, q in dispatcher.by_name().items()},
+        label="subscriber",
+    )
+    registry.histogram(
+        "openroam_subscriber_queue_seconds",
+        "Time calls spent queued per queued subscriber",
+        lambda: {name: q.lag for name, q in dispatcher.by_name().items()},
+        label="subscriber",
+    )
+    registry.gauge(
+        "openroam_alerts_active",
+        "Raised alerts by severity",
+        lambda: _alert_counts() if alerts else None,
+        label="severity",
+    )
+    registry.counter(
+        "openroam_alert_evaluations_total",
+        "Alert rule evaluations",
+        lambda: alerts.evaluations if alerts else None,
+    )
+    registry.histogram(
+        "openroam_ingest_stage_seconds",
+        "Time per ingest stage, sampled",
+        lambda: mqtt_client.timings,
+        label="stage",
+    )
+    registry.histogram(
+        "openroam_http_handler_seconds",
+        "Time to the start of the response, including serialization",
+        lambda: http_timings,
+        label="route",
+    )
+    return registry
+
+
+def _alert_counts() -> dict[str, int]:
+    """Raised alerts per severity."""
+    counts = dict.fromkeys(SEVERITIES, 0)
+    for alert in alerts.active():
+        counts[alert.rule.severity] += 1
+    return counts
+
+
+app.add_middleware(_TimingMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -71,6 +430,109 @@ app.add_middleware(
 )
 
 
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Check an If-None-Match header against an ETag."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+def _json_response(
+    request: Request,
+    body: bytes,
+    etag: str,
+    media_type: str = "application/json",
+    vary: bool = False,
+) -> Response:
+    """Return a pre-encoded body, or 304 if the client copy is current."""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if vary:
+        headers["Vary"] = "Accept"
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def _wants_frame(request: Request) -> bool:
+    """Whether the client asked for binary frames instead of JSON."""
+    return wire.MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def _snapshot_response(request: Request, path: str, store: Optional[RoamK] = None) -> Response:
+    """Serve a cached RoamK snapshot for a path, as JSON or a binary frame."""
+    store = store or roamk
+    if _wants_frame(request):
+        body, etag = store.snapshot_frame(path)
+        return _json_response(request, body, etag, wire.MEDIA_TYPE, vary=True)
+    body, etag = store.snapshot_json(path)
+    if not path and store.stale:
+        body = body[:-1] + b',"stale":' + _stale_json(store, path) + b"}"
+        etag = f'{etag[:-1]}-s{store.stale_version}"'
+    return _json_response(request, body, etag, vary=True)
+
+
+def _stale_json(store: RoamK, path: str) -> bytes:
+    """Stale paths at or below a path, with when each was last received."""
+    stale = store.stale_paths(path)
+    return encode_json(
+        {p: datetime.fromtimestamp(stamp).isoformat() for p, stamp in sorted(stale.items())}
+    )
+
+
+def _path_response(request: Request, store: RoamK, path: str) -> Any:
+    """Serve ``{"path": ..., "value": ...}`` for a URL path in a store."""
+    # Convert URL path to dot notation
+    path = path.replace("/", ".")
+    if store.compile_path(path) is None:
+        return {"error": "Path not found"}
+    if _wants_frame(request):
+        return _snapshot_response(request, path, store)
+    value, etag = store.snapshot_json(path)
+    body = b'{"path":' + encode_json(path) + b',"value":' + value
+    # Freshness: when the value was last received, and what under it is stale
+    received = store.received_at(path)
+    if received is not None:
+        body += b',"received":' + encode_json(datetime.fromtimestamp(received).isoformat())
+        etag = f'{etag[:-1]}-r{int(received * 1000):x}"'
+    else:
+        body += b',"received":null'
+    if store.stale and store.stale_paths(path):
+        body += b',"stale":' + _stale_json(store, path)
+        etag = f'{etag[:-1]}-s{store.stale_version}"'
+    return _json_response(request, body + b"}", etag, vary=True)
+
+
+def _changes_response(request: Request, store: RoamK, since: int, epoch: Optional[str]) -> Response:
+    """Serve the changes in a store since a version, or a full resync."""
+    paths = store.changes_since(since) if epoch in (None, store.epoch) else None
+    if _wants_frame(request):
+        # A resync is a snapshot frame, which carries the epoch
+        if paths is None:
+            body = store.snapshot_frame()[0]
+        else:
+            body = wire.encode_frame(((p, store.get_path(p)) for p in paths), store.version)
+        return Response(content=body, media_type=wire.MEDIA_TYPE, headers={"Vary": "Accept"})
+    head = b'{"epoch":%s,"version":%d' % (encode_json(store.epoch), store.version)
+    if paths is None:
+        body = head + b',"resync":true,"state":' + store.snapshot_json()[0] + b"}"
+    else:
+        changes = b",".join(encode_json(p) + b":" + encode_json(store.get_path(p)) for p in paths)
+        body = head + b',"since":%d,"changes":{%s}}' % (since, changes)
+    return Response(content=body, media_type="application/json", headers={"Vary": "Accept"})
+
+
+def _fleet_vehicle(vehicle_id: str) -> RoamK:
+    """Look up a fleet vehicle's store or raise 404."""
+    if fleet is None:
+        raise HTTPException(status_code=404, detail="Fleet mode is not enabled")
+    store = fleet.get(vehicle_id)
+    if store is None:
+        raise HTTPException(status_code=404, detail="Unknown vehicle")
+    return store
+
+
 @app.get("/")
 async def root():
     """Root endpoint."""
@@ -83,24 +545,185 @@ async def health():
     return {
         "status": "healthy",
         "mqtt_connected": mqtt_client.connected if mqtt_client else False,
+        "influx": influx_writer.stats() if influx_writer else None,
+        "fleet_vehicles": len(fleet.vehicles) if fleet else None,
+        "uplink": uplink.stats() if uplink else None,
+        "persist": persister.stats() if persister else None,
+        "staleness": staleness.stats() if staleness else None,
     }
 
 
+@app.get("/metrics")
+async def get_metrics():
+    """Metrics in the Prometheus text format."""
+    if metrics is None:
+        raise HTTPException(status_code=404, detail="Metrics are not enabled")
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/wire/dictionary")
+async def get_wire_dictionary():
+    """Get the path dictionary used by binary frames."""
+    return wire.dictionary()
+
+
 @app.get("/state")
-async def get_state():
+async def get_state(request: Request):
     """Get complete RoamK state."""
-    return roamk.to_dict()
+    return _snapshot_response(request, "")
+
+
+@app.get("/state/changes")
+async def get_state_changes(request: Request, since: int, epoch: Optional[str] = None):
+    """Get the paths changed since a version, with their current values.
+
+    Clients pass the ``version`` (and ``epoch``) of their last response or
+    stream frame. When the change log no longer reaches back that far, or
+    the epoch is from another server run, the response carries
+    ``"resync": true`` and the full state instead. Binary clients get a
+    delta frame, or a snapshot frame to resync.
+    """
+    return _changes_response(request, roamk, since, epoch)
+
+
+@app.get("/state/restored")
+async def get_state_restored():
+    """Get the restored values not yet updated live, with when they were received."""
+    if persister is None:
+        raise HTTPException(status_code=404, detail="State persistence is not enabled")
+    restored = dict(persister.restored)
+    now = time.time()
+    return {
+        path: {"received": datetime.fromtimestamp(stamp).isoformat(), "age": round(now - stamp, 1)}
+        for path, stamp in sorted(restored.items())
+    }
+
+
+@app.get("/state/freshness")
+async def get_state_freshness():
+    """Get when each received path was last written, and whether it is stale."""
+    now = time.time()
+    offset = now - time.monotonic()
+    stamps = {path: (stamp, False) for path, stamp in list(roamk.received.items())}
+    stamps.update((path, (stamp, True)) for path, stamp in list(roamk.stale.items()))
+    return {
+        path: {
+            "received": datetime.fromtimestamp(stamp + offset).isoformat(),
+            "age": round(now - stamp - offset, 1),
+            "ttl": staleness.ttl(path) if staleness else None,
+            "stale": stale,
+        }
+        for path, (stamp, stale) in sorted(stamps.items())
+    }
 
 
 @app.get("/state/{path:path}")
-async def get_state_path(path: str):
+async def get_state_path(path: str, request: Request):
     """Get state at specific path."""
-    # Convert URL path to dot notation
-    path = path.replace("/", ".")
-    value = roamk.get_path(path)
-    if value is None:
-        return {"error": "Path not found"}
-    return {"path": path, "value": value}
+    return _path_response(request, roamk, path)
+
+
+@app.websocket("/ws")
+async def stream_websocket(websocket: WebSocket, paths: str = "", format: str = "json"):
+    """Stream a snapshot and then RoamK deltas over a WebSocket.
+
+    Clients may send ``{"subscribe": ["power", "engine.rpm"]}`` at any time
+    to change their subtrees; an empty list subscribes to everything. With
+    ``format=binary``, frames are sent as binary messages (see wire.py).
+    """
+    await websocket.accept()
+    client = broadcaster.connect(paths.split(","), binary=format == "binary")
+    sender = asyncio.create_task(_send_frames(websocket, client))
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                continue
+            if isinstance(message, dict) and isinstance(message.get("subscribe"), list):
+                client.set_paths(broadcaster.parse_paths(message["subscribe"]))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        broadcaster.disconnect(client)
+
+
+async def _send_frames(websocket: WebSocket, client: StreamClient) -> None:
+    """Forward stream frames to a WebSocket until it closes."""
+    try:
+        while True:
+            frame = await client.next_frame()
+            if client.binary:
+                await websocket.send_bytes(frame)
+            else:
+                await websocket.send_text(frame.decode())
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+
+
+@app.get("/events")
+async def stream_events(paths: str = ""):
+    """Stream a snapshot and then RoamK deltas as Server-Sent Events."""
+    client = broadcaster.connect(paths.split(","))
+
+    async def events():
+        try:
+            while True:
+                try:
+                    frame = await asyncio.wait_for(client.next_frame(), SSE_KEEPALIVE)
+                except TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                yield b"data: " + frame + b"\n\n"
+        finally:
+            broadcaster.disconnect(client)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/history")
+async def get_history_paths():
+    """List paths with recorded history."""
+    if history is None:
+        raise HTTPException(status_code=404, detail="History is not enabled")
+    return {"paths": history.paths()}
+
+
+@app.get("/history/{path:path}")
+async def get_history(
+    path: str,
+    start: Optional[float] = Query(None, alias="from"),
+    end: Optional[float] = Query(None, alias="to"),
+    step: Optional[float] = None,
+):
+    """Get history for a path.
+
+    ``from``/``to`` are Unix timestamps (default: the last hour) and
+    ``step`` is the bucket size in seconds (default: about 500 points).
+    """
+    if history is None:
+        raise HTTPException(status_code=404, detail="History is not enabled")
+    end = time.time() if end is None else end
+    start = end - 3600 if start is None else start
+    result = await asyncio.to_thread(history.query, path.replace("/", "."), start, end, step)
+    if result is None:
+        raise HTTPException(status_code=404, detail="No history for path")
+    return result
+
+
+@app.get("/alerts")
+async def get_alerts(cleared: bool = False):
+    """Get raised alerts, most severe first (``cleared`` adds the cleared ones)."""
+    if alerts is None:
+        raise HTTPException(status_code=404, detail="Alerts are not enabled")
+    if cleared:
+        return {"alerts": [alert.to_dict() for alert in alerts.alerts.values()]}
+    return {"alerts": [alert.to_dict() for alert in alerts.active()]}
 
 
 @app.post("/command/{topic:path}")
@@ -111,42 +734,97 @@ async def send_command(topic: str, payload: dict):
     return {"status": "sent", "topic": full_topic}
 
 
+# Fleet endpoints
+@app.get("/fleet")
+async def get_fleet(request: Request, paths: str = ""):
+    """Summary of every fleet vehicle.
+
+    ``paths`` is a comma-separated list of RoamK paths to include per
+    vehicle, replacing the default summary paths.
+    """
+    if fleet is None:
+        raise HTTPException(status_code=404, detail="Fleet mode is not enabled")
+    selected = [p.strip() for p in paths.split(",") if p.strip()] or SUMMARY_PATHS
+    body, etag = fleet.summary_json(selected)
+    return _json_response(request, body, etag)
+
+
+@app.get("/fleet/{vehicle_id}/state")
+async def get_vehicle_state(vehicle_id: str, request: Request):
+    """Get complete RoamK state of a fleet vehicle."""
+    return _snapshot_response(request, "", _fleet_vehicle(vehicle_id))
+
+
+@app.get("/fleet/{vehicle_id}/state/changes")
+async def get_vehicle_state_changes(
+    vehicle_id: str, request: Request, since: int, epoch: Optional[str] = None
+):
+    """Get the paths changed since a version in a fleet vehicle."""
+    return _changes_response(request, _fleet_vehicle(vehicle_id), since, epoch)
+
+
+@app.post("/fleet/{vehicle_id}/delta")
+async def post_vehicle_delta(vehicle_id: str, request: Request):
+    """Apply binary delta frames uploaded by a vehicle's uplink bridge."""
+    if fleet is None:
+        raise HTTPException(status_code=404, detail="Fleet mode is not enabled")
+    store = fleet.vehicle(vehicle_id)
+    if store is None:
+        raise HTTPException(status_code=404, detail="Unknown vehicle")
+    try:
+        frames = wire.decode_batch(await request.body())
+    except wire.BatchTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e)) from None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from None
+    for frame in frames:
+        store.update_many(frame.changes)
+    return {"frames": len(frames)}
+
+
+@app.get("/fleet/{vehicle_id}/state/{path:path}")
+async def get_vehicle_state_path(vehicle_id: str, path: str, request: Request):
+    """Get state at specific path of a fleet vehicle."""
+    return _path_response(request, _fleet_vehicle(vehicle_id), path)
+
+
+@app.post("/fleet/{vehicle_id}/command/{topic:path}")
+async def send_vehicle_command(vehicle_id: str, topic: str, payload: dict):
+    """Send MQTT command to a fleet vehicle."""
+    _fleet_vehicle(vehicle_id)
+    full_topic = f"openroam/{vehicle_id}/{topic}"
+    mqtt_client.publish(full_topic, payload.get("value", ""))
+    return {"status": "sent", "topic": full_topic}
+
+
 # Power endpoints
 @app.get("/power")
-async def get_power():
+async def get_power(request: Request):
     """Get power state."""
-    from dataclasses import asdict
-
-    return asdict(roamk.state.power)
+    return _snapshot_response(request, "power")
 
 
 @app.get("/power/batteries")
-async def get_batteries():
+async def get_batteries(request: Request):
     """Get battery states."""
-    from dataclasses import asdict
-
-    return {
-        "house": asdict(roamk.state.power.house_battery),
-        "chassis": asdict(roamk.state.power.chassis_battery),
-    }
+    house, etag = roamk.snapshot_json("power.house_battery")
+    chassis, _ = roamk.snapshot_json("power.chassis_battery")
+    body = b'{"house":' + house + b',"chassis":' + chassis + b"}"
+    return _json_response(request, body, etag)
 
 
 # Tanks endpoints
 @app.get("/tanks")
-async def get_tanks():
+async def get_tanks(request: Request):
     """Get tank levels."""
-    from dataclasses import asdict
-
-    return asdict(roamk.state.tanks)
+    return _snapshot_response(request, "tanks")
 
 
 # Climate endpoints
 @app.get("/climate")
-async def get_climate():
+async def get_climate(request: Request):
     """Get climate state."""
-    from dataclasses import asdict
-
-    return asdict(roamk.state.climate)
+    return _snapshot_response(request, "climate")
 
 
 @app.post("/climate/hvac/mode")
@@ -165,46 +843,36 @@ async def set_temperature(temp: float):
 
 # Vehicle endpoints
 @app.get("/vehicle")
-async def get_vehicle():
+async def get_vehicle(request: Request):
     """Get vehicle state."""
-    from dataclasses import asdict
-
-    return asdict(roamk.state.vehicle)
+    return _snapshot_response(request, "vehicle")
 
 
 @app.get("/vehicle/location")
-async def get_location():
+async def get_location(request: Request):
     """Get current location."""
-    from dataclasses import asdict
-
-    return asdict(roamk.state.vehicle.location)
+    return _snapshot_response(request, "vehicle.location")
 
 
 # Engine endpoints
 @app.get("/engine")
-async def get_engine():
+async def get_engine(request: Request):
     """Get engine state."""
-    from dataclasses import asdict
-
-    return asdict(roamk.state.engine)
+    return _snapshot_response(request, "engine")
 
 
 # Safety endpoints
 @app.get("/safety")
-async def get_safety():
+async def get_safety(request: Request):
     """Get safety state."""
-    from dataclasses import asdict
-
-    return asdict(roamk.state.safety)
+    return _snapshot_response(request, "safety")
 
 
 # Maintenance endpoints
 @app.get("/maintenance")
-async def get_maintenance():
+async def get_maintenance(request: Request):
     """Get maintenance state."""
-    from dataclasses import asdict
-
-    return asdict(roamk.state.maintenance)
+    return _snapshot_response(request, "maintenance")
 
 
 def main():
@@ -0,0 +1,428 @@
+"""
+Sharded Ingest
+
+Spreads MQTT ingest over worker processes by topic subtree, for hosts
+where one process saturates a core parsing messages and updating RoamK.
+
+Each worker subscribes to its own subsystems (``openroam/power/#`` ...)
+and applies messages to a private compact RoamK (see compact.py). After
+every change it copies the state's numeric value and timestamp arrays
+into its region of one shared-memory segment, bracketed by a sequence
+counter (a seqlock): the counter is odd while the copy is in progress
+and advances by two per publish. The server process copies a region
+only when its counter has moved, retries if the counter was odd or
+changed during the copy, so it never applies a torn state, and applies
+the fields whose timestamps advanced to its own RoamK as one batch.
+Subscribers, snapshots and the change log then work as usual.
+
+Reads are not zero-copy: a seqlock reader has to copy what it read
+before it can check that the copy is whole. That is one buffer copy of
+the region per changed shard, with no serialization.
+
+Timestamps are CLOCK_MONOTONIC, which all processes share, so a
+restarted worker's fresh (zero-stamped) fields never look newer than
+what the server has already applied.
+
+Python cannot issue memory fences, so the seqlock relies on stores
+becoming visible in program order, as x86 guarantees. Fields that are
+not numeric (strings, lists, dict entries such as climate zones) are
+sent to the server over a pipe instead.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import signal
+from array import array
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Optional
+
+from .compact import CompactStore, compact_state, default_layout, store_of
+from .config import MqttConfig, ShardingConfig
+from .mqtt_client import SUBSYSTEMS, MqttClient
+from .roamk import RoamK, RoamKState
+
+logger = logging.getLogger(__name__)
+
+# Region header: sequence counter, then the worker's message count
+HEADER_SIZE = 64
+
+# Seconds between checks that the workers are still running
+_WATCH_INTERVAL = 1.0
+
+
+def assign_subsystems(workers: int, subsystems: tuple[str, ...] = SUBSYSTEMS) -> list[list[str]]:
+    """Split subsystems round-robin over ``workers`` shards."""
+    workers = max(1, min(workers, len(subsystems)))
+    return [list(subsystems[i::workers]) for i in range(workers)]
+
+
+class SharedState:
+    """Per-shard regions of numeric RoamK fields in one shared-memory segment.
+
+    Created by the server (``name=None``) and attached to by name in the
+    workers.
+    """
+
+    def __init__(self, shards: int, name: Optional[str] = None) -> None:
+        self.shards = shards
+        self.layout = default_layout()
+        self.n_values = self.layout.n_values
+        self._data_size = 16 * self.n_values
+        self.region_size = -(-(HEADER_SIZE + self._data_size) // 64) * 64
+        self.shm = SharedMemory(name=name, create=name is None, size=shards * self.region_size)
+        self.name = self.shm.name
+        # Read retries because a worker was mid-copy
+        self.retries = 0
+
+        self._views: list[memoryview] = []
+        self._headers = [self._view(shard, 0, HEADER_SIZE).cast("Q") for shard in range(shards)]
+        self._views.extend(self._headers)
+        self._data = [
+            self._view(shard, HEADER_SIZE, HEADER_SIZE + self._data_size) for shard in range(shards)
+        ]
+        if name is None:
+            defaults = store_of(compact_state()).values.tobytes()
+            for data in self._data:
+                data[: len(defaults)] = defaults
+
+    def _view(self, shard: int, start: int, end: int) -> memoryview:
+        base = shard * self.region_size
+        view = self.shm.buf[base + start : base + end]
+        self._views.append(view)
+        return view
+
+    def sequence(self, shard: int) -> int:
+        """A shard's current sequence counter."""
+        return self._headers[shard][0]
+
+    def messages(self, shard: int) -> int:
+        """Messages a shard's worker had handled at its last publish."""
+        return self._headers[shard][1]
+
+    def read(self, shard: int, values: array, stamps: array, tries: int = 3) -> Optional[int]:
+        """Copy a shard's values and stamps; the sequence copied, or None if busy."""
+        header = self._headers[shard]
+        data = self._data[shard]
+        split = 8 * self.n_values
+        with memoryview(values).cast("B") as dst_values, memoryview(stamps).cast("B") as dst_stamps:
+            for _ in range(tries):
+                before = header[0]
+                if before & 1:
+                    self.retries += 1
+                    continue
+                dst_values[:] = data[:split]
+                dst_stamps[:] = data[split:]
+                if header[0] == before:
+                    return before
+                self.retries += 1
+        return None
+
+    def writer(self, shard: int, store: CompactStore) -> "ShardWriter":
+        """A writer publishing ``store`` into a shard's region."""
+        return ShardWriter(self._headers[shard], self._data[shard], store)
+
+    def close(self) -> None:
+        """Detach from the segment."""
+        # Views derived from others go first
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self.shm.close()
+
+    def unlink(self) -> None:
+        """Free the segment (server side, after the workers have exited)."""
+        self.shm.unlink()
+
+
+class ShardWriter:
+    """Publishes one compact store into a shard region under the seqlock."""
+
+    def __init__(self, header: memoryview, data: memoryview, store: CompactStore) -> None:
+        values = memoryview(store.values).cast("B")
+        stamps = memoryview(store.stamps).cast("B")
+        split = len(values)
+        # Object fields have stamps too; only the numeric ones are shared
+        self._views = [values, stamps, stamps[:split], data[:split], data[split:]]
+        self._header = header
+        self._values, _, self._stamps, self._dst_values, self._dst_stamps = self._views
+        # A previous worker may have died mid-copy
+        if header[0] & 1:
+            header[0] += 1
+
+    def publish(self, messages: int = 0) -> None:
+        """Copy the store into the region."""
+        header = self._header
+        seq = header[0]
+        header[0] = seq + 1
+        self._dst_values[:] = self._values
+        self._dst_stamps[:] = self._stamps
+        header[0] = seq + 2
+        header[1] = messages
+
+    def close(self) -> None:
+        """Release the store and region buffers."""
+        for view in reversed(self._views):
+            view.release()
+
+
+class ShardWorker:
+    """Ingest for one shard, run in a worker process.
+
+    ``client`` is an MqttClient subscribed to the shard's subsystems and
+    writing into a private compact RoamK; every change is published to
+    shared memory, and changed non-numeric fields are sent on ``conn``.
+    """
+
+    def __init__(
+        self,
+        shared_name: str,
+        shards: int,
+        shard: int,
+        subsystems: list[str],
+        conn: Optional[Any] = None,
+        **mqtt: Any,
+    ) -> None:
+        self.shared = SharedState(shards, shared_name)
+        self.roamk = RoamK(compact=True)
+        self.client = MqttClient(**mqtt)
+        self.client.topics = [f"openroam/{name}/#" for name in subsystems]
+        self.client.set_roamk(self.roamk)
+        self.writer = self.shared.writer(shard, store_of(self.roamk.state))
+        self._conn = conn
+        self._index = self.shared.layout.index
+        self._n_values = self.shared.n_values
+        self._forward: dict[str, tuple[str, ...]] = {}
+        self.roamk.subscribe(self._on_change)
+
+    def _on_change(self, state: RoamKState, changed: frozenset[str]) -> None:
+        self.writer.publish(self.client.received)
+        if self._conn is None:
+            return
+        objects = []
+        for path in changed:
+            forward = self._forward.get(path)
+            if forward is None:
+                forward = self._forward[path] = self._forwarded(path)
+            for leaf in forward:
+                objects.append((leaf, self.roamk.get_path(leaf)))
+        if objects:
+            self._conn.send(objects)
+
+    def _forwarded(self, path: str) -> tuple[str, ...]:
+        """Paths to send over the pipe when ``path`` changes."""
+        index = self._index.get(path)
+        if index is not None:
+            return () if index < self._n_values else (path,)
+        prefix = path + "."
+        below = [p for p, i in self._index.items() if p.startswith(prefix)]
+        if not below:
+            # A dict entry or other path outside the layout
+            return (path,)
+        # A replaced subtree: its numeric fields arrive through shared memory
+        return tuple(p for p in below if self._index[p] >= self._n_values)
+
+    def close(self) -> None:
+        """Release shared memory."""
+        self.writer.close()
+        self.shared.close()
+
+
+def _run_worker(
+    shared_name: str,
+    shards: int,
+    shard: int,
+    subsystems: list[str],
+    mqtt: dict[str, Any],
+    conn: Any,
+) -> None:
+    """Worker process entry point."""
+    # The server coordinates shutdown
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    worker = ShardWorker(shared_name, shards, shard, subsystems, conn, **mqtt)
+    logger.info(f"Shard {shard} ingesting {', '.join(subsystems)}")
+    worker.client.connect()
+    # Run until the server says stop or goes away
+    try:
+        conn.recv()
+    except EOFError:
+        pass
+    worker.client.disconnect()
+    worker.close()
+
+
+class ShardedIngest:
+    """Runs sharded ingest workers and applies their changes to a RoamK.
+
+    ``shards`` lists the subsystems of each worker. ``target`` is the
+    worker process entry point, called as ``target(shared_name, shards,
+    shard, subsystems, mqtt, conn)``; benchmarks replace it to feed
+    messages without a broker.
+    """
+
+    def __init__(
+        self,
+        roamk: RoamK,
+        shards: list[list[str]],
+        poll_interval: float = 0.01,
+        target: Callable[..., None] = _run_worker,
+        **mqtt: Any,
+    ) -> None:
+        self.roamk = roamk
+        self.shards = shards
+        self.poll_interval = poll_interval
+        self.target = target
+        self.mqtt = mqtt
+        self.shared: Optional[SharedState] = None
+        # Fields applied to roamk, numeric and sent over the pipes
+        self.applied = 0
+        self.restarts = 0
+
+        self._context = multiprocessing.get_context("spawn")
+        self._stopping = False
+        self._processes: list[Any] = [None] * len(shards)
+        self._conns: list[Any] = [None] * len(shards)
+
+        # Fields are decoded by writing the raw values into a private
+        # compact state and reading them back by path
+        layout = default_layout()
+        n = layout.n_values
+        self._mirror = RoamK(compact=True)
+        self._mirror_values = store_of(self._mirror.state).values
+        self._paths = {i: path for path, i in layout.index.items() if i < n}
+        self._paths.pop(layout.updated_index, None)
+        self._values = array("d", bytes(8 * n))
+        self._stamps = array("d", bytes(8 * n))
+        self._seen = [0] * len(shards)
+        self._last = [array("d", bytes(8 * n)) for _ in shards]
+
+    @classmethod
+    def from_config(cls, roamk: RoamK, config: ShardingConfig, mqtt: MqttConfig) -> "ShardedIngest":
+        """Create from the sharding and MQTT sections of the configuration."""
+        shards = config.subsystems or assign_subsystems(config.workers)
+        return cls(
+            roamk,
+            shards,
+            config.poll_interval,
+            host=mqtt.host,
+            port=mqtt.port,
+            client_id=mqtt.client_id,
+            username=mqtt.username,
+            password=mqtt.password,
+        )
+
+    @property
+    def subsystems(self) -> list[str]:
+        """Subsystems handled by the workers."""
+        return [name for shard in self.shards for name in shard]
+
+    def start(self) -> None:
+        """Create the shared segment and start the workers."""
+        self.shared = SharedState(len(self.shards))
+        for shard in range(len(self.shards)):
+            self._spawn(shard)
+
+    def _spawn(self, shard: int) -> None:
+        # Workers send object fields on the pipe; the server sends stop
+        conn, child = self._context.Pipe()
+        mqtt = {**self.mqtt, "client_id": f"{self.mqtt.get('client_id', 'openroam-core')}-{shard}"}
+        process = self._context.Process(
+            target=self.target,
+            args=(
+                self.shared.name,
+                len(self.shards),
+                shard,
+                self.shards[shard],
+                mqtt,
+                child,
+            ),
+            name=f"openroam-shard-{shard}",
+            daemon=True,
+        )
+        process.start()
+        child.close()
+        self._processes[shard] = process
+        self._conns[shard] = conn
+
+    def stop(self) -> None:
+        """Stop the workers and free the shared segment."""
+        self._stopping = True
+        for conn in self._conns:
+            if conn is not None:
+                try:
+                    conn.send(None)
+                except OSError:
+                    pass  # already gone
+        for process in self._processes:
+            if process is not None:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+        for conn in self._conns:
+            if conn is not None:
+                conn.close()
+        if self.shared is not None:
+            self.shared.close()
+            self.shared.unlink()
+            self.shared = None
+
+    def messages(self) -> dict[str, int]:
+        """Messages handled per shard."""
+        return {str(shard): self.shared.messages(shard) for shard in range(len(self.shards))}
+
+    def poll(self) -> int:
+        """Apply what the workers changed since the last poll; returns the field count."""
+        updates: list[tuple[str, Any]] = []
+        shared = self.shared
+        values, stamps = self._values, self._stamps
+        for shard in range(len(self.shards)):
+            if shared.sequence(shard) == self._seen[shard]:
+                continue
+            seq = shared.read(shard, values, stamps)
+            if seq is None:
+                continue
+            self._seen[shard] = seq
+            last = self._last[shard]
+            for i, (stamp, seen) in enumerate(zip(stamps, last, strict=True)):
+                # Only forward: a restarted worker's defaults must not be applied
+                if stamp > seen:
+                    last[i] = stamp
+                    path = self._paths.get(i)
+                    if path is not None:
+                        self._mirror_values[i] = values[i]
+                        updates.append((path, self._mirror.get_path(path)))
+
+        for conn in self._conns:
+            try:
+                while conn.poll():
+                    updates.extend(conn.recv())
+            except (EOFError, OSError):
+                pass  # the worker exited; _watch restarts it
+
+        if updates:
+            self.roamk.update_many(updates)
+            self.applied += len(updates)
+        return len(updates)
+
+    async def run(self) -> None:
+        """Poll at ``poll_interval`` and restart workers that exit."""
+        loop = asyncio.get_running_loop()
+        next_watch = loop.time() + _WATCH_INTERVAL
+        while True:
+            self.poll()
+            if loop.time() >= next_watch:
+                next_watch += _WATCH_INTERVAL
+                self._watch()
+            await asyncio.sleep(self.poll_interval)
+
+    def _watch(self) -> None:
+        for shard, process in enumerate(self._processes):
+            if process is not None and not process.is_alive() and not self._stopping:
+                logger.error(f"Shard {shard} exited with code {process.exitcode}; restarting")
+                self._conns[shard].close()
+                self.restarts += 1
+                self._spawn(shard)
@@ -0,0 +1,171 @@
+"""
+Staleness Tracking
+
+Marks RoamK fields stale when their source stops reporting, so a dead GPS
+or OBD reader shows up as stale instead of holding its last value forever.
+
+RoamK stamps every write with its receive time (``RoamK.received``). The
+monitor keeps each tracked path in one bucket of a timer wheel: a ring
+with a bucket per ``resolution`` seconds, long enough to cover the
+longest TTL. Each tick takes the bucket that has come due and checks only
+its paths: those written since go back into the bucket of their new
+expiry, the rest are marked stale. A path is looked at about once per
+TTL however often it is written, and the state is never scanned. Paths
+written for the first time, or again after going stale, reach the
+monitor through RoamK's arrival queue.
+
+The monitor runs as a task on the event loop that owns the RoamK store,
+the same thread that ingests into it, so a path is never written between
+being found overdue and being marked stale.
+
+TTLs are given per path pattern, first match wins, so each subsystem can
+have its own. Paths that no pattern matches use ``default_ttl``; a TTL of
+None never expires.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from fnmatch import fnmatchcase
+from typing import Optional
+
+from .config import StalenessConfig
+from .roamk import RoamK
+
+logger = logging.getLogger(__name__)
+
+# Seconds without a write before a path is stale
+DEFAULT_TTLS: dict[str, Optional[float]] = {
+    "vehicle.location.*": 30,  # GPS
+    "vehicle.*": 60,
+    "engine.*": 30,  # OBD-II reader; also goes stale when the engine is off
+    "power.*": 120,
+    "safety.*": 120,
+    "climate.*": 300,
+    "tanks.*": 900,
+    "maintenance.*": None,
+}
+
+
+class StalenessMonitor:
+    """Marks RoamK paths stale once they go unwritten for their TTL."""
+
+    def __init__(
+        self,
+        roamk: RoamK,
+        ttls: Optional[dict[str, Optional[float]]] = None,
+        default_ttl: Optional[float] = None,
+        resolution: float = 1.0,
+    ) -> None:
+        self.roamk = roamk
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.resolution = resolution
+        self._ttl_cache: dict[str, Optional[float]] = {}
+
+        # Every expiry is at most the longest TTL (plus a partial slot) ahead
+        longest = max((ttl for ttl in [*self.ttls.values(), default_ttl] if ttl), default=0)
+        self._wheel: list[list[str]] = [[] for _ in range(int(longest / resolution) + 2)]
+        self._tick = int(time.monotonic() / resolution)
+        self._arrivals: deque[str] = deque()
+
+        # Metrics
+        self.scheduled = 0
+        self.checks = 0
+        self.expired = 0
+
+    @classmethod
+    def from_config(cls, roamk: RoamK, config: StalenessConfig) -> "StalenessMonitor":
+        """Create a monitor from the staleness section of the configuration."""
+        return cls(
+            roamk,
+            ttls=config.ttls,
+            default_ttl=config.default_ttl,
+            resolution=config.resolution,
+        )
+
+    def ttl(self, path: str) -> Optional[float]:
+        """Seconds a path may go unwritten before it is stale (None: never)."""
+        ttl = self._ttl_cache.get(path, ...)
+        if ttl is ...:
+            ttl = next(
+                (t for pattern, t in self.ttls.items() if fnmatchcase(path, pattern)),
+                self.default_ttl,
+            )
+            self._ttl_cache[path] = ttl
+        return ttl
+
+    def start(self) -> None:
+        """Start tracking, including the paths already received."""
+        self._arrivals = self.roamk.track_arrivals()
+        self._tick = int(time.monotonic() / self.resolution)
+
+    async def run(self) -> None:
+        """Check for stale paths every ``resolution`` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(self.resolution)
+            try:
+                self.tick()
+            except Exception:
+                logger.exception("Staleness check failed")
+
+    def stats(self) -> dict:
+        """Staleness metrics."""
+        return {
+            "scheduled": self.scheduled,
+            "stale": len(self.roamk.stale),
+            "expired": self.expired,
+            "checks": self.checks,
+        }
+
+    def tick(self, now: Optional[float] = None) -> None:
+        """Schedule new arrivals and mark the paths that have come due stale."""
+        now = time.monotonic() if now is None else now
+        roamk = self.roamk
+        received = roamk.received
+
+        fresh = []
+        arrivals = self._arrivals
+        while arrivals:
+            path = arrivals.popleft()
+            if path in roamk.stale:
+                fresh.append(path)
+            self._schedule(path, received.get(path, now))
+        if fresh:
+            roamk.mark_fresh(fresh)
+
+        current = int(now / self.resolution)
+        # After a long stall each bucket needs emptying only once
+        self._tick = max(self._tick, current - len(self._wheel))
+        stale = []
+        while self._tick < current:
+            self._tick += 1
+            slot = self._tick % len(self._wheel)
+            bucket = self._wheel[slot]
+            if not bucket:
+                continue
+            self._wheel[slot] = []
+            self.scheduled -= len(bucket)
+            self.checks += len(bucket)
+            for path in bucket:
+                stamp = received.get(path)
+                if stamp is None:
+                    continue  # already stale
+                if stamp + self.ttl(path) <= now:
+                    stale.append(path)
+                else:
+                    self._schedule(path, stamp)
+        if stale:
+            self.expired += len(stale)
+            roamk.mark_stale(stale)
+            logger.debug(f"{len(stale)} RoamK paths went stale")
+
+    def _schedule(self, path: str, stamp: float) -> None:
+        ttl = self.ttl(path)
+        if not ttl:
+            return
+        tick = max(math.ceil((stamp + ttl) / self.resolution), self._tick + 1)
+        self._wheel[tick % len(self._wheel)].append(path)
+        self.scheduled += 1
@@ -0,0 +1,271 @@
+"""
+RoamK Delta Streaming
+
+Pushes RoamK changes to WebSocket and Server-Sent Events clients: an
+initial snapshot, then only the paths that changed. Each client has its
+own subtree filter and a coalescing send buffer, so a stalled browser
+costs a resync instead of holding up MQTT ingest. Clients get JSON frames
+or, if they ask for it, binary frames (see wire.py). JSON clients also
+hear when paths go stale or fresh again (see staleness.py).
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Iterable, Optional
+
+from . import wire
+from .roamk import RoamK, RoamKState, Subscription, encode_json, path_matches
+
+logger = logging.getLogger(__name__)
+
+
+class StreamClient:
+    """One connected streaming client.
+
+    Pending changes are coalesced per path, so memory is bounded by the
+    number of paths. A client that falls more than ``max_backlog`` change
+    batches behind has its pending deltas dropped and gets a fresh
+    snapshot on its next frame instead.
+    """
+
+    def __init__(
+        self,
+        broadcaster: "DeltaBroadcaster",
+        paths: tuple[str, ...],
+        max_backlog: int,
+        binary: bool = False,
+    ) -> None:
+        self.broadcaster = broadcaster
+        self.paths = paths
+        self.max_backlog = max_backlog
+        self.binary = binary
+        self.dropped = 0
+
+        # path -> JSON fragment, or (entry count, wire entries) for binary clients
+        self._pending: dict[str, Any] = {}
+        # path -> last receive time for newly stale paths, None for fresh again
+        self._freshness: dict[str, Optional[str]] = {}
+        self._backlog = 0
+        self._version = 0
+        self._resync = True
+        self._ready = asyncio.Event()
+        self._ready.set()
+
+    def set_paths(self, paths: tuple[str, ...]) -> None:
+        """Change the subscribed subtrees and resend a snapshot."""
+        self.paths = paths
+        self._request_resync()
+
+    def matches(self, path: str) -> bool:
+        """Check whether a changed path is within this client's subtrees."""
+        return not self.paths or any(path_matches(p, path) for p in self.paths)
+
+    def offer(self, fragments: dict[str, Any], version: int) -> None:
+        """Queue encoded changes for this client (event loop thread only)."""
+        if self._resync:
+            return
+
+        added = False
+        for path, fragment in fragments.items():
+            if self.matches(path):
+                self._pending[path] = fragment
+                added = True
+        if not added:
+            return
+
+        self._version = version
+        self._backlog += 1
+        if self._backlog > self.max_backlog:
+            # Slow consumer: a snapshot is cheaper than the backlog
+            self.dropped += self._backlog
+            self.broadcaster.dropped += self._backlog
+            self._request_resync()
+            return
+        self._ready.set()
+
+    def offer_freshness(self, freshness: dict[str, Optional[str]]) -> None:
+        """Queue paths going stale or fresh for this client (event loop thread only)."""
+        if self._resync or self.binary:
+            return
+        for path, received in freshness.items():
+            if self.matches(path):
+                self._freshness[path] = received
+                self._ready.set()
+
+    async def next_frame(self) -> bytes:
+        """Wait for and return the next frame to send."""
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+
+            if self._resync:
+                self._resync = False
+                return self.broadcaster.snapshot_frame(self.paths, self.binary)
+
+            if self._pending:
+                pending, self._pending = self._pending, {}
+                self._backlog = 0
+                if self.binary:
+                    count = sum(entry[0] for entry in pending.values())
+                    entries = b"".join(entry[1] for entry in pending.values())
+                    return wire.build_frame(count, entries, self._version)
+                return b'{"type":"delta","version":%d,"changes":{%s}}' % (
+                    self._version,
+                    b",".join(pending.values()),
+                )
+
+            if self._freshness:
+                freshness, self._freshness = self._freshness, {}
+                stale = {path: t for path, t in freshness.items() if t is not None}
+                fresh = [path for path, t in freshness.items() if t is None]
+                return b'{"type":"stale","stale":%s,"fresh":%s}' % (
+                    encode_json(stale),
+                    encode_json(fresh),
+                )
+
+    def _request_resync(self) -> None:
+        self._pending.clear()
+        self._freshness.clear()
+        self._backlog = 0
+        self._resync = True
+        self._ready.set()
+
+
+class DeltaBroadcaster:
+    """Fans RoamK change notifications out to streaming clients."""
+
+    def __init__(
+        self,
+        roamk: RoamK,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+        max_backlog: int = 32,
+    ) -> None:
+        self.roamk = roamk
+        self.loop = loop
+        self.max_backlog = max_backlog
+        self.clients: set[StreamClient] = set()
+        # Deltas dropped for slow clients, including disconnected ones
+        self.dropped = 0
+        self._subscription: Optional[Subscription] = None
+        self._stale_subscription: Optional[Subscription] = None
+
+    def start(self) -> None:
+        """Start listening for RoamK changes."""
+        if self.loop is None:
+            self.loop = asyncio.get_running_loop()
+        self._subscription = self.roamk.subscribe(self._on_change)
+        self._stale_subscription = self.roamk.subscribe_stale(self._on_stale)
+
+    def stop(self) -> None:
+        """Stop listening for RoamK changes."""
+        if self._subscription is not None:
+            self.roamk.unsubscribe(self._subscription)
+            self._subscription = None
+        if self._stale_subscription is not None:
+            self.roamk.unsubscribe(self._stale_subscription)
+            self._stale_subscription = None
+
+    def parse_paths(self, paths: Iterable[str]) -> tuple[str, ...]:
+        """Normalize requested subtrees, dropping unknown paths."""
+        result = []
+        for path in paths:
+            path = path.strip().strip("/").replace("/", ".")
+            if path and self.roamk.compile_path(path) is not None:
+                result.append(path)
+        return tuple(result)
+
+    def connect(self, paths: Iterable[str] = (), binary: bool = False) -> StreamClient:
+        """Register a new client."""
+        client = StreamClient(self, self.parse_paths(paths), self.max_backlog, binary)
+        self.clients.add(client)
+        return client
+
+    def disconnect(self, client: StreamClient) -> None:
+        """Remove a client."""
+        self.clients.discard(client)
+
+    def snapshot_frame(self, paths: tuple[str, ...], binary: bool = False) -> bytes:
+        """Build a snapshot frame for the given subtrees (all if empty)."""
+        version = self.roamk.version
+        if binary:
+            if not paths:
+                return self.roamk.snapshot_frame()[0]
+            count = 0
+            parts = []
+            for path in paths:
+                n, entries = wire.encode_change(path, self.roamk.get_path(path))
+                count += n
+                parts.append(entries)
+            return wire.build_frame(count, b"".join(parts), version, self.roamk.epoch)
+        if not paths:
+            body = self.roamk.snapshot_json()[0]
+        else:
+            parts = []
+            for path in paths:
+                snapshot = self.roamk.snapshot_json(path)
+                if snapshot is not None:
+                    parts.append(encode_json(path) + b":" + snapshot[0])
+            body = b"{" + b",".join(parts) + b"}"
+        epoch = encode_json(self.roamk.epoch)
+        frame = b'{"type":"snapshot","epoch":%s,"version":%d,"state":%s' % (epoch, version, body)
+        stale = {
+            path: datetime.fromtimestamp(stamp).isoformat()
+            for path, stamp in self.roamk.stale_paths().items()
+            if not paths or any(path_matches(p, path) for p in paths)
+        }
+        if stale:
+            frame += b',"stale":' + encode_json(stale)
+        return frame + b"}"
+
+    def _on_change(self, state: RoamKState, changed: frozenset[str]) -> None:
+        """RoamK subscriber: encode changes once and hand them to the loop."""
+        if not self.clients or self.loop is None:
+            return
+
+        get_path = self.roamk.get_path
+        values = {path: get_path(path) for path in changed}
+        fragments = entries = None
+        # Each encoding is built only if some client wants it
+        clients = list(self.clients)
+        if not all(client.binary for client in clients):
+            fragments = {
+                path: encode_json(path) + b":" + encode_json(value)
+                for path, value in values.items()
+            }
+        if any(client.binary for client in clients):
+            entries = {path: wire.encode_change(path, value) for path, value in values.items()}
+        try:
+            self.loop.call_soon_threadsafe(self._deliver, fragments, entries, self.roamk.version)
+        except RuntimeError:
+            # Event loop already closed during shutdown
+            pass
+
+    def _on_stale(self, stale: frozenset[str], fresh: frozenset[str]) -> None:
+        """RoamK stale subscriber: hand paths going stale or fresh to the loop."""
+        if not self.clients or self.loop is None:
+            return
+
+        received = self.roamk.stale_paths()
+        freshness: dict[str, Optional[str]] = dict.fromkeys(fresh)
+        for path in stale:
+            if path in received:
+                freshness[path] = datetime.fromtimestamp(received[path]).isoformat()
+        try:
+            self.loop.call_soon_threadsafe(self._deliver_freshness, freshness)
+        except RuntimeError:
+            # Event loop already closed during shutdown
+            pass
+
+    def _deliver_freshness(self, freshness: dict[str, Optional[str]]) -> None:
+        for client in list(self.clients):
+            client.offer_freshness(freshness)
+
+    def _deliver(
+        self, fragments: Optional[dict[str, bytes]], entries: Optional[dict], version: int
+    ) -> None:
+        for client in list(self.clients):
+            encoded = entries if client.binary else fragments
+            if encoded is not None:
+                # None for clients that connected after the change was encoded
+                client.offer(encoded, version)
@@ -0,0 +1,125 @@
+"""
+MQTT Topic Routing
+
+Maps MQTT topics to RoamK paths. Mappings may use MQTT wildcards: ``+``
+matches one topic level and ``#`` the remaining levels. Each wildcard
+captures its match, and the path template can insert captures as
+``{1}``, ``{2}``, ...:
+
+    openroam/climate/zone/+/temperature -> climate.zones[{1}].temperature
+
+Patterns are stored in a trie keyed by topic level, and every concrete
+topic's result (including "no match") is cached, so routing a topic seen
+before costs a single dict lookup.
+"""
+
+import re
+from typing import Mapping, Optional
+
+_PLACEHOLDER = re.compile(r"\{(\d+)\}")
+
+# Characters that would let a captured topic level escape its path segment
+_UNSAFE_CAPTURE = re.compile(r"[.\[\]{}]")
+
+
+class _Template:
+    """A RoamK path template with numbered capture placeholders."""
+
+    __slots__ = ("format", "captures")
+
+    def __init__(self, template: str) -> None:
+        indexes = [int(n) for n in _PLACEHOLDER.findall(template)]
+        if any(n < 1 for n in indexes):
+            raise ValueError(f"Capture placeholders start at {{1}}: {template}")
+        self.captures = max(indexes, default=0)
+        self.format = _PLACEHOLDER.sub(lambda m: f"{{{int(m.group(1)) - 1}}}", template)
+
+    def render(self, captures: list[str]) -> Optional[str]:
+        if len(captures) < self.captures:
+            return None
+        if any(_UNSAFE_CAPTURE.search(c) for c in captures[: self.captures]):
+            return None
+        return self.format.format(*captures)
+
+
+class _Node:
+    """One topic level in the routing trie."""
+
+    __slots__ = ("children", "target", "multi")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _Node] = {}
+        self.target: Optional[_Template] = None
+        self.multi: Optional[_Template] = None
+
+
+class TopicRouter:
+    """Routes MQTT topics to RoamK paths using exact and wildcard mappings.
+
+    When several mappings match, exact levels win over ``+``, which wins
+    over ``#``.
+    """
+
+    def __init__(
+        self, mappings: Optional[Mapping[str, str]] = None, cache_size: int = 4096
+    ) -> None:
+        self._root = _Node()
+        self._cache: dict[str, Optional[str]] = {}
+        self.cache_size = cache_size
+        if mappings:
+            for pattern, path in mappings.items():
+                self.add(pattern, path)
+
+    def add(self, pattern: str, path: str) -> None:
+        """Map a topic pattern to a RoamK path template."""
+        levels = pattern.split("/")
+        node = self._root
+        for i, level in enumerate(levels):
+            if level == "#":
+                if i != len(levels) - 1:
+                    raise ValueError(f"'#' must be the last topic level: {pattern}")
+                node.multi = _Template(path)
+                break
+            node = node.children.setdefault(level, _Node())
+        else:
+            node.target = _Template(path)
+        self._cache.clear()
+
+    def route(self, topic: str) -> Optional[str]:
+        """Return the RoamK path for a topic, or None if unmapped."""
+        try:
+            return self._cache[topic]
+        except KeyError:
+            pass
+
+        path = self._match(self._root, topic.split("/"), 0, [])
+        if len(self._cache) >= self.cache_size:
+            # Evict the oldest entry; topics are re-resolved on demand
+            del self._cache[next(iter(self._cache))]
+        self._cache[topic] = path
+        return path
+
+    def _match(self, node: _Node, levels: list[str], i: int, captures: list[str]) -> Optional[str]:
+        if i == len(levels):
+            if node.target is not None:
+                return node.target.render(captures)
+            if node.multi is not None:
+                # "a/#" also matches "a" itself
+                return node.multi.render(captures + [""])
+            return None
+
+        child = node.children.get(levels[i])
+        if child is not None:
+            path = self._match(child, levels, i + 1, captures)
+            if path is not None:
+                return path
+
+        child = node.children.get("+")
+        if child is not None:
+            path = self._match(child, levels, i + 1, captures + [levels[i]])
+            if path is not None:
+                return path
+
+        if node.multi is not None:
+            return node.multi.render(captures + ["/".join(levels[i:])])
+        return None
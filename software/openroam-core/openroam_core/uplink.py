@@ -0,0 +1,477 @@
+"""
+Store-and-Forward Uplink
+
+Forwards RoamK state off-board to a back office over a metered link.
+Changes are downsampled per path by a policy (GPS every 10 s while
+moving, tanks on every change, ...), collected into batches of binary
+frames (see wire.py), gzip-compressed, and sent to an HTTP endpoint
+(``POST /fleet/<vehicle>/delta`` of a fleet server) or published on an
+MQTT topic (``openroam/<vehicle>/delta``).
+
+Batches that cannot be sent (offline, or over the budget) wait in an
+on-disk queue and are sent oldest first once the link is back, no faster
+than the bytes/hour budget allows. When the queue outgrows its size
+limit the oldest batches are dropped.
+
+A policy maps path patterns (shell-style, first match wins) to the
+minimum seconds between samples of a path: 0 sends every change, None
+never sends, and ``{moving: s, parked: s}`` depends on whether
+vehicle.speed is above ``moving_speed``. A change inside the interval is
+held, and its latest value is sent when the interval is up.
+"""
+
+import base64
+import http.client
+import logging
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import deque
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Any, Mapping, Optional, Union
+
+import paho.mqtt.client as mqtt
+
+from . import wire
+from .config import UplinkConfig
+from .roamk import RoamK, RoamKState, Subscription, flatten_path
+
+logger = logging.getLogger(__name__)
+
+Interval = Union[None, float, Mapping[str, Optional[float]]]
+
+# Used when the config does not give a policy
+DEFAULT_POLICY: dict[str, Interval] = {
+    "vehicle.location.*": {"moving": 10, "parked": 600},
+    "vehicle.speed": {"moving": 10, "parked": 600},
+    "vehicle.heading": {"moving": 10, "parked": None},
+    "vehicle.odometer": {"moving": 60, "parked": None},
+    "tanks.*": 0,
+    "safety.*": 0,
+    "maintenance.*": 0,
+    "engine.check_engine": 0,
+    "engine.dtc_codes": 0,
+    "engine.*": {"moving": 30, "parked": None},
+    "power.*": 300,
+    "climate.*": 300,
+    "last_update": None,
+}
+
+# Seconds between checks for held samples that are due and queued batches
+_TICK = 1.0
+
+
+class HttpTransport:
+    """POSTs batches to an HTTP endpoint."""
+
+    def __init__(
+        self,
+        url: str,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        compressed: bool = True,
+        timeout: float = 10.0,
+    ) -> None:
+        self.url = url
+        self.headers = {"Content-Type": wire.MEDIA_TYPE}
+        if compressed:
+            self.headers["Content-Encoding"] = "gzip"
+        if username and password:
+            credentials = base64.b64encode(f"{username}:{password}".encode()).decode()
+            self.headers["Authorization"] = f"Basic {credentials}"
+        self.timeout = timeout
+
+    def start(self) -> None:
+        """Nothing to set up; each batch is one request."""
+
+    def stop(self) -> None:
+        """Nothing to tear down."""
+
+    def send(self, payload: bytes) -> None:
+        """Send a batch; OSError to retry later, ValueError if it was refused."""
+        request = urllib.request.Request(
+            self.url, data=payload, headers=self.headers, method="POST"
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout):
+                pass
+        except urllib.error.HTTPError as e:
+            if 400 <= e.code < 500 and e.code != 429:
+                raise ValueError(f"HTTP {e.code}") from None
+            raise OSError(f"HTTP {e.code}") from None
+
+
+class MqttTransport:
+    """Publishes batches to a topic on an MQTT broker, at QoS 1."""
+
+    def __init__(
+        self,
+        url: str,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        client_id: str = "openroam-uplink",
+        timeout: float = 10.0,
+    ) -> None:
+        parts = urllib.parse.urlsplit(url)
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or (8883 if parts.scheme == "mqtts" else 1883)
+        self.topic = parts.path.lstrip("/")
+        if not self.topic:
+            raise ValueError(f"Uplink URL {url} has no topic")
+        self.timeout = timeout
+        self.client = mqtt.Client(
+            client_id=client_id,
+            callback_api_version=mqtt.CallbackAPIVersion.VERSION2,
+        )
+        if username and password:
+            self.client.username_pw_set(username, password)
+        if parts.scheme == "mqtts":
+            self.client.tls_set()
+
+    def start(self) -> None:
+        """Connect in the background; paho reconnects on its own."""
+        self.client.connect_async(self.host, self.port)
+        self.client.loop_start()
+
+    def stop(self) -> None:
+        """Disconnect from the broker."""
+        self.client.disconnect()
+        self.client.loop_stop()
+
+    def send(self, payload: bytes) -> None:
+        """Send a batch; OSError to retry later."""
+        if not self.client.is_connected():
+            raise ConnectionError(f"Not connected to {self.host}:{self.port}")
+        info = self.client.publish(self.topic, payload, qos=1)
+        try:
+            info.wait_for_publish(self.timeout)
+        except (RuntimeError, ValueError) as e:
+            raise OSError(str(e)) from None
+        if not info.is_published():
+            raise TimeoutError("Broker did not acknowledge the batch")
+
+
+def make_transport(
+    url: str,
+    username: Optional[str] = None,
+    password: Optional[str] = None,
+    compressed: bool = True,
+) -> Union[HttpTransport, MqttTransport]:
+    """Pick the transport for an uplink URL by its scheme."""
+    scheme = urllib.parse.urlsplit(url).scheme
+    if scheme in ("http", "https"):
+        return HttpTransport(url, username, password, compressed)
+    if scheme in ("mqtt", "mqtts"):
+        return MqttTransport(url, username, password)
+    raise ValueError(f"Unsupported uplink URL {url!r}: use http(s):// or mqtt(s)://")
+
+
+class UplinkBridge:
+    """Downsamples RoamK changes and forwards them in batches, spooling while offline."""
+
+    def __init__(
+        self,
+        transport: Union[HttpTransport, MqttTransport],
+        policy: Optional[Mapping[str, Interval]] = None,
+        default_interval: Optional[float] = 60.0,
+        moving_speed: float = 2.0,
+        batch_interval: float = 60.0,
+        budget_bytes_per_hour: int = 0,
+        compress: bool = True,
+        spool_dir: Optional[str] = None,
+        spool_max_mb: int = 50,
+    ) -> None:
+        self.transport = transport
+        self.policy = dict(DEFAULT_POLICY if policy is None else policy)
+        self.default_interval = default_interval
+        self.moving_speed = moving_speed
+        self.batch_interval = batch_interval
+        self.budget = budget_bytes_per_hour
+        self.compress = compress
+        self.spool_dir = Path(spool_dir) if spool_dir else None
+        self.spool_max_bytes = spool_max_mb * 1024 * 1024
+
+        self._intervals: dict[str, Interval] = {}  # path -> policy entry, resolved on first use
+        self._last_sent: dict[str, float] = {}  # path -> monotonic time of its last sample
+        self._held: dict[str, tuple[Any, float]] = {}  # path -> (value, wall time)
+        self._samples: list[tuple[float, str, Any]] = []  # (wall time, path, value)
+        self._moving = False
+
+        # Batches waiting to be sent, oldest first: (size, spool file or payload)
+        self._queue: deque[tuple[int, Union[Path, bytes]]] = deque()
+        self._queued_bytes = 0
+
+        # Token bucket for the budget, starting full
+        self._tokens = float(self.budget)
+        self._refilled = time.monotonic()
+
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._subscription: Optional[Subscription] = None
+        self._roamk: Optional[RoamK] = None
+
+        # Backoff while the endpoint is unreachable
+        self._retry_at = 0.0
+        self._retry_delay = 1.0
+
+        # Metrics
+        self.samples = 0
+        self.batches_sent = 0
+        self.bytes_sent = 0
+        self.batches_dropped = 0
+        self.batches_rejected = 0
+        self.failed_sends = 0
+        self.last_error: Optional[str] = None
+
+    @classmethod
+    def from_config(cls, config: UplinkConfig) -> "UplinkBridge":
+        """Create a bridge from the uplink section of the configuration."""
+        return cls(
+            make_transport(config.url, config.username, config.password, config.compress),
+            policy=config.policy,
+            default_interval=config.default_interval,
+            moving_speed=config.moving_speed,
+            batch_interval=config.batch_interval,
+            budget_bytes_per_hour=config.budget_bytes_per_hour,
+            compress=config.compress,
+            spool_dir=config.spool_dir,
+            spool_max_mb=config.spool_max_mb,
+        )
+
+    def attach(self, roamk: RoamK) -> None:
+        """Forward the changes made to a RoamK store."""
+        self._roamk = roamk
+        self._subscription = roamk.subscribe(self._on_change)
+
+    def start(self) -> None:
+        """Start the background sender thread, picking up batches spooled earlier."""
+        self._load_spool()
+        self.transport.start()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="uplink", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 15.0) -> None:
+        """Stop forwarding; held and pending samples are sent or spooled."""
+        if self._subscription is not None and self._roamk is not None:
+            self._roamk.unsubscribe(self._subscription)
+            self._subscription = None
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.transport.stop()
+
+    def interval(self, path: str) -> Optional[float]:
+        """Seconds between samples of a path in the current mode (None: never sent)."""
+        entry = self._intervals.get(path, ...)
+        if entry is ...:
+            entry = next(
+                (v for pattern, v in self.policy.items() if fnmatchcase(path, pattern)),
+                self.default_interval,
+            )
+            self._intervals[path] = entry
+        if isinstance(entry, Mapping):
+            return entry.get("moving" if self._moving else "parked")
+        return entry
+
+    def stats(self) -> dict:
+        """Forwarding, queue and budget metrics."""
+        return {
+            "samples": self.samples,
+            "held": len(self._held),
+            "batches_sent": self.batches_sent,
+            "bytes_sent": self.bytes_sent,
+            "queued_batches": len(self._queue),
+            "queued_bytes": self._queued_bytes,
+            "batches_dropped": self.batches_dropped,
+            "batches_rejected": self.batches_rejected,
+            "failed_sends": self.failed_sends,
+            "budget_bytes": round(self._tokens) if self.budget else None,
+            "endpoint_up": self._retry_at <= time.monotonic(),
+            "last_error": self.last_error,
+        }
+
+    def _on_change(self, state: RoamKState, changed: frozenset[str]) -> None:
+        get_path = self._roamk.get_path
+        speed = get_path("vehicle.speed")
+        now = time.monotonic()
+        wall = time.time()
+        with self._cond:
+            self._moving = speed is not None and speed > self.moving_speed
+            for changed_path in changed:
+                for path, value in flatten_path(changed_path, get_path(changed_path)):
+                    interval = self.interval(path)
+                    if interval is None:
+                        continue
+                    last = self._last_sent.get(path)
+                    if last is None or now - last >= interval:
+                        self._sample(path, value, wall, now)
+                    else:
+                        self._held[path] = (value, wall)
+
+    def _sample(self, path: str, value: Any, wall: float, now: float) -> None:
+        self._samples.append((wall, path, value))
+        self._last_sent[path] = now
+        self._held.pop(path, None)
+        self.samples += 1
+
+    def _release_held(self, now: float, everything: bool = False) -> None:
+        """Sample held values whose interval is up (all of them when stopping)."""
+        for path, (value, wall) in list(self._held.items()):
+            interval = self.interval(path)
+            if interval is None and not everything:
+                # The mode changed and the path is no longer sent
+                del self._held[path]
+            elif everything or now - self._last_sent[path] >= interval:
+                self._sample(path, value, wall, now)
+
+    def _run(self) -> None:
+        next_batch = time.monotonic() + self.batch_interval
+        while True:
+            with self._cond:
+                if not self._stopping:
+                    self._cond.wait(min(_TICK, self.batch_interval))
+                stopping = self._stopping
+                now = time.monotonic()
+                self._release_held(now, everything=stopping)
+                samples = None
+                if (stopping or now >= next_batch) and self._samples:
+                    samples, self._samples = self._samples, []
+                if now >= next_batch:
+                    next_batch = now + self.batch_interval
+
+            try:
+                if samples:
+                    self._enqueue(self._encode(samples))
+                self._drain()
+            except Exception as e:
+                # Keep forwarding; the samples of this batch are lost
+                logger.exception("Uplink batch failed")
+                self.last_error = repr(e)
+            if stopping:
+                return
+
+    def _encode(self, samples: list[tuple[float, str, Any]]) -> bytes:
+        """Encode samples as a batch, starting a new frame when a path repeats."""
+        now = time.time()
+        frames = []
+        changes: dict[str, Any] = {}
+        stamps: dict[str, float] = {}
+        for wall, path, value in samples:
+            if path in changes:
+                frames.append(wire.encode_frame(changes, stamps=stamps, now=now))
+                changes = {}
+                stamps = {}
+            changes[path] = value
+            stamps[path] = wall
+        frames.append(wire.encode_frame(changes, stamps=stamps, now=now))
+        return wire.encode_batch(frames, self.compress)
+
+    def _enqueue(self, payload: bytes) -> None:
+        """Queue a batch behind any older ones, on disk when there is a spool."""
+        self._trim_queue(len(payload))
+        item: Union[Path, bytes] = payload
+        if self.spool_dir is not None:
+            try:
+                self.spool_dir.mkdir(parents=True, exist_ok=True)
+                path = self.spool_dir / f"{time.time_ns()}.rkb"
+                tmp = path.with_suffix(".tmp")
+                tmp.write_bytes(payload)
+                os.replace(tmp, path)
+                item = path
+            except OSError as e:
+                logger.error(f"Failed to spool uplink batch, keeping it in memory: {e}")
+        self._queue.append((len(payload), item))
+        self._queued_bytes += len(payload)
+
+    def _trim_queue(self, incoming: int) -> None:
+        """Drop the oldest batches to stay under the queue size limit."""
+        while self._queue and self._queued_bytes + incoming > self.spool_max_bytes:
+            self._pop()
+            self.batches_dropped += 1
+
+    def _load_spool(self) -> None:
+        if self.spool_dir is None or not self.spool_dir.is_dir():
+            return
+        for path in sorted(self.spool_dir.glob("*.rkb")):
+            size = path.stat().st_size
+            self._queue.append((size, path))
+            self._queued_bytes += size
+        if self._queue:
+            logger.info(f"Uplink resuming with {len(self._queue)} spooled batches")
+
+    def _pop(self) -> None:
+        size, item = self._queue.popleft()
+        self._queued_bytes -= size
+        if isinstance(item, Path):
+            try:
+                item.unlink()
+            except OSError as e:
+                logger.error(f"Failed to remove spooled uplink batch {item}: {e}")
+
+    def _drain(self) -> None:
+        """Send queued batches, oldest first, while the link is up and the budget allows."""
+        while self._queue and time.monotonic() >= self._retry_at:
+            size, item = self._queue[0]
+            if not self._take(size):
+                return
+            try:
+                payload = item.read_bytes() if isinstance(item, Path) else item
+            except OSError as e:
+                logger.error(f"Dropping unreadable uplink batch {item}: {e}")
+                self._pop()
+                self.batches_dropped += 1
+                continue
+            if not self._send(payload):
+                # Nothing went out, so the budget is not spent
+                self._tokens += size if self.budget else 0
+                return
+            self._pop()
+
+    def _take(self, size: int) -> bool:
+        """Spend budget on a batch; False if it has to wait for the bucket to refill."""
+        if not self.budget:
+            return True
+        now = time.monotonic()
+        self._tokens = min(self.budget, self._tokens + (now - self._refilled) * self.budget / 3600)
+        self._refilled = now
+        # A batch larger than the whole budget goes out when the bucket is full
+        if self._tokens < min(size, self.budget):
+            return False
+        self._tokens -= size
+        return True
+
+    def _send(self, payload: bytes) -> bool:
+        """Send one batch; False if it should be retried later."""
+        try:
+            self.transport.send(payload)
+        except ValueError as e:
+            # The batch itself was refused; retrying will not help
+            logger.error(f"Uplink endpoint rejected a batch: {e}")
+            self.batches_rejected += 1
+            self.last_error = str(e)
+            return True
+        except (OSError, http.client.HTTPException) as e:
+            self._mark_down(str(e) or type(e).__name__)
+            return False
+        self.batches_sent += 1
+        self.bytes_sent += len(payload)
+        self._retry_delay = 1.0
+        self._retry_at = 0.0
+        return True
+
+    def _mark_down(self, error: str) -> None:
+        if self._retry_at == 0.0:
+            logger.warning(f"Uplink endpoint unreachable, queueing batches: {error}")
+        self.failed_sends += 1
+        self.last_error = error
+        self._retry_at = time.monotonic() + self._retry_delay
+        self._retry_delay = min(self._retry_delay * 2, 300.0)
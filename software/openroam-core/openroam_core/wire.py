@@ -0,0 +1,434 @@
+"""
+Binary Wire Format
+
+A compact binary encoding of RoamK changes and snapshots for slow or
+metered links: MQTT delta frames, and an alternative representation of
+the state API and streams, selected with ``Accept: application/vnd.openroam.frame``.
+
+Every leaf path of RoamKState has a two-byte ID, its position in
+``PATHS``. ``DICTIONARY_ID``, a checksum of that list, is carried in every
+frame, so a decoder built from a different schema rejects the frame
+instead of misreading it. Paths outside the dictionary (dict entries such
+as ``climate.zones[bed].temperature``) are sent by name. Dataclass values
+are sent as their leaf fields.
+
+Layout (little-endian):
+
+    header:   b"RK", format u8, flags u8, dictionary id u32, entry count u16
+              [version u64]             if FLAG_VERSION
+              [time f64, Unix seconds]  if FLAG_STAMPS
+              [u8 length + epoch]       if FLAG_SNAPSHOT
+    entry:    path id u16 [u8 length + path, if the id is NAMED]
+              type tag u8, value
+              [i32 milliseconds relative to the frame time]  if FLAG_STAMPS
+              [f64 Unix seconds instead]  if FLAG_WIDE_STAMPS as well
+
+Values: None, False and True are bare tags; integers use the smallest of
+i8/i16/i32/i64; floats are f32 when that is exact and f64 otherwise;
+strings are u16 length + UTF-8; datetimes f64 Unix seconds; anything
+else (lists, dicts) is u32 length + JSON.
+
+A batch payload is several frames back to back, optionally gzip-compressed
+as a whole; the uplink bridge sends its batches this way. Decoding stops
+at ``MAX_BATCH_BYTES`` of frames, so a small compressed payload cannot
+expand without bound.
+
+Path names over 255 bytes and strings over 65535 bytes do not fit their
+length fields; encoding them raises ValueError.
+"""
+
+import gzip
+import json
+import struct
+import time
+import zlib
+from dataclasses import dataclass, field, fields, is_dataclass
+from datetime import datetime
+from typing import Any, Iterable, Mapping, Optional, Union
+
+from .roamk import RoamKState, _field_hints, _unwrap_optional, encode_json
+
+MEDIA_TYPE = "application/vnd.openroam.frame"
+FORMAT = 1
+
+FLAG_SNAPSHOT = 1  # the entries are a full state (or subtree), not changes
+FLAG_VERSION = 2
+FLAG_STAMPS = 4
+FLAG_WIDE_STAMPS = 8  # some stamp is further than an i32 of milliseconds from the frame time
+
+NAMED = 0xFFFF
+
+# Largest decoded batch accepted, in bytes
+MAX_BATCH_BYTES = 16 * 1024 * 1024
+
+NONE, FALSE, TRUE, I8, I16, I32, I64, F32, F64, STR, TIME, JSON = range(12)
+
+_HEADER = struct.Struct("<2sBBIH")
+_MAGIC = b"RK"
+_GZIP_MAGIC = b"\x1f\x8b"
+_U8 = struct.Struct("<B")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_U64 = struct.Struct("<Q")
+_F64 = struct.Struct("<d")
+_I32 = struct.Struct("<i")
+_F32 = struct.Struct("<f")
+_I32_MAX = 2**31 - 1
+_U8_MAX = 0xFF
+_U16_MAX = 0xFFFF
+
+# Path id and tag, followed by the value for fixed-size types
+_HEAD = struct.Struct("<HB")
+_FIXED = {
+    tag: struct.Struct("<HB" + code)
+    for tag, code in zip((I8, I16, I32, I64, F32, F64, TIME), "bhiqfdd", strict=True)
+}
+_BARE = (None, False, True)
+_VALUES = {tag: struct.Struct("<" + s.format[3:]) for tag, s in _FIXED.items()}
+
+
+def _leaf_paths(cls: type, prefix: str = "") -> list[str]:
+    paths = []
+    for name, hint in _field_hints(cls).items():
+        tp, _ = _unwrap_optional(hint)
+        if is_dataclass(tp):
+            paths.extend(_leaf_paths(tp, f"{prefix}{name}."))
+        else:
+            paths.append(prefix + name)
+    return paths
+
+
+PATHS: tuple[str, ...] = tuple(_leaf_paths(RoamKState))
+DICTIONARY_ID = zlib.crc32("\n".join(PATHS).encode())
+_IDS = {path: i for i, path in enumerate(PATHS)}
+
+
+def _int_tag(value: int) -> int:
+    if -0x80 <= value < 0x80:
+        return I8
+    if -0x8000 <= value < 0x8000:
+        return I16
+    if -0x80000000 <= value < 0x80000000:
+        return I32
+    return I64
+
+
+def _head(path: str, tag: int) -> bytes:
+    path_id = _IDS.get(path)
+    if path_id is not None:
+        return _HEAD.pack(path_id, tag)
+    name = path.encode()
+    if len(name) > _U8_MAX:
+        raise ValueError(f"Path name too long for a frame ({len(name)} bytes): {path[:40]}...")
+    return _U16.pack(NAMED) + _U8.pack(len(name)) + name + _U8.pack(tag)
+
+
+def _entry(path: str, value: Any) -> bytes:
+    """Encode one leaf value."""
+    kind = type(value)
+    if kind is float:
+        try:
+            tag = F32 if _F32.unpack(_F32.pack(value))[0] == value else F64
+        except OverflowError:
+            tag = F64
+    elif kind is bool:
+        tag = TRUE if value else FALSE
+    elif kind is int:
+        tag = _int_tag(value)
+    elif value is None:
+        tag = NONE
+    elif kind is str:
+        data = value.encode()
+        if len(data) > _U16_MAX:
+            raise ValueError(f"String too long for a frame ({len(data)} bytes) at {path}")
+        return _head(path, STR) + _U16.pack(len(data)) + data
+    elif isinstance(value, datetime):
+        tag, value = TIME, value.timestamp()
+    else:
+        data = encode_json(value)
+        return _head(path, JSON) + _U32.pack(len(data)) + data
+
+    if tag <= TRUE:
+        return _head(path, tag)
+    path_id = _IDS.get(path)
+    if path_id is not None:
+        return _FIXED[tag].pack(path_id, tag, value)
+    return _head(path, tag) + _VALUES[tag].pack(value)
+
+
+def encode_change(path: str, value: Any) -> tuple[int, bytes]:
+    """Encode a changed path as (entry count, entries).
+
+    Dataclasses, and dicts of them, are expanded into their leaf fields.
+    """
+    if is_dataclass(value):
+        count = 0
+        parts = []
+        for f in fields(value):
+            n, data = encode_change(f"{path}.{f.name}", getattr(value, f.name))
+            count += n
+            parts.append(data)
+        return count, b"".join(parts)
+    if isinstance(value, dict) and value and is_dataclass(next(iter(value.values()))):
+        count = 0
+        parts = []
+        for key, item in value.items():
+            n, data = encode_change(f"{path}[{key}]", item)
+            count += n
+            parts.append(data)
+        return count, b"".join(parts)
+    return 1, _entry(path, value)
+
+
+def build_frame(
+    count: int,
+    entries: bytes,
+    version: Optional[int] = None,
+    epoch: Optional[str] = None,
+) -> bytes:
+    """Assemble a frame from already encoded entries (without stamps).
+
+    Passing ``epoch`` marks the frame as a snapshot.
+    """
+    flags = 0
+    extra = b""
+    if version is not None:
+        flags |= FLAG_VERSION
+        extra += _U64.pack(version)
+    if epoch is not None:
+        flags |= FLAG_SNAPSHOT
+        data = epoch.encode()
+        if len(data) > _U8_MAX:
+            raise ValueError(f"Epoch too long for a frame ({len(data)} bytes)")
+        extra += _U8.pack(len(data)) + data
+    return _HEADER.pack(_MAGIC, FORMAT, flags, DICTIONARY_ID, count) + extra + entries
+
+
+def encode_frame(
+    changes: Union[Mapping[str, Any], Iterable[tuple[str, Any]]],
+    version: Optional[int] = None,
+    stamps: Optional[Mapping[str, float]] = None,
+    now: Optional[float] = None,
+) -> bytes:
+    """Encode changed paths as a delta frame.
+
+    With ``stamps`` (path -> Unix time), each entry carries the time it
+    changed relative to ``now``; unlisted paths get ``now``. If any stamp
+    is more than about 24 days from ``now``, all are sent as f64 instead.
+    """
+    items = changes.items() if isinstance(changes, Mapping) else changes
+    if stamps is None:
+        count = 0
+        parts = []
+        for path, value in items:
+            n, data = encode_change(path, value)
+            count += n
+            parts.append(data)
+        return build_frame(count, b"".join(parts), version)
+
+    now = time.time() if now is None else now
+    items = [(path, value, stamps.get(path, now)) for path, value in items]
+    wide = any(abs(stamp - now) * 1000 > _I32_MAX for _, _, stamp in items)
+    count = 0
+    parts = []
+    for path, value, stamp in items:
+        if wide:
+            offset = _F64.pack(stamp)
+        else:
+            offset = _I32.pack(round((stamp - now) * 1000))
+        # Each leaf of an expanded value gets the stamp of the changed path
+        n, data = encode_change(path, value)
+        if n == 1:
+            parts.append(data + offset)
+        else:
+            for leaf in _split_entries(data, n):
+                parts.append(leaf + offset)
+        count += n
+    flags = FLAG_STAMPS | (FLAG_WIDE_STAMPS if wide else 0)
+    extra = _F64.pack(now)
+    if version is not None:
+        flags |= FLAG_VERSION
+        extra = _U64.pack(version) + extra
+    header = _HEADER.pack(_MAGIC, FORMAT, flags, DICTIONARY_ID, count)
+    return header + extra + b"".join(parts)
+
+
+@dataclass
+class Frame:
+    """A decoded frame."""
+
+    changes: dict[str, Any]
+    snapshot: bool = False
+    version: Optional[int] = None
+    epoch: Optional[str] = None
+    time: Optional[float] = None
+    # Unix time per path, for frames sent with stamps
+    stamps: dict[str, float] = field(default_factory=dict)
+
+
+def _read_entry(data: bytes, pos: int) -> tuple[str, Any, int]:
+    """Decode the entry at ``pos``: (path, value, next position)."""
+    path_id, tag = _HEAD.unpack_from(data, pos)
+    pos += 3
+    if path_id == NAMED:
+        # The byte read as the tag is the length of the path name
+        length = tag
+        path = data[pos : pos + length].decode()
+        pos += length
+        tag = data[pos]
+        pos += 1
+    else:
+        path = PATHS[path_id]
+
+    if tag == NONE:
+        value = None
+    elif tag == FALSE:
+        value = False
+    elif tag == TRUE:
+        value = True
+    elif tag == STR:
+        (length,) = _U16.unpack_from(data, pos)
+        pos += 2
+        value = data[pos : pos + length].decode()
+        pos += length
+    elif tag == JSON:
+        (length,) = _U32.unpack_from(data, pos)
+        pos += 4
+        value = json.loads(data[pos : pos + length])
+        pos += length
+    else:
+        unpacker = _VALUES.get(tag)
+        if unpacker is None:
+            raise ValueError(f"Unknown type tag {tag}")
+        (value,) = unpacker.unpack_from(data, pos)
+        pos += unpacker.size
+        if tag == TIME:
+            try:
+                value = datetime.fromtimestamp(value)
+            except (OverflowError, OSError, ValueError):
+                raise ValueError(f"Bad timestamp {value!r} at {path}") from None
+    return path, value, pos
+
+
+def _split_entries(data: bytes, count: int) -> list[bytes]:
+    """Cut a run of stamp-less entries into one bytes object per entry."""
+    parts = []
+    pos = 0
+    for _ in range(count):
+        _, _, end = _read_entry(data, pos)
+        parts.append(data[pos:end])
+        pos = end
+    return parts
+
+
+def decode_frame(data: bytes) -> Frame:
+    """Decode a frame; raises ValueError if it is malformed or from another schema."""
+    frame, pos = _decode(data, 0)
+    if pos != len(data):
+        raise ValueError(f"{len(data) - pos} trailing bytes after frame")
+    return frame
+
+
+def _decode(data: bytes, pos: int) -> tuple[Frame, int]:
+    """Decode the frame at ``pos``: (frame, position after it)."""
+    try:
+        magic, fmt, flags, dictionary, count = _HEADER.unpack_from(data, pos)
+        if magic != _MAGIC or fmt != FORMAT:
+            raise ValueError("Not a RoamK frame")
+        if dictionary != DICTIONARY_ID:
+            raise ValueError(f"Frame uses path dictionary {dictionary:08x}")
+        pos += _HEADER.size
+        frame = Frame({}, snapshot=bool(flags & FLAG_SNAPSHOT))
+        if flags & FLAG_VERSION:
+            (frame.version,) = _U64.unpack_from(data, pos)
+            pos += 8
+        if flags & FLAG_STAMPS:
+            (frame.time,) = _F64.unpack_from(data, pos)
+            pos += 8
+        if flags & FLAG_SNAPSHOT:
+            length = data[pos]
+            frame.epoch = data[pos + 1 : pos + 1 + length].decode()
+            pos += 1 + length
+
+        changes = frame.changes
+        stamped = flags & FLAG_STAMPS
+        wide = flags & FLAG_WIDE_STAMPS
+        head = _HEAD.unpack_from
+        fixed = _FIXED
+        for _ in range(count):
+            # Fast paths for dictionary paths with bare or fixed-size values
+            path_id, tag = head(data, pos)
+            if path_id == NAMED or tag >= STR:
+                path, value, pos = _read_entry(data, pos)
+            elif tag <= TRUE:
+                path = PATHS[path_id]
+                value = _BARE[tag]
+                pos += 3
+            else:
+                unpacker = fixed[tag]
+                value = unpacker.unpack_from(data, pos)[2]
+                pos += unpacker.size
+                path = PATHS[path_id]
+            changes[path] = value
+            if wide:
+                (frame.stamps[path],) = _F64.unpack_from(data, pos)
+                pos += 8
+            elif stamped:
+                (offset,) = _I32.unpack_from(data, pos)
+                pos += 4
+                frame.stamps[path] = frame.time + offset / 1000
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise ValueError(f"Truncated or corrupt frame: {e}") from None
+    return frame, pos
+
+
+def encode_batch(frames: Iterable[bytes], compress: bool = True) -> bytes:
+    """Concatenate frames into one payload, gzip-compressed unless disabled."""
+    payload = b"".join(frames)
+    return gzip.compress(payload, mtime=0) if compress else payload
+
+
+class BatchTooLargeError(ValueError):
+    """A batch decodes to more than the size limit."""
+
+
+def _gunzip(payload: bytes, limit: int) -> bytes:
+    """Decompress gzip members, raising BatchTooLargeError past ``limit`` bytes of output."""
+    parts = []
+    size = 0
+    while payload:
+        member = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+        try:
+            data = member.decompress(payload, limit - size + 1)
+        except zlib.error as e:
+            raise ValueError(f"Corrupt compressed batch: {e}") from None
+        size += len(data)
+        if size > limit:
+            raise BatchTooLargeError(f"Batch decompresses to more than {limit} bytes")
+        if not member.eof:
+            raise ValueError("Corrupt compressed batch: truncated")
+        parts.append(data)
+        payload = member.unused_data
+    return b"".join(parts)
+
+
+def decode_batch(payload: bytes, max_bytes: int = MAX_BATCH_BYTES) -> list[Frame]:
+    """Decode a payload of one or more frames, gzip-compressed or not.
+
+    Raises BatchTooLargeError (a ValueError) past ``max_bytes`` of frames.
+    """
+    if payload[:2] == _GZIP_MAGIC:
+        payload = _gunzip(payload, max_bytes)
+    elif len(payload) > max_bytes:
+        raise BatchTooLargeError(f"Batch is larger than {max_bytes} bytes")
+    frames = []
+    pos = 0
+    while pos < len(payload) or not frames:
+        frame, pos = _decode(payload, pos)
+        frames.append(frame)
+    return frames
+
+
+def dictionary() -> dict[str, Any]:
+    """The path dictionary, for clients that decode frames themselves."""
+    return {"id": DICTIONARY_ID, "format": FORMAT, "paths": list(PATHS)}
@@ -0,0 +1,113 @@
+"""Tests for alert rule evaluation."""
+
+import json
+
+import pytest
+
+from openroam_core.alerts import AlertEngine, Rule
+from openroam_core.roamk import RoamK
+
+CO = "safety.co_ppm"
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def published():
+    return []
+
+
+@pytest.fixture
+def clock():
+    return _Clock()
+
+
+@pytest.fixture
+def roamk():
+    return RoamK()
+
+
+def _engine(rules, published, clock, roamk) -> AlertEngine:
+    engine = AlertEngine(
+        [Rule.from_dict(rule) for rule in rules],
+        lambda topic, payload: published.append((topic, payload)),
+        clock=clock,
+    )
+    engine.attach(roamk)
+    return engine
+
+
+def _states(published) -> list[bool]:
+    return [json.loads(payload)["active"] for _, payload in published if payload]
+
+
+def test_hysteresis(published, clock, roamk):
+    engine = _engine(
+        [{"name": "co_high", "path": CO, "above": 35, "clear_below": 25}], published, clock, roamk
+    )
+    for value in (30, 40, 30, 26, 24, 30, 36):
+        roamk.update_path(CO, value)
+    # Raised above 35, held down to 25, cleared below it and raised again above 35
+    assert _states(published) == [True, False, True]
+    assert [alert.name for alert in engine.active()] == ["co_high"]
+
+
+def test_duration(published, clock, roamk):
+    engine = _engine(
+        [{"name": "co_high", "path": CO, "above": 35, "for": 30}], published, clock, roamk
+    )
+    roamk.update_path(CO, 40)
+    clock.now += 29
+    engine.tick()
+    assert not engine.active()
+    clock.now += 1
+    engine.tick()
+    assert _states(published) == [True]
+
+
+def test_inactive_alerts_are_cleared(published, clock, roamk):
+    engine = _engine(
+        [
+            {"name": "co_high", "path": CO, "above": 35},
+            {"name": "tank_low", "path": "tanks.*.level", "below": 10},
+        ],
+        published,
+        clock,
+        roamk,
+    )
+    engine.clear_inactive()
+    assert published == [("openroam/alerts/co_high", "")]
+
+    # Wildcard alerts are cleared when their path is first seen
+    published.clear()
+    roamk.update_path("tanks.fresh.level", 50)
+    assert published == [("openroam/alerts/tank_low/tanks.fresh.level", "")]
+
+    # Raised alerts keep their retained message
+    published.clear()
+    roamk.update_path(CO, 40)
+    engine.clear_inactive()
+    assert published[1:] == [("openroam/alerts/tank_low/tanks.fresh.level", "")]
+
+
+def test_rate_alert_clears_when_the_value_stops_changing(published, clock, roamk):
+    engine = _engine(
+        [{"name": "co_rising", "path": CO, "rate_above": 5, "window": 60}], published, clock, roamk
+    )
+    for value in (0, 10, 20, 30, 40):
+        roamk.update_path(CO, value)
+        clock.now += 10
+    assert _states(published) == [True]
+
+    # No further updates: the rate over the window decays to 0
+    for _ in range(7):
+        engine.tick()
+        clock.now += 10
+    assert _states(published) == [True, False]
+    assert not engine.active()
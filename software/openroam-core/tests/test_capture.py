@@ -0,0 +1,28 @@
+"""Tests for message capture files."""
+
+import struct
+
+import pytest
+
+from openroam_core.capture import MAGIC, CaptureWriter, read_capture
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "day.orcap")
+    with CaptureWriter(path, start=1000.0) as writer:
+        writer.write(1000.5, "openroam/tanks/fresh/level", b"40")
+        writer.write(1001.0, "openroam/power/state", b"{}")
+        writer.write(1001.25, "openroam/tanks/fresh/level", b"39")
+    assert list(read_capture(path)) == [
+        (1000.5, "openroam/tanks/fresh/level", b"40"),
+        (1001.0, "openroam/power/state", b"{}"),
+        (1001.25, "openroam/tanks/fresh/level", b"39"),
+    ]
+
+
+def test_unknown_topic_id_is_corrupt(tmp_path):
+    path = tmp_path / "bad.orcap"
+    # A message for topic 3 with no topic record before it
+    path.write_bytes(MAGIC + struct.pack("<d", 1000.0) + bytes((1, 3, 0, 2)) + b"40")
+    with pytest.raises(ValueError, match="Corrupt capture file"):
+        list(read_capture(str(path)))
@@ -0,0 +1,45 @@
+"""Tests for queued subscriber dispatch."""
+
+import asyncio
+
+from openroam_core.dispatch import DROP_OLDEST, Dispatcher
+
+
+def test_calls_run_on_the_pool():
+    calls = []
+    dispatcher = Dispatcher(workers=1, policy=DROP_OLDEST)
+    queued = dispatcher.wrap(calls.append)
+    for i in range(5):
+        queued(i)
+    dispatcher.close(wait=True)
+    assert calls == [0, 1, 2, 3, 4]
+    assert queued.delivered == 5
+
+
+def test_closed_loop_does_not_wedge_the_queue():
+    calls = []
+    loop = asyncio.new_event_loop()
+    dispatcher = Dispatcher(loop=loop, policy=DROP_OLDEST)
+    queued = dispatcher.wrap(calls.append)
+    loop.close()
+    queued(1)
+    assert not queued._scheduled
+    assert queued.depth == 1
+
+    # A later call that can be scheduled delivers everything queued
+    dispatcher.loop = loop = asyncio.new_event_loop()
+    queued(2)
+    loop.run_until_complete(asyncio.sleep(0))
+    loop.close()
+    assert calls == [1, 2]
+
+
+def test_close_and_wait_runs_every_queued_call():
+    calls = []
+    dispatcher = Dispatcher(workers=1, max_queue=1000, policy=DROP_OLDEST)
+    queued = dispatcher.wrap(calls.append)
+    for i in range(500):
+        queued(i)
+    dispatcher.close(wait=True)
+    assert calls == list(range(500))
+    assert queued.depth == 0
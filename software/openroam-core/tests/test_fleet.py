@@ -0,0 +1,54 @@
+"""Tests for fleet mode."""
+
+import json
+
+from openroam_core.fleet import Fleet
+from openroam_core.mqtt_client import MqttClient
+
+LEVEL = "tanks.fresh.level"
+
+
+def _client(fleet: Fleet) -> MqttClient:
+    client = MqttClient()
+    client.set_fleet(fleet)
+    return client
+
+
+def test_messages_are_routed_per_vehicle():
+    fleet = Fleet()
+    client = _client(fleet)
+    client.handle("openroam/van1/tanks/fresh/level", b"40")
+    client.handle("openroam/van2/tanks/fresh/level", b"70")
+    assert fleet.get("van1").get_path(LEVEL) == 40
+    assert fleet.get("van2").get_path(LEVEL) == 70
+
+    # Unmapped topics do not create vehicles
+    client.handle("openroam/van3/nope", b"1")
+    assert fleet.get("van3") is None
+
+
+def test_vehicle_ids_and_limit():
+    fleet = Fleet(max_vehicles=2)
+    assert fleet.vehicle("van.1") is None
+    assert fleet.vehicle("van1") is fleet.vehicle("van1")
+    assert fleet.vehicle("van2") is not None
+    assert fleet.vehicle("van3") is None
+    assert fleet.rejected == 2
+    assert list(fleet.vehicles) == ["van1", "van2"]
+
+
+def test_summary_etag_follows_changes():
+    fleet = Fleet()
+    fleet.vehicle("van1").update_path(LEVEL, 40)
+    fleet.vehicle("van2")
+    body, etag = fleet.summary_json()
+    summary = json.loads(body)
+    assert summary["count"] == 2
+    assert summary["vehicles"]["van1"][LEVEL] == 40
+    assert fleet.summary_json() == (body, etag)
+
+    fleet.get("van2").update_path(LEVEL, 70)
+    body, changed = fleet.summary_json()
+    assert changed != etag
+    assert json.loads(body)["vehicles"]["van2"][LEVEL] == 70
+    assert fleet.summary_json([LEVEL])[1] != changed
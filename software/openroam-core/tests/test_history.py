@@ -0,0 +1,86 @@
+"""Tests for the on-device history store."""
+
+import sqlite3
+import time
+
+import pytest
+
+from openroam_core.history import HistoryStore
+
+PATH = "tanks.fresh.level"
+
+
+@pytest.fixture
+def store():
+    store = HistoryStore(":memory:")
+    yield store
+    store.stop()
+
+
+def _rows(store: HistoryStore, table: str) -> list[tuple]:
+    return store._db.execute(f"SELECT ts, min, max, avg, count FROM {table} ORDER BY ts").fetchall()
+
+
+def test_rollup_avg_is_time_weighted(store):
+    start = (int(time.time()) // 3600 - 2) * 3600
+    store.record(PATH, 10.0, start)
+    store.record(PATH, 40.0, start + 45)  # 10 for 45 s, then 40 for 15 s
+    store.flush(now=start + 60)
+    assert _rows(store, "rollup_1m") == [(start, 10.0, 40.0, 17.5, 2)]
+
+
+def test_last_value_is_carried_into_quiet_buckets(store):
+    start = (int(time.time()) // 3600 - 2) * 3600
+    store.record(PATH, 10.0, start)
+    store.record(PATH, 20.0, start + 30)
+    for minute in range(1, 4):
+        store.flush(now=start + minute * 60)
+    store.record(PATH, 30.0, start + 210)
+    store.flush(now=start + 240)
+    assert _rows(store, "rollup_1m") == [
+        (start, 10.0, 20.0, 15.0, 2),
+        (start + 60, 20.0, 20.0, 20.0, 1),
+        (start + 120, 20.0, 20.0, 20.0, 1),
+        (start + 180, 20.0, 30.0, 25.0, 2),
+    ]
+    # Raw samples stay one per change
+    assert store._db.execute("SELECT COUNT(*) FROM samples").fetchone() == (3,)
+
+
+def test_queries_weight_rollups_by_time(store):
+    start = (int(time.time()) // 3600 - 2) * 3600
+    store.record(PATH, 0.0, start)
+    store.record(PATH, 100.0, start + 119)  # 0 for 119 s, then 100 for 1 s
+    store.flush(now=start + 60)
+    store.flush(now=start + 120)
+    result = store.query(PATH, start, start + 119, step=120)
+    assert result["resolution"] == 60
+    assert result["avg"] == [pytest.approx(100 / 120)]
+
+
+def test_merged_rollups_are_weighted_by_time(tmp_path):
+    path = str(tmp_path / "history.db")
+    start = (int(time.time()) // 3600 - 2) * 3600
+    store = HistoryStore(path)
+    store.record(PATH, 10.0, start)
+    store.flush(close_all=True, now=start + 30)  # 10 for 30 s, then a restart
+    store.record(PATH, 40.0, start + 40)
+    store.flush(now=start + 60)  # 40 for 20 s
+    assert _rows(store, "rollup_1m") == [(start, 10.0, 40.0, pytest.approx(22.0), 2)]
+    store.stop()
+
+
+def test_old_databases_get_covered_seconds(tmp_path):
+    path = str(tmp_path / "history.db")
+    db = sqlite3.connect(path)
+    db.execute(
+        "CREATE TABLE rollup_1m (path_id INTEGER NOT NULL, ts INTEGER NOT NULL, "
+        "min REAL NOT NULL, max REAL NOT NULL, avg REAL NOT NULL, count INTEGER NOT NULL, "
+        "PRIMARY KEY (path_id, ts)) WITHOUT ROWID"
+    )
+    db.execute("INSERT INTO rollup_1m VALUES (1, 0, 1, 1, 1, 1)")
+    db.commit()
+    db.close()
+    store = HistoryStore(path)
+    assert store._db.execute("SELECT seconds FROM rollup_1m").fetchall() == [(60.0,)]
+    store.stop()
@@ -0,0 +1,103 @@
+"""Tests for the InfluxDB writer's spool."""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from openroam_core.influx import InfluxWriter
+from openroam_core.roamk import RoamK
+
+
+class _Endpoint(BaseHTTPRequestHandler):
+    """InfluxDB stand-in: fails writes while ``up`` is False."""
+
+    up = False
+    garbled = False
+    bodies: list[bytes] = []
+
+    def do_POST(self) -> None:  # noqa: N802
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if type(self).garbled:
+            # Not an HTTP status line: http.client raises BadStatusLine
+            self.wfile.write(b"garbage\r\n\r\n")
+            return
+        if type(self).up:
+            type(self).bodies.append(body)
+            self.send_response(204)
+        else:
+            self.send_response(503)
+        self.end_headers()
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def endpoint():
+    _Endpoint.up = False
+    _Endpoint.garbled = False
+    _Endpoint.bodies = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Endpoint)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def _wait(condition, timeout: float = 10.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+def test_spool_drains_while_points_keep_arriving(endpoint, tmp_path):
+    roamk = RoamK()
+    writer = InfluxWriter(url=endpoint, batch_size=1, flush_interval=0.05, spool_dir=str(tmp_path))
+    writer.attach(roamk)
+    writer.start()
+    try:
+        for i in range(8):
+            roamk.update_path("tanks.fresh.level", float(i + 1))
+            time.sleep(0.02)
+        assert _wait(lambda: len(list(tmp_path.glob("*.lp"))) >= 5)
+
+        _Endpoint.up = True
+        writer._retry_at = 0.0  # skip the backoff
+        # The vehicle keeps reporting; the backlog must still drain
+        stop = time.monotonic() + 10
+        level = 100.0
+        while list(tmp_path.glob("*.lp")) and time.monotonic() < stop:
+            level += 1
+            roamk.update_path("tanks.fresh.level", level)
+            time.sleep(0.02)
+        assert not list(tmp_path.glob("*.lp"))
+    finally:
+        writer.stop()
+    written = b"\n".join(_Endpoint.bodies)
+    for i in range(8):
+        assert b"level=%r" % float(i + 1) in written
+
+
+def test_protocol_errors_spool_instead_of_killing_the_writer(endpoint, tmp_path):
+    roamk = RoamK()
+    writer = InfluxWriter(url=endpoint, batch_size=1, flush_interval=0.05, spool_dir=str(tmp_path))
+    writer.attach(roamk)
+    writer.start()
+    try:
+        _Endpoint.garbled = True
+        roamk.update_path("tanks.fresh.level", 1.0)
+        assert _wait(lambda: list(tmp_path.glob("*.lp")))
+        assert writer.failed_writes >= 1
+
+        _Endpoint.garbled = False
+        _Endpoint.up = True
+        writer._retry_at = 0.0
+        roamk.update_path("tanks.fresh.level", 2.0)
+        assert _wait(lambda: not list(tmp_path.glob("*.lp")) and len(_Endpoint.bodies) >= 2)
+    finally:
+        writer.stop()
@@ -0,0 +1,27 @@
+"""Tests for the ingest load generator."""
+
+from openroam_core.loadgen import PROBE_TOPIC, LatencyProbe, LoadGenerator, mock_corpus
+from openroam_core.mqtt_client import MqttClient
+from openroam_core.roamk import RoamK
+
+
+def test_corpus_is_seeded():
+    corpus = mock_corpus(rounds=3, seed=1)
+    assert corpus == mock_corpus(rounds=3, seed=1)
+    assert corpus != mock_corpus(rounds=3, seed=2)
+    assert PROBE_TOPIC not in {topic for topic, _ in corpus}
+
+
+def test_probes_reach_roamk():
+    client = MqttClient()
+    roamk = RoamK()
+    client.set_roamk(roamk)
+    probe = LatencyProbe()
+    probe.attach(roamk)
+
+    generator = LoadGenerator(client.handle, mock_corpus(rounds=2), 2000, probe, probe_every=50)
+    generator.run(0.1)
+    assert generator.sent == 200
+    assert len(probe.latencies) == 4
+    assert not probe.sent
+    assert 0 <= probe.percentile(50) <= probe.percentile(99)
@@ -0,0 +1,63 @@
+"""Tests for metrics and the Prometheus text format."""
+
+from openroam_core.metrics import Histogram, Registry
+from openroam_core.mqtt_client import MqttClient
+from openroam_core.roamk import RoamK
+
+
+def test_histogram_quantiles():
+    histogram = Histogram(buckets=(0.001, 0.01, 0.1))
+    for seconds in (0.0005, 0.002, 0.003, 0.05, 2.0):
+        histogram.observe(seconds)
+    assert histogram.counts == [1, 2, 1, 1]
+    assert histogram.quantile(0.5) == 0.01
+    assert histogram.quantile(0.8) == 0.1
+    assert histogram.quantile(1.0) == float("inf")
+
+
+def test_render():
+    registry = Registry()
+    histogram = Histogram(buckets=(0.001,))
+    histogram.observe(0.0005)
+    registry.counter("messages_total", "Messages.", lambda: 3)
+    registry.gauge("up", "Connected.", lambda: True)
+    registry.counter("unmapped_total", "By topic.", lambda: {'a"b': 2}, label="topic")
+    registry.gauge("skipped", "Not collected.", lambda: None)
+    registry.histogram("stage_seconds", "Stages.", lambda: {"read": histogram}, label="stage")
+    assert registry.render().splitlines() == [
+        "# HELP messages_total Messages.",
+        "# TYPE messages_total counter",
+        "messages_total 3",
+        "# HELP up Connected.",
+        "# TYPE up gauge",
+        "up 1",
+        "# HELP unmapped_total By topic.",
+        "# TYPE unmapped_total counter",
+        'unmapped_total{topic="a\\"b"} 2',
+        "# HELP stage_seconds Stages.",
+        "# TYPE stage_seconds histogram",
+        'stage_seconds_bucket{stage="read",le="0.001"} 1',
+        'stage_seconds_bucket{stage="read",le="+Inf"} 1',
+        'stage_seconds_sum{stage="read"} 0.0005',
+        'stage_seconds_count{stage="read"} 1',
+    ]
+
+
+def test_ingest_timing_samples_messages():
+    client = MqttClient()
+    roamk = RoamK()
+    client.set_roamk(roamk)
+    client.enable_timing(sample_every=4)
+    for level in range(8):
+        client.handle("openroam/tanks/fresh/level", str(level).encode())
+    client.handle("openroam/nope", b"1")
+    assert client.received == 9
+    assert client.timings["apply"].count == 2
+    assert client.timings["route"].count == 2
+    assert client.unmapped_topics == {"openroam/nope": 1}
+
+    client.disable_timing()
+    for level in range(8):
+        client.handle("openroam/tanks/fresh/level", str(level).encode())
+    assert client.timings["apply"].count == 2
+    assert roamk.get_path("tanks.fresh.level") == 7
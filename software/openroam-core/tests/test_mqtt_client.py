@@ -0,0 +1,108 @@
+"""Tests for the MQTT client."""
+
+import asyncio
+import json
+import socket
+import threading
+
+import pytest
+
+from openroam_core.mqtt_client import MqttClient, group_messages, make_decoder
+from openroam_core.roamk import RoamK
+
+
+@pytest.mark.parametrize(
+    ("payload", "expected"),
+    [
+        (b"auto", "auto"),
+        (b'"auto"', "auto"),
+        (b'"caf\\u00e9"', "café"),
+        (b'"unterminated', '"unterminated'),
+        (b"\xff", "�"),
+    ],
+)
+def test_decode_str(payload, expected):
+    assert make_decoder(str)(payload) == expected
+
+
+def test_decode_optional_str():
+    assert make_decoder(str, optional=True)(b"null") is None
+
+
+def _closed_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_socket_is_driven_by_the_loop():
+    async def run():
+        loop = asyncio.get_running_loop()
+        client = MqttClient("127.0.0.1", _closed_port())
+        client.connect(loop)
+        a, b = socket.socketpair()
+        try:
+            client._on_socket_open(client.client, None, a)
+            assert loop.remove_reader(a)
+
+            # Called from another thread, the registration is scheduled on the loop
+            thread = threading.Thread(
+                target=client._on_socket_register_write, args=(client.client, None, a)
+            )
+            thread.start()
+            thread.join()
+            await asyncio.sleep(0)
+            assert loop.remove_writer(a)
+
+            # A refused connection is retried in the background without blocking the loop
+            await asyncio.sleep(0.1)
+            assert not client.connected
+            assert not client._loop_task.done()
+            task = client._loop_task
+            client.disconnect()
+            await asyncio.sleep(0)
+            assert task.cancelled()
+        finally:
+            a.close()
+            b.close()
+
+    asyncio.run(run())
+
+
+def test_disconnect_callback_takes_the_v2_arguments():
+    client = MqttClient()
+    client.connected = True
+    client._on_disconnect(client.client, None, None, 0, None)
+    assert not client.connected
+
+
+def test_wildcard_topics_create_dict_entries():
+    client = MqttClient()
+    roamk = RoamK()
+    client.set_roamk(roamk)
+    client.handle("openroam/climate/zone/bed/temperature", b"19.5")
+    client.handle("openroam/tanks/fresh/level", b"40")
+    client.handle("openroam/nope", b"1")
+    assert roamk.get_path("climate.zones[bed].temperature") == 19.5
+    assert roamk.get_path("tanks.fresh.level") == 40
+    assert client.unmapped == 1
+
+
+def test_state_documents_are_one_update():
+    client = MqttClient()
+    roamk = RoamK()
+    client.set_roamk(roamk)
+    notified = []
+    roamk.subscribe(lambda state, changed: notified.append(changed))
+
+    documents = group_messages(
+        [("openroam/tanks/fresh/level", 40), ("openroam/tanks/grey/level", 20)]
+    )
+    assert documents == {"openroam/tanks/state": {"fresh/level": 40, "grey/level": 20}}
+    for topic, document in documents.items():
+        client.handle(topic, json.dumps({**document, "nope": 1}).encode())
+    assert notified == [frozenset({"tanks.fresh.level", "tanks.grey.level"})]
+    assert client.unmapped == 1
+
+    client.handle("openroam/tanks/state", b"[1, 2]")
+    assert client.malformed == 1
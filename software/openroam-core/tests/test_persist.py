@@ -0,0 +1,95 @@
+"""Tests for state persistence."""
+
+import time
+
+import pytest
+
+from openroam_core.persist import StatePersister
+from openroam_core.roamk import RoamK
+
+LEVEL = "tanks.fresh.level"
+VOLTAGE = "power.house_battery.voltage"
+SOC = "power.house_battery.soc"
+
+
+@pytest.fixture
+def persister(tmp_path):
+    persister = StatePersister(str(tmp_path), fsync=False)
+    roamk = RoamK()
+    persister.restore(roamk)
+    persister.attach(roamk)
+    yield persister
+    persister._close_wal()
+
+
+def _write(persister: StatePersister, path: str, value) -> None:
+    persister._roamk.update_path(path, value)
+    persister._roamk.flush()
+
+
+def _restore(persister: StatePersister) -> tuple[StatePersister, RoamK]:
+    restored = StatePersister(str(persister.dir), fsync=False)
+    roamk = RoamK()
+    restored.restore(roamk)
+    return restored, roamk
+
+
+def test_restore_stops_at_torn_log_record(persister):
+    _write(persister, LEVEL, 40)
+    # Older than an i32 of milliseconds before the snapshot time
+    old = time.time() - 40 * 86400
+    persister._known[LEVEL] = (40, old)
+    persister._snapshot()
+    _write(persister, VOLTAGE, 13.1)
+    persister._append()
+    _write(persister, SOC, 55.0)
+    persister._append()
+    persister._close_wal()
+
+    (wal,) = persister.dir.glob("*.wal")
+    wal.write_bytes(wal.read_bytes()[:-3])
+
+    restored, roamk = _restore(persister)
+    assert roamk.get_path(LEVEL) == 40
+    assert roamk.get_path(VOLTAGE) == 13.1
+    assert roamk.get_path(SOC) != 55.0
+    assert restored.restored[LEVEL] == pytest.approx(old, abs=1e-3)
+    assert persister.write_errors == 0
+
+    # New records go to a new segment, not after the torn one
+    assert restored._segment == int(wal.stem) + 1
+
+
+def test_identical_live_value_clears_restored_path(persister):
+    _write(persister, LEVEL, 40)
+    _write(persister, VOLTAGE, 13.1)
+    persister._snapshot()
+
+    restored, roamk = _restore(persister)
+    assert set(restored.restored) == {LEVEL, VOLTAGE}
+    # The same value again: no change notification, but it was received live
+    roamk.update_path(LEVEL, 40)
+    roamk.flush()
+    assert set(restored.restored) == {VOLTAGE}
+    assert restored.stats()["restored_stale"] == 1
+
+
+def test_failed_snapshot_keeps_pending_changes(persister, monkeypatch):
+    _write(persister, LEVEL, 40)
+    persister._snapshot()
+    _write(persister, VOLTAGE, 13.1)
+
+    def fail(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr("openroam_core.persist.os.replace", fail)
+    persister._snapshot()
+    monkeypatch.undo()
+    assert persister.write_errors == 1
+    # Not in a snapshot, so the next append writes it to the log
+    persister._append()
+    persister._close_wal()
+
+    _, roamk = _restore(persister)
+    assert roamk.get_path(LEVEL) == 40
+    assert roamk.get_path(VOLTAGE) == 13.1
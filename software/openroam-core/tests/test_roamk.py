@@ -0,0 +1,99 @@
+"""Tests for the RoamK data store."""
+
+from openroam_core.roamk import RoamK
+
+LEVEL = "tanks.fresh.level"
+VOLTAGE = "power.house_battery.voltage"
+SOC = "power.house_battery.soc"
+
+
+def test_subscribers_get_changed_paths():
+    roamk = RoamK()
+    seen = []
+    roamk.subscribe(lambda state, changed: seen.append(changed))
+    roamk.update_path(LEVEL, 40)
+    roamk.update_path(LEVEL, 40)
+    assert seen == [frozenset({LEVEL})]
+
+
+def test_single_argument_subscribers_still_work():
+    roamk = RoamK()
+    seen = []
+
+    def on_change(state):
+        seen.append(state.tanks.fresh.level)
+
+    roamk.subscribe(on_change)
+    roamk.update_path(LEVEL, 40)
+    assert seen == [40]
+    assert roamk.callback_errors == 0
+
+    roamk.unsubscribe(on_change)
+    roamk.update_path(LEVEL, 50)
+    assert seen == [40]
+
+
+def test_changes_since():
+    roamk = RoamK(change_log_size=3)
+    roamk.update_path(LEVEL, 40)
+    start = roamk.version
+    roamk.update_path(VOLTAGE, 13.1)
+    roamk.update_path(LEVEL, 41)
+    roamk.update_path(VOLTAGE, 13.1)  # identical: not a change
+    assert roamk.changes_since(start) == [VOLTAGE, LEVEL]
+    assert roamk.changes_since(roamk.version) == []
+    assert roamk.changes_since(roamk.version + 1) is None
+
+    # Past the end of the change log, a caller needs a full snapshot
+    roamk.update_path(SOC, 0.5)
+    roamk.update_path(SOC, 0.6)
+    assert roamk.changes_since(start) is None
+    assert roamk.path_version(LEVEL) < roamk.path_version(SOC) == roamk.version
+
+
+def test_path_accessors_are_compiled_once():
+    roamk = RoamK()
+    accessor = roamk.compile_path(LEVEL)
+    assert roamk.compile_path(LEVEL) is accessor
+    assert roamk.compile_path("tanks.fresh.nope") is None
+    assert roamk.compile_path("tanks..level") is None
+    assert "tanks.fresh.nope" not in roamk._accessors
+
+    roamk.update_path("tanks.fresh.nope", 1)
+    assert roamk.version == 0
+
+
+def test_update_path_coerces_to_the_field_type():
+    roamk = RoamK()
+    roamk.update_path("climate.hvac_fan_speed", "2.6")
+    roamk.update_path("climate.hvac_running", "on")
+    roamk.update_path("climate.zones[bed].temperature", "19.5")
+    assert roamk.get_path("climate.hvac_fan_speed") == 3
+    assert roamk.get_path("climate.hvac_running") is True
+    assert roamk.get_path("climate.zones[bed].temperature") == 19.5
+
+    roamk.update_path("climate.hvac_running", "maybe")
+    assert roamk.rejected == 1
+    assert roamk.get_path("climate.hvac_running") is True
+
+
+def test_subscription_paths_and_deadbands():
+    roamk = RoamK()
+    power, tanks = [], []
+    roamk.subscribe(
+        lambda state, changed: power.append(changed),
+        paths=["power.*"],
+        deadbands={VOLTAGE: 0.2},
+    )
+    subscription = roamk.subscribe(lambda state, changed: tanks.append(changed), paths=["tanks"])
+
+    roamk.update_path(VOLTAGE, 13.0)
+    roamk.update_path(VOLTAGE, 13.1)  # within the deadband of the last value sent
+    roamk.update_path(VOLTAGE, 13.25)
+    roamk.update_path(LEVEL, 40)
+    assert power == [frozenset({VOLTAGE}), frozenset({VOLTAGE})]
+    assert tanks == [frozenset({LEVEL})]
+
+    roamk.unsubscribe(subscription)
+    roamk.update_path(LEVEL, 41)
+    assert len(tanks) == 1
@@ -0,0 +1,79 @@
+"""Tests for the REST API routes."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from openroam_core import server
+from openroam_core.roamk import RoamK
+
+LEVEL = "tanks.fresh.level"
+VOLTAGE = "power.house_battery.voltage"
+
+
+@pytest.fixture
+def roamk(monkeypatch):
+    roamk = RoamK(change_log_size=4)
+    monkeypatch.setattr(server, "roamk", roamk, raising=False)
+    return roamk
+
+
+@pytest.fixture
+def client(roamk):
+    # Not entered as a context manager, so the lifespan (MQTT etc.) does not run
+    return TestClient(server.app)
+
+
+def test_changes_since_a_version(client, roamk):
+    roamk.update_path(LEVEL, 40)
+    start = client.get("/state/changes", params={"since": 0}).json()
+    roamk.update_path(VOLTAGE, 13.1)
+
+    body = client.get(
+        "/state/changes", params={"since": start["version"], "epoch": start["epoch"]}
+    ).json()
+    assert body["changes"] == {VOLTAGE: 13.1}
+    assert body["version"] == roamk.version
+    assert "resync" not in body
+
+
+def test_changes_from_another_epoch_resync(client, roamk):
+    roamk.update_path(LEVEL, 40)
+    body = client.get("/state/changes", params={"since": 0, "epoch": "other"}).json()
+    assert body["resync"] is True
+    assert body["epoch"] == roamk.epoch
+    assert body["state"]["tanks"]["fresh"]["level"] == 40
+
+
+def test_changes_past_the_log_resync(client, roamk):
+    roamk.update_path(LEVEL, 40)
+    since = roamk.version
+    for i in range(5):
+        roamk.update_path(VOLTAGE, 13.0 + i / 10)
+    body = client.get("/state/changes", params={"since": since, "epoch": roamk.epoch}).json()
+    assert body["resync"] is True
+    assert body["state"]["power"]["house_battery"]["voltage"] == pytest.approx(13.4)
+
+
+def test_state_etag(client, roamk):
+    roamk.update_path(LEVEL, 40)
+    first = client.get("/state")
+    etag = first.headers["etag"]
+    assert first.json()["tanks"]["fresh"]["level"] == 40
+
+    cached = client.get("/state", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+
+    roamk.update_path(LEVEL, 41)
+    changed = client.get("/state", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()["tanks"]["fresh"]["level"] == 41
+
+
+def test_unchanged_section_keeps_its_etag(client, roamk):
+    roamk.update_path(LEVEL, 40)
+    etag = client.get("/tanks").headers["etag"]
+    roamk.update_path(VOLTAGE, 13.1)
+    assert client.get("/tanks", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/state/tanks/fresh/level").json()["value"] == 40
@@ -0,0 +1,53 @@
+"""Tests for applying sharded ingest changes."""
+
+import pytest
+
+from openroam_core.compact import store_of
+from openroam_core.roamk import RoamK
+from openroam_core.sharding import ShardedIngest, SharedState
+
+
+@pytest.fixture
+def ingest():
+    roamk = RoamK()
+    ingest = ShardedIngest(roamk, [["tanks"]])
+    ingest.shared = SharedState(1)
+    ingest._conns = []  # no worker processes; regions are published from the test
+    yield ingest
+    ingest.shared.close()
+    ingest.shared.unlink()
+
+
+def _publish(ingest: ShardedIngest, worker: RoamK) -> None:
+    writer = ingest.shared.writer(0, store_of(worker.state))
+    writer.publish()
+    writer.close()
+
+
+def test_poll_applies_worker_changes(ingest):
+    worker = RoamK(compact=True)
+    worker.update_path("tanks.fresh.level", 42.0)
+    _publish(ingest, worker)
+    assert ingest.poll() == 1
+    assert ingest.roamk.get_path("tanks.fresh.level") == 42.0
+    # Nothing new since
+    assert ingest.poll() == 0
+
+
+def test_restarted_worker_does_not_reset_fields(ingest):
+    worker = RoamK(compact=True)
+    worker.update_path("tanks.fresh.level", 42.0)
+    worker.update_path("tanks.grey.level", 10.0)
+    _publish(ingest, worker)
+    ingest.poll()
+    received = dict(ingest.roamk.received)
+
+    # The replacement worker starts from defaults and has seen one message
+    restarted = RoamK(compact=True)
+    restarted.update_path("tanks.grey.level", 11.0)
+    _publish(ingest, restarted)
+    assert ingest.poll() == 1
+    assert ingest.roamk.get_path("tanks.fresh.level") == 42.0
+    assert ingest.roamk.get_path("tanks.grey.level") == 11.0
+    # Fields the new worker has not received are not refreshed either
+    assert ingest.roamk.received["tanks.fresh.level"] == received["tanks.fresh.level"]
@@ -0,0 +1,91 @@
+"""Tests for staleness tracking."""
+
+import time
+
+import pytest
+
+from openroam_core.roamk import RoamK
+from openroam_core.staleness import StalenessMonitor
+
+GPS = "vehicle.location.latitude"
+TANK = "tanks.fresh.level"
+
+
+@pytest.fixture
+def roamk():
+    return RoamK()
+
+
+@pytest.fixture
+def monitor(roamk):
+    monitor = StalenessMonitor(roamk, ttls={"vehicle.*": 30, "tanks.*": 900}, resolution=1.0)
+    monitor.start()
+    return monitor
+
+
+def _write(roamk: RoamK, path: str, value, at: float) -> None:
+    """Write a value as if it was received at monotonic time ``at``."""
+    roamk.update_path(path, value)
+    roamk.received[path] = at
+
+
+def test_silent_path_goes_stale_and_comes_back(roamk, monitor):
+    events = []
+    roamk.subscribe_stale(lambda stale, fresh: events.append((set(stale), set(fresh))))
+    now = time.monotonic()
+    _write(roamk, GPS, 45.0, now)
+    _write(roamk, TANK, 50.0, now)
+    monitor.tick(now)
+
+    # The tank keeps reporting the same level; the GPS has died
+    for second in range(1, 32):
+        _write(roamk, TANK, 50.0, now + second)
+        monitor.tick(now + second)
+    assert set(roamk.stale) == {GPS}
+    assert events == [({GPS}, set())]
+
+    # The same value again still counts as a sign of life
+    _write(roamk, GPS, 45.0, now + 40)
+    monitor.tick(now + 40)
+    assert not roamk.stale
+    assert events[-1] == (set(), {GPS})
+
+
+def test_paths_are_checked_once_per_ttl(roamk, monitor):
+    now = time.monotonic()
+    _write(roamk, TANK, 50.0, now)
+    monitor.tick(now)
+    for second in range(1, 600):
+        _write(roamk, TANK, 50.0, now + second)
+        monitor.tick(now + second)
+    # One check when the first expiry came due (not yet: 600 < 900)
+    assert monitor.checks == 0
+    monitor.tick(now + 901)
+    assert monitor.checks == 1
+    assert not roamk.stale
+
+
+def test_restored_values_keep_their_age(roamk, monitor):
+    roamk.update_path(GPS, 45.0)
+    roamk.set_received({GPS: time.time() - 3600})
+    monitor.tick()
+    monitor.tick(time.monotonic() + 1)
+    assert GPS in roamk.stale
+
+
+def test_untracked_paths_never_go_stale(roamk, monitor):
+    now = time.monotonic()
+    _write(roamk, "maintenance.oil_life", 80, now)
+    monitor.tick(now + 10**6)
+    assert not roamk.stale
+
+
+def test_received_at_covers_subtrees(roamk):
+    roamk.update_path(GPS, 45.0)
+    roamk.update_path("climate.zones[bed].temperature", 20.0)
+    latitude = roamk.received_at(GPS)
+    assert latitude == pytest.approx(time.time(), abs=5)
+    assert roamk.received_at("vehicle.location") == pytest.approx(latitude, abs=1e-3)
+    assert roamk.received_at("vehicle") == pytest.approx(latitude, abs=1e-3)
+    assert roamk.received_at("climate.zones") is not None
+    assert roamk.received_at("tanks") is None
@@ -0,0 +1,58 @@
+"""Tests for streaming RoamK deltas to clients."""
+
+import asyncio
+import json
+
+from openroam_core.roamk import RoamK
+from openroam_core.streaming import DeltaBroadcaster
+
+LEVEL = "tanks.fresh.level"
+VOLTAGE = "power.house_battery.voltage"
+
+
+async def _frame(client) -> dict:
+    return json.loads(await asyncio.wait_for(client.next_frame(), 1))
+
+
+def test_snapshot_then_filtered_deltas():
+    async def run():
+        roamk = RoamK()
+        roamk.update_path(LEVEL, 40)
+        broadcaster = DeltaBroadcaster(roamk)
+        broadcaster.start()
+        client = broadcaster.connect(["tanks"])
+
+        snapshot = await _frame(client)
+        assert snapshot["type"] == "snapshot"
+        assert snapshot["state"] == {"tanks": json.loads(roamk.snapshot_json("tanks")[0])}
+
+        roamk.update_path(VOLTAGE, 13.1)
+        roamk.update_path(LEVEL, 41)
+        roamk.update_path(LEVEL, 42)
+        await asyncio.sleep(0)
+        delta = await _frame(client)
+        # Outside the client's subtree left out, repeated changes coalesced
+        assert delta == {"type": "delta", "version": roamk.version, "changes": {LEVEL: 42}}
+        broadcaster.stop()
+
+    asyncio.run(run())
+
+
+def test_slow_client_is_resynced():
+    async def run():
+        roamk = RoamK()
+        broadcaster = DeltaBroadcaster(roamk, max_backlog=2)
+        broadcaster.start()
+        client = broadcaster.connect()
+        await _frame(client)
+
+        for level in range(5):
+            roamk.update_path(LEVEL, level)
+            await asyncio.sleep(0)
+        frame = await _frame(client)
+        assert frame["type"] == "snapshot"
+        assert frame["state"]["tanks"]["fresh"]["level"] == 4
+        assert broadcaster.dropped == 3
+        broadcaster.stop()
+
+    asyncio.run(run())
@@ -0,0 +1,56 @@
+"""Tests for MQTT topic routing."""
+
+import pytest
+
+from openroam_core.topics import TopicRouter
+
+
+@pytest.fixture
+def router():
+    return TopicRouter(
+        {
+            "openroam/tanks/fresh/level": "tanks.fresh.level",
+            "openroam/tanks/+/level": "tanks.{1}.level",
+            "openroam/climate/zone/+/temperature": "climate.zones[{1}].temperature",
+            "openroam/engine/+": "engine.{1}",
+            "openroam/raw/#": "raw.{1}",
+        }
+    )
+
+
+@pytest.mark.parametrize(
+    ("topic", "path"),
+    [
+        ("openroam/tanks/fresh/level", "tanks.fresh.level"),
+        ("openroam/tanks/grey/level", "tanks.grey.level"),
+        ("openroam/climate/zone/bed/temperature", "climate.zones[bed].temperature"),
+        ("openroam/engine/rpm", "engine.rpm"),
+        ("openroam/raw/a/b", "raw.a/b"),
+        ("openroam/raw/a", "raw.a"),
+        ("openroam/engine/rpm/extra", None),
+        ("openroam/unknown", None),
+    ],
+)
+def test_route(router, topic, path):
+    assert router.route(topic) == path
+    # Cached, including no match
+    assert router.route(topic) == path
+
+
+def test_captures_cannot_escape_their_segment(router):
+    assert router.route("openroam/climate/zone/bed].x[/temperature") is None
+    assert router.route("openroam/engine/rpm.x") is None
+
+
+def test_cache_is_bounded():
+    router = TopicRouter({"t/+": "engine.{1}"}, cache_size=2)
+    for name in ("a", "b", "c"):
+        router.route(f"t/{name}")
+    assert list(router._cache) == ["t/b", "t/c"]
+
+
+def test_invalid_patterns():
+    with pytest.raises(ValueError):
+        TopicRouter({"a/#/b": "x"})
+    with pytest.raises(ValueError):
+        TopicRouter({"a/+": "x.{0}"})
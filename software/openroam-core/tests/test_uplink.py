@@ -0,0 +1,33 @@
+"""Tests for the store-and-forward uplink."""
+
+import http.client
+from typing import Optional
+
+from openroam_core.uplink import UplinkBridge
+
+
+class _Transport:
+    def __init__(self) -> None:
+        self.error: Optional[Exception] = None
+        self.sent: list[bytes] = []
+
+    def send(self, payload: bytes) -> None:
+        if self.error is not None:
+            raise self.error
+        self.sent.append(payload)
+
+
+def test_broken_response_keeps_batch_queued():
+    transport = _Transport()
+    uplink = UplinkBridge(transport)
+    transport.error = http.client.IncompleteRead(b"")
+    uplink._enqueue(b"batch")
+    uplink._drain()
+    assert transport.sent == []
+    assert uplink.failed_sends == 1
+
+    transport.error = None
+    uplink._retry_at = 0.0
+    uplink._drain()
+    assert transport.sent == [b"batch"]
+    assert uplink.batches_sent == 1
@@ -0,0 +1,84 @@
+"""Tests for the binary wire format."""
+
+import gzip
+import struct
+from datetime import datetime
+
+import pytest
+
+from openroam_core import wire
+
+CHANGES = {
+    "power.house_battery.voltage": 13.1,  # f64
+    "power.house_battery.soc": 0.5,  # f32
+    "tanks.fresh.level": 40,
+    "vehicle.location.latitude": None,
+    "safety.smoke_status": "ok",
+    "climate.zones[bed].temperature": 19.5,  # sent by name
+    "maintenance.notes": ["oil", {"km": 120000}],
+}
+
+
+def test_frame_round_trip():
+    frame = wire.decode_frame(wire.encode_frame(CHANGES, version=42))
+    assert frame.changes == CHANGES
+    assert frame.version == 42
+    assert not frame.snapshot
+
+
+def test_snapshot_round_trip():
+    count, entries = wire.encode_change("last_update", datetime.fromtimestamp(1700000000.25))
+    frame = wire.decode_frame(wire.build_frame(count, entries, version=7, epoch="abc"))
+    assert frame.snapshot and frame.epoch == "abc" and frame.version == 7
+    assert frame.changes["last_update"] == datetime.fromtimestamp(1700000000.25)
+
+
+@pytest.mark.parametrize("age", [1.5, 40 * 86400])
+def test_stamps_round_trip(age):
+    now = 1_700_000_000.0
+    stamps = {"tanks.fresh.level": now - age}
+    frame = wire.decode_frame(wire.encode_frame(CHANGES, stamps=stamps, now=now))
+    assert frame.changes == CHANGES
+    assert frame.time == now
+    assert frame.stamps["tanks.fresh.level"] == pytest.approx(now - age, abs=1e-3)
+    assert frame.stamps["safety.smoke_status"] == now
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_batch_round_trip(compress):
+    frames = [wire.encode_frame({"tanks.fresh.level": i}) for i in range(3)]
+    decoded = wire.decode_batch(wire.encode_batch(frames, compress))
+    assert [frame.changes["tanks.fresh.level"] for frame in decoded] == [0, 1, 2]
+
+
+def test_oversize_values_raise_value_error():
+    with pytest.raises(ValueError):
+        wire.encode_frame({"climate.zones[" + "x" * 300 + "].temperature": 1.0})
+    with pytest.raises(ValueError):
+        wire.encode_frame({"safety.smoke_status": "x" * 70000})
+
+
+def test_batch_size_limit():
+    frames = [wire.encode_frame({"tanks.fresh.level": i}) for i in range(100)]
+    payload = wire.encode_batch(frames)
+    with pytest.raises(wire.BatchTooLargeError):
+        wire.decode_batch(payload, max_bytes=1000)
+    with pytest.raises(wire.BatchTooLargeError):
+        wire.decode_batch(b"".join(frames), max_bytes=1000)
+    assert len(wire.decode_batch(payload, max_bytes=100_000)) == 100
+
+
+def test_corrupt_batches():
+    payload = wire.encode_batch([wire.encode_frame({"tanks.fresh.level": 1})])
+    with pytest.raises(ValueError):
+        wire.decode_batch(payload[:-6])
+    with pytest.raises(ValueError):
+        wire.decode_batch(gzip.compress(b"not a frame"))
+
+
+@pytest.mark.parametrize("timestamp", [1e300, float("nan"), -1e20])
+def test_bad_timestamps_raise_value_error(timestamp):
+    count, entries = wire.encode_change("last_update", datetime.fromtimestamp(0))
+    entries = entries[:-8] + struct.pack("<d", timestamp)
+    with pytest.raises(ValueError):
+        wire.decode_frame(wire.build_frame(count, entries))